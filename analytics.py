@@ -0,0 +1,170 @@
+"""
+Analytics Module for Quiz Pool App
+Maintains per-question item statistics incrementally as submissions are graded
+"""
+
+import math
+import threading
+from event_bus import event_bus
+
+
+def new_item(correct_choice=0):
+    """Empty running sums for one question"""
+    return {
+        'correct_choice': correct_choice,
+        'attempts': 0,
+        'correct': 0,
+        'score_sum': 0,
+        'score_sq_sum': 0,
+        'correct_score_sum': 0,
+        # Index 0 counts unanswered, 1-4 count each option
+        'choices': [0, 0, 0, 0, 0]
+    }
+
+
+class QuizAnalytics:
+    """Running item-analysis rollups per quiz, updated once per graded submission
+
+    Items are keyed by the snapshot question row (QuizQuestionRows.RowID) they were
+    answered on. A row is one question's exact content and is shared by every
+    published version in which the question did not change, so attempts on different
+    versions pool for unchanged questions (wherever they sit in the quiz), while an
+    edited question starts fresh instead of being mixed with its old wording.
+
+    A quiz's rollups are built from its stored attempts the first time its report is
+    asked for (so nothing is lost on restart) and then kept current from
+    quiz_submitted events, which are published once an attempt has been stored.
+    """
+
+    def __init__(self, bus):
+        self._quizzes = {}
+        # Submissions seen per quiz, so a load that raced with one is not kept
+        self._events = {}
+        self._lock = threading.Lock()
+        bus.subscribe('quiz_submitted', self._on_submitted)
+
+    def _on_submitted(self, table_name, details=None, row_ids=None, attempt_id=None, **_):
+        if details and row_ids:
+            self.record(table_name, details, row_ids, attempt_id)
+
+    def record(self, table_name, details, row_ids, attempt_id=None):
+        """Folds one graded submission (the 'details' list from score_answers) into the rollups
+
+        row_ids gives the snapshot row of each question, in the same order as details.
+        Quizzes whose rollups have not been loaded yet are left to the load.
+        """
+        raw_score = sum(1 for detail in details if detail['is_correct'])
+
+        with self._lock:
+            self._events[table_name] = self._events.get(table_name, 0) + 1
+            quiz = self._quizzes.get(table_name)
+            if quiz is None:
+                return
+            # Stored just before the load read it, and already counted there
+            if attempt_id in quiz['recent']:
+                quiz['recent'].discard(attempt_id)
+                return
+
+            quiz['attempts'] += 1
+            quiz['score_sum'] += raw_score
+            quiz['score_sq_sum'] += raw_score * raw_score
+
+            items = quiz['items']
+            for row_id, detail in zip(row_ids, details):
+                item = items.get(row_id)
+                if item is None:
+                    item = items[row_id] = new_item()
+                item['correct_choice'] = detail.get('correct_choice', 0)
+                item['attempts'] += 1
+                item['score_sum'] += raw_score
+                item['score_sq_sum'] += raw_score * raw_score
+                item['choices'][detail.get('student_choice', 0)] += 1
+                if detail['is_correct']:
+                    item['correct'] += 1
+                    item['correct_score_sum'] += raw_score
+
+    def invalidate(self, table_name):
+        """Forgets a quiz's rollups, e.g. after stored results were re-graded; the next report reloads them"""
+        with self._lock:
+            self._quizzes.pop(table_name, None)
+            self._events[table_name] = self._events.get(table_name, 0) + 1
+
+    def _rollups(self, table_name, load):
+        with self._lock:
+            quiz = self._quizzes.get(table_name)
+            seen = self._events.get(table_name, 0)
+        if quiz is not None:
+            return quiz
+
+        quiz = load()
+        if quiz is None:
+            return None
+        with self._lock:
+            # A submission arrived mid-load and may or may not be in it; use this load once
+            # and let the next report load again
+            if self._events.get(table_name, 0) == seen:
+                self._quizzes[table_name] = quiz
+        return quiz
+
+    @staticmethod
+    def _std_dev(n, total, sq_total):
+        if not n:
+            return 0
+        mean = total / n
+        variance = sq_total / n - mean * mean
+        return math.sqrt(variance) if variance > 0 else 0
+
+    def report(self, table_name, questions, load):
+        """Builds the item-analysis table for a quiz in O(questions)
+
+        questions lists the (row_id, question text, correct choice) of the version to
+        report on, in quiz order. load() returns the quiz's rollups computed from its
+        stored attempts ({'attempts', 'score_sum', 'score_sq_sum', 'items': {row_id: item},
+        'recent': attempt IDs stored in the last moments}), or None if they cannot be read.
+        """
+        quiz = self._rollups(table_name, load)
+        with self._lock:
+            if not quiz or not quiz['attempts']:
+                return None
+
+            n = quiz['attempts']
+            mean = quiz['score_sum'] / n
+            std_dev = self._std_dev(n, quiz['score_sum'], quiz['score_sq_sum'])
+
+            report_questions = []
+            for index, (row_id, question, correct_choice) in enumerate(questions):
+                item = quiz['items'].get(row_id) or new_item(correct_choice)
+                attempts = item['attempts']
+                correct = item['correct']
+                p_value = correct / attempts if attempts else 0
+
+                # Point-biserial correlation between this item and the total raw score,
+                # over the attempts that included the item (questions added later have fewer)
+                discrimination = None
+                item_std_dev = self._std_dev(attempts, item['score_sum'], item['score_sq_sum'])
+                if item_std_dev and 0 < correct < attempts:
+                    mean_correct = item['correct_score_sum'] / correct
+                    mean_wrong = (item['score_sum'] - item['correct_score_sum']) / (attempts - correct)
+                    discrimination = round((mean_correct - mean_wrong) / item_std_dev * math.sqrt(p_value * (1 - p_value)), 3)
+
+                report_questions.append({
+                    'number': index + 1,
+                    'question': question,
+                    'attempts': attempts,
+                    'p_value': round(p_value, 3),
+                    'discrimination': discrimination,
+                    'correct_choice': item['correct_choice'] or correct_choice,
+                    'unanswered_rate': round(item['choices'][0] / attempts, 3) if attempts else 0,
+                    'option_rates': [round(count / attempts, 3) if attempts else 0 for count in item['choices'][1:]]
+                })
+
+            return {
+                'attempts': n,
+                'mean_score': round(mean, 2),
+                'std_dev': round(std_dev, 2),
+                'questions': report_questions
+            }
+
+
+# Shared analytics fed by the process-wide event bus
+quiz_analytics = QuizAnalytics(event_bus)
@@ -0,0 +1,76 @@
+"""
+Assets Module for Quiz Pool App
+Serves the fingerprinted, precompressed static files produced by build_assets.py
+"""
+
+import json
+import mimetypes
+import os
+from flask import request, send_from_directory, url_for
+
+# Fingerprinted files never change under the same name, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Preferred precompressed variants, best first: (Accept-Encoding token, file suffix)
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class AssetManifest:
+    """Maps logical static paths (css/style.css) to their fingerprinted build output"""
+
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.entries = {}
+        path = os.path.join(static_folder, 'dist', 'manifest.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                self.entries = json.load(handle)
+
+    def resolve(self, filename):
+        """Returns the fingerprinted path for a static file, or the path unchanged if it was not built"""
+        return self.entries.get(filename, filename)
+
+    def __contains__(self, filename):
+        return filename in self.entries
+
+
+def init_app(app):
+    """Rewrites url_for('static', ...) to fingerprinted files and serves them with immutable caching"""
+    manifest = AssetManifest(app.static_folder)
+    app.extensions['assets'] = manifest
+    serve_static = app.view_functions['static']
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifest.resolve(values['filename'])
+
+    @app.template_global()
+    def asset_url(filename, fallback=None):
+        """Local URL for a built asset; before the first build, the fallback (e.g. a CDN URL) if given"""
+        if filename not in manifest and fallback:
+            return fallback
+        return url_for('static', filename=filename)
+
+    def static_view(filename):
+        if not filename.startswith('dist/'):
+            return serve_static(filename)
+
+        # Send the smallest precompressed variant the client accepts
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = None
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in request.accept_encodings and \
+                    os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        return response
+
+    app.view_functions['static'] = static_view
+    return manifest
@@ -0,0 +1,65 @@
+"""
+Startup Benchmark for Quiz Pool App
+Measures how long a fresh interpreter takes to import the app and which heavy modules it loads
+
+Run from the project root:
+    python benchmarks/bench_startup.py [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be loaded on first use, never at import time
+DEFERRED_MODULES = ('pyodbc', 'reportlab')
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+loaded = [name for name in {deferred!r} if name in sys.modules]
+print(f"{{elapsed:.6f}} {{','.join(loaded)}}")
+"""
+
+
+def measure(runs):
+    """Imports main.py in `runs` fresh interpreters and returns (timings, eagerly loaded modules)"""
+    timings = []
+    loaded = set()
+    probe = PROBE.format(deferred=DEFERRED_MODULES)
+    
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', probe], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, check=True)
+        last_line = result.stdout.strip().splitlines()[-1]
+        elapsed, _, modules = last_line.partition(' ')
+        timings.append(float(elapsed))
+        loaded.update(name for name in modules.split(',') if name)
+    
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure Quiz Pool App import time')
+    parser.add_argument('--runs', type=int, default=10, help='number of fresh interpreters to time')
+    args = parser.parse_args()
+    
+    timings, loaded = measure(args.runs)
+    print(f"import main: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms over {args.runs} runs")
+    
+    if loaded:
+        print(f"FAIL: deferred modules loaded at import time: {', '.join(sorted(loaded))}")
+        return 1
+    
+    print("OK: no deferred modules loaded at import time")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+"""
+Asset Build Script for Quiz Pool App
+Vendors Bootstrap and Font Awesome, strips unused CSS, minifies, fingerprints and precompresses
+
+Run from the project root whenever templates or static files change:
+    python build_assets.py --fetch     # download vendor files into static/vendor/ first
+    python build_assets.py             # rebuild static/dist/ from what is on disk
+
+The output in static/dist/ holds content-hashed files, their .gz (and .br when the
+brotli package is installed) variants, and manifest.json, which assets.py reads
+to rewrite url_for('static', ...) links.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import urllib.request
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(PROJECT_ROOT, 'static')
+TEMPLATES_DIR = os.path.join(PROJECT_ROOT, 'templates')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+
+BOOTSTRAP_CDN = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist'
+FONTAWESOME_CDN = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0'
+
+# Local path under static/ -> upstream URL (same versions the templates fall back to)
+VENDOR_FILES = {
+    'vendor/bootstrap/bootstrap.min.css': f'{BOOTSTRAP_CDN}/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': f'{BOOTSTRAP_CDN}/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css': f'{FONTAWESOME_CDN}/css/all.min.css',
+    'vendor/fontawesome/webfonts/fa-solid-900.woff2': f'{FONTAWESOME_CDN}/webfonts/fa-solid-900.woff2',
+    'vendor/fontawesome/webfonts/fa-regular-400.woff2': f'{FONTAWESOME_CDN}/webfonts/fa-regular-400.woff2',
+    'vendor/fontawesome/webfonts/fa-brands-400.woff2': f'{FONTAWESOME_CDN}/webfonts/fa-brands-400.woff2',
+}
+
+# Entry points, in the order they are built; fonts are picked up from the CSS that references them
+CSS_ASSETS = ('vendor/bootstrap/bootstrap.min.css', 'vendor/fontawesome/css/all.min.css', 'css/style.css')
+JS_ASSETS = ('vendor/bootstrap/bootstrap.bundle.min.js', 'js/main.js')
+
+# Files too small to benefit from compression are served as is
+MIN_COMPRESS_SIZE = 256
+
+# At-rules whose bodies hold further rules, and so are shaken recursively
+NESTED_AT_RULES = ('@media', '@supports', '@container', '@layer', '@document')
+
+_TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_-]*")
+_SELECTOR_CLASS = re.compile(r"\.(-?[A-Za-z_][A-Za-z0-9_-]*)")
+_CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+_FUNCTIONAL_PSEUDO = re.compile(r":(?:not|is|where|has)\([^()]*\)")
+_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_ICON_CONTENT = re.compile(r"content\s*:\s*['\"]\\([0-9a-fA-F]{4,6})['\"]")
+
+
+def fetch_vendor_files(force=False):
+    """Downloads the vendor files that are not yet in static/vendor/"""
+    for path, url in VENDOR_FILES.items():
+        target = os.path.join(STATIC_DIR, path)
+        if os.path.exists(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        print(f"Fetching {url}")
+        with urllib.request.urlopen(url, timeout=60) as response, open(target, 'wb') as output:
+            shutil.copyfileobj(response, output)
+
+
+def used_tokens():
+    """Every identifier-like token in the templates and scripts, i.e. every class that might be used
+
+    This over-approximates on purpose: class names built in Jinja expressions
+    ("fa-{{ 'check-circle' if ... }}") or toggled from JavaScript (Bootstrap's
+    "show", "collapsing", ...) must survive. Icon names are also kept with their
+    "fa-" prefix for the same reason.
+    """
+    sources = []
+    for root, _, files in os.walk(TEMPLATES_DIR):
+        sources.extend(os.path.join(root, name) for name in files if name.endswith('.html'))
+    sources.extend(os.path.join(STATIC_DIR, path) for path in JS_ASSETS)
+
+    tokens = set()
+    for source in sources:
+        if os.path.exists(source):
+            with open(source, encoding='utf-8') as handle:
+                tokens.update(_TOKEN.findall(handle.read()))
+    tokens.update(f'fa-{token}' for token in list(tokens))
+    return tokens
+
+
+def _split_blocks(css):
+    """Splits a stylesheet into top-level (prelude, body) pairs; body is None for statements like @import"""
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = None
+    index = 0
+    quote = None
+    while index < len(css):
+        char = css[index]
+        if quote:
+            if char == '\\':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif css.startswith('/*', index):
+            end = css.find('*/', index + 2)
+            index = len(css) if end < 0 else end + 1
+        elif char == '{':
+            if depth == 0:
+                prelude = _COMMENT.sub('', css[start:index]).strip()
+                start = index + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:index]))
+                start = index + 1
+        elif char == ';' and depth == 0:
+            statement = _COMMENT.sub('', css[start:index]).strip()
+            if statement:
+                blocks.append((statement, None))
+            start = index + 1
+        index += 1
+    return blocks
+
+
+def _split_selectors(prelude):
+    """Splits a selector list on top-level commas, leaving :is(.a, .b) and the like intact"""
+    selectors = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:index].strip())
+            start = index + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def _selector_used(selector, tokens):
+    if '\\' in selector:
+        return True
+    # Classes inside :not(), :is(), ... do not have to be present for the selector to match
+    previous = None
+    while previous != selector:
+        previous, selector = selector, _FUNCTIONAL_PSEUDO.sub('', selector)
+    return all(name in tokens for name in _SELECTOR_CLASS.findall(selector))
+
+
+def shake_css(css, tokens):
+    """Drops rules whose selectors only match classes that never appear in the app"""
+    output = []
+    for prelude, body in _split_blocks(css):
+        if body is None:
+            output.append(prelude + ';')
+        elif prelude.startswith('@'):
+            if prelude.split(None, 1)[0].split('(')[0] in NESTED_AT_RULES:
+                inner = shake_css(body, tokens)
+                if inner:
+                    output.append(f'{prelude}{{{inner}}}')
+            else:
+                # @font-face, @keyframes, @page, ... are kept whole
+                output.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = _split_selectors(prelude)
+            kept = [selector for selector in selectors if _selector_used(selector, tokens)]
+            if kept:
+                output.append(f"{','.join(kept)}{{{body}}}")
+    return minify_css(''.join(output))
+
+
+def minify_css(css):
+    """Removes comments and insignificant whitespace"""
+    css = _COMMENT.sub('', css)
+    css = re.sub(r"\s+", ' ', css)
+    css = re.sub(r"\s*([{};,])\s*", r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Conservative minification: drops indentation, blank lines and whole-line comments
+
+    Line breaks are kept so automatic semicolon insertion behaves as before. Not safe
+    for multi-line template literals, which the app's scripts do not use.
+    """
+    lines = []
+    for line in js.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith('//'):
+            lines.append(stripped)
+    return '\n'.join(lines) + '\n'
+
+
+def _fingerprint(name, data):
+    base, extension = os.path.splitext(os.path.basename(name))
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f'{base}.{digest}{extension}'
+
+
+def _write_output(name, data):
+    """Writes a fingerprinted file with its precompressed variants and returns its path under static/"""
+    filename = _fingerprint(name, data)
+    path = os.path.join(DIST_DIR, filename)
+    with open(path, 'wb') as handle:
+        handle.write(data)
+
+    if len(data) >= MIN_COMPRESS_SIZE and not filename.endswith('.woff2'):
+        with open(path + '.gz', 'wb') as handle:
+            # mtime=0 keeps the output byte-identical between builds
+            handle.write(gzip.compress(data, compresslevel=9, mtime=0))
+        try:
+            import brotli
+            with open(path + '.br', 'wb') as handle:
+                handle.write(brotli.compress(data, quality=11))
+        except ImportError:
+            pass
+    return f'dist/{filename}'
+
+
+def _subset_font(data, codepoints):
+    """Keeps only the glyphs for the icons in use; needs fontTools, otherwise the font is kept whole"""
+    if not codepoints:
+        return data
+    try:
+        import io
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        return data
+
+    try:
+        font = TTFont(io.BytesIO(data))
+        options = subset.Options()
+        options.flavor = font.flavor
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        output = io.BytesIO()
+        font.flavor = options.flavor
+        font.save(output)
+        return output.getvalue()
+    except Exception as e:
+        print(f"Could not subset font, keeping it whole: {e}")
+        return data
+
+
+def build(tokens=None):
+    """Builds static/dist/ and returns the manifest"""
+    tokens = used_tokens() if tokens is None else tokens
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for name in CSS_ASSETS:
+        source = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(source):
+            print(f"Skipping missing {name} (run with --fetch to download vendor files)")
+            continue
+        with open(source, encoding='utf-8') as handle:
+            css = shake_css(handle.read(), tokens)
+
+        # Fonts are fingerprinted first so the stylesheet can point at their final names
+        codepoints = {int(code, 16) for code in _ICON_CONTENT.findall(css)}
+
+        def rewrite_url(match):
+            reference = match.group(2)
+            if reference.startswith(('data:', 'http:', 'https:', '/')):
+                return match.group(0)
+            font_name = os.path.normpath(os.path.join(os.path.dirname(name), reference.split('?')[0].split('#')[0]))
+            font_path = os.path.join(STATIC_DIR, font_name)
+            if not os.path.exists(font_path):
+                return match.group(0)
+            if font_name not in manifest:
+                with open(font_path, 'rb') as font_handle:
+                    manifest[font_name] = _write_output(font_name, _subset_font(font_handle.read(), codepoints))
+            return f"url({os.path.basename(manifest[font_name])})"
+
+        css = _CSS_URL.sub(rewrite_url, css)
+        manifest[name] = _write_output(name, css.encode('utf-8'))
+
+    for name in JS_ASSETS:
+        source = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(source):
+            print(f"Skipping missing {name} (run with --fetch to download vendor files)")
+            continue
+        with open(source, encoding='utf-8') as handle:
+            js = handle.read()
+        if not name.endswith('.min.js'):
+            js = minify_js(js)
+        manifest[name] = _write_output(name, js.encode('utf-8'))
+
+    with open(os.path.join(DIST_DIR, 'manifest.json'), 'w', encoding='utf-8') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build fingerprinted static assets")
+    parser.add_argument('--fetch', action='store_true', help="Download missing vendor files first")
+    parser.add_argument('--refetch', action='store_true', help="Download all vendor files again")
+    args = parser.parse_args(argv)
+
+    if args.fetch or args.refetch:
+        fetch_vendor_files(force=args.refetch)
+
+    manifest = build()
+    for name, output in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(STATIC_DIR, output))
+        print(f"{name:50} -> {output} ({size:,} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
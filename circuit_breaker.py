@@ -0,0 +1,244 @@
+"""
+Circuit Breaker Module for Quiz Pool App
+Fails database calls fast while SQL Server is unreachable instead of blocking every request
+"""
+
+import random
+import threading
+import time
+
+# Consecutive connectivity failures that open the circuit
+FAILURE_THRESHOLD = 3
+
+# Seconds the circuit stays open before one probe is let through (doubles while probes keep failing)
+RESET_TIMEOUT = 5
+MAX_RESET_TIMEOUT = 60
+
+# Connection attempts per acquisition while the circuit is closed, with jittered backoff between them
+CONNECT_ATTEMPTS = 2
+RETRY_BACKOFF = 0.2
+
+# SQLSTATE class 08 means the connection itself failed (08S01: link dropped mid-statement).
+# A statement timeout (HYT00/HYT01) only says that statement was slow, so it does not count;
+# login timeouts are counted by the failed connect itself.
+CONNECTIVITY_SQLSTATE_CLASS = '08'
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_connectivity_error(error):
+    """True for ODBC errors caused by the connection rather than by the statement"""
+    args = getattr(error, 'args', ())
+    return bool(args) and isinstance(args[0], str) and args[0].startswith(CONNECTIVITY_SQLSTATE_CLASS)
+
+
+def retry_delay(attempt):
+    """Full-jitter exponential backoff, so workers retrying together do not reconnect in lockstep"""
+    return random.uniform(0, RETRY_BACKOFF * (2 ** attempt))
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker shared by every DatabaseManager in the process
+
+    Closed: calls go through and consecutive failures are counted. Open: calls are
+    refused immediately until the reset timeout passes. Half-open: exactly one call
+    is let through as a probe; its success closes the circuit, its failure reopens
+    it for longer. Threads whose calls failed or were refused are noted so the request
+    can be answered with a degraded page instead of empty results.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._open_for = reset_timeout
+        self._probe_in_flight = False
+        self._local = threading.local()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self._open_for:
+                return HALF_OPEN
+            return self._state
+
+    def retry_after(self):
+        """Seconds until the next probe may be let through (0 unless open)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0
+            return max(0, self._open_for - (self._clock() - self._opened_at))
+
+    def acquire(self):
+        """Whether a call may go to the database now; a refusal is remembered for the current thread"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() - self._opened_at >= self._open_for:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+        self._local.unavailable = True
+        return False
+
+    def connected(self):
+        """A connection was opened; closes the circuit if this was the half-open probe
+
+        In the closed state a new connection proves little (a server that accepts logins
+        can still time out every query), so only successful statements reset the count.
+        """
+        with self._lock:
+            if self._state != HALF_OPEN:
+                return
+        self.success()
+
+    def success(self):
+        # Unlocked fast path: the common case is a healthy, closed circuit
+        if self._state == CLOSED and not self._failures:
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._open_for = self.reset_timeout
+            self._probe_in_flight = False
+
+    def failure(self):
+        self._local.unavailable = True
+        with self._lock:
+            if self._state == HALF_OPEN:
+                # The probe failed: stay away longer before trying again
+                self._open_for = min(self._open_for * 2, self.max_reset_timeout)
+                self._trip()
+                return
+            self._failures += 1
+            if self._state == CLOSED and self._failures >= self.failure_threshold:
+                self._trip()
+
+    def _trip(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        print(f"Database circuit opened for {self._open_for}s after repeated connection failures")
+
+    def begin_request(self):
+        """Clears the current thread's unavailable flag at the start of a request"""
+        self._local.unavailable = False
+
+    def unavailable_this_request(self):
+        """Whether a database call failed or was refused on this thread since begin_request()"""
+        return getattr(self._local, 'unavailable', False)
+
+
+class GuardedCursor:
+    """Cursor wrapper that reports connectivity errors to the breaker and marks its connection broken"""
+
+    def __init__(self, cursor, connection):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_connection', connection)
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self._cursor, method)(*args)
+        except Exception as e:
+            self._connection._failed(e)
+            raise
+
+    def execute(self, *args):
+        self._call('execute', *args)
+        self._connection._breaker.success()
+        return self
+
+    def executemany(self, *args):
+        result = self._call('executemany', *args)
+        self._connection._breaker.success()
+        return result
+
+    def fetchone(self):
+        return self._call('fetchone')
+
+    def fetchmany(self, *args):
+        return self._call('fetchmany', *args)
+
+    def fetchall(self):
+        return self._call('fetchall')
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+
+class GuardedConnection:
+    """Connection wrapper tied to a breaker
+
+    After a connectivity error the connection is broken: it tests false, so the usual
+    `if not self.connection: self.connect()` reconnects through the breaker, and its
+    rollback() is a no-op so existing error handlers still run.
+    """
+
+    def __init__(self, connection, breaker):
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, '_breaker', breaker)
+        object.__setattr__(self, 'broken', False)
+
+    def __bool__(self):
+        return not self.broken
+
+    def _failed(self, error):
+        if is_connectivity_error(error):
+            object.__setattr__(self, 'broken', True)
+            self._breaker.failure()
+
+    def cursor(self):
+        try:
+            return GuardedCursor(self._connection.cursor(), self)
+        except Exception as e:
+            self._failed(e)
+            raise
+
+    def commit(self):
+        try:
+            self._connection.commit()
+        except Exception as e:
+            self._failed(e)
+            raise
+
+    def rollback(self):
+        if self.broken:
+            return
+        try:
+            self._connection.rollback()
+        except Exception as e:
+            self._failed(e)
+            raise
+
+    def close(self):
+        try:
+            self._connection.close()
+        except Exception:
+            # Closing a connection the server already dropped is expected to fail
+            pass
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection, name, value)
+
+
+# The primary database is one server, so every DatabaseManager shares one breaker
+db_circuit = CircuitBreaker()
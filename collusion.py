@@ -0,0 +1,208 @@
+"""
+Collusion Module for Quiz Pool App
+Flags pairs of answer sheets with suspiciously many identical wrong answers
+"""
+
+import heapq
+import math
+import random
+from statistics import NormalDist
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+# Cohorts up to this size are compared pair by pair; larger ones go through LSH first
+ALL_PAIRS_LIMIT = 400
+
+# A wrong option chosen by more than this share of the students who got a question wrong is
+# the usual mistake; sharing it says little, so LSH buckets sheets by their other wrong answers
+COMMON_DISTRACTOR_SHARE = 0.5
+
+
+class AnswerSheet:
+    """One graded attempt packed into bitsets over the quiz's questions (bit i = question column i)
+
+    choices[c - 1] holds the questions answered with option c, and wrong the questions
+    answered incorrectly, so comparing two sheets is a handful of AND/popcount operations
+    regardless of the number of questions.
+    """
+
+    __slots__ = ('attempt_id', 'student_id', 'student_name', 'choices', 'answered', 'wrong', 'wrong_tokens')
+
+    def __init__(self, attempt_id, student_id, student_name):
+        self.attempt_id = attempt_id
+        self.student_id = student_id
+        self.student_name = student_name
+        self.choices = [0, 0, 0, 0]
+        self.answered = 0
+        self.wrong = 0
+        # (question column * 4 + choice) for each wrong answer; the set LSH works on
+        self.wrong_tokens = []
+
+    def record(self, column, student_choice, correct_choice):
+        if not 1 <= student_choice <= 4:
+            return
+        bit = 1 << column
+        self.choices[student_choice - 1] |= bit
+        self.answered |= bit
+        if student_choice != correct_choice:
+            self.wrong |= bit
+            self.wrong_tokens.append(column * 4 + student_choice - 1)
+
+
+def build_sheets(rows):
+    """Packs (AttemptID, StudentID, StudentName, question key, StudentChoice, CorrectChoice) rows
+
+    Rows must arrive grouped by attempt. Returns (sheets, wrong choice counts), where the
+    counts are {column: [count of option 1-4 among wrong answers]} for the whole cohort.
+    """
+    columns = {}
+    sheets = []
+    distractors = {}
+    sheet = None
+    for attempt_id, student_id, student_name, question_key, student_choice, correct_choice in rows:
+        if sheet is None or sheet.attempt_id != attempt_id:
+            sheet = AnswerSheet(attempt_id, student_id, student_name)
+            sheets.append(sheet)
+        column = columns.setdefault(question_key, len(columns))
+        sheet.record(column, student_choice, correct_choice)
+        if 1 <= student_choice <= 4 and student_choice != correct_choice:
+            distractors.setdefault(column, [0, 0, 0, 0])[student_choice - 1] += 1
+    return sheets, distractors
+
+
+class CollusionDetector:
+    """Ranks pairs of answer sheets by identical wrong answers beyond what chance explains
+
+    Candidate pairs come from MinHash/LSH over each sheet's set of wrong (question, option)
+    answers, so sheets sharing no unusual wrong answers are never compared. Each candidate
+    is scored with bitset statistics: identical wrong answers are compared against the
+    number expected if the two students had picked distractors independently, at the
+    cohort's observed distractor rates, giving a z-score.
+    """
+
+    def __init__(self, num_perm=48, bands=16, min_shared_wrong=3, false_alarm_rate=0.05, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_shared_wrong = min_shared_wrong
+        self.false_alarm_rate = false_alarm_rate
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+    def _signature(self, tokens):
+        return tuple(min((a * token + b) % _MERSENNE_PRIME for token in tokens) for a, b in self._perms)
+
+    def candidate_pairs(self, sheets, distractors):
+        """Index pairs (i, j) of sheets worth scoring: all pairs for small cohorts, else LSH band collisions"""
+        eligible = [index for index, sheet in enumerate(sheets) if len(sheet.wrong_tokens) >= self.min_shared_wrong]
+        if len(eligible) <= ALL_PAIRS_LIMIT:
+            return {(i, j) for position, i in enumerate(eligible) for j in eligible[position + 1:]}
+
+        common = set()
+        for column, counts in distractors.items():
+            total = sum(counts)
+            common.update(column * 4 + choice for choice, count in enumerate(counts)
+                          if count > COMMON_DISTRACTOR_SHARE * total)
+
+        buckets = {}
+        for index in eligible:
+            tokens = [token for token in sheets[index].wrong_tokens if token not in common]
+            if not tokens:
+                continue
+            signature = self._signature(tokens)
+            for band in range(self.bands):
+                buckets.setdefault((band, signature[band * self.rows:(band + 1) * self.rows]), []).append(index)
+
+        pairs = set()
+        for members in buckets.values():
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    pairs.add((i, j))
+        return pairs
+
+    @staticmethod
+    def _match_rates(distractors):
+        # Chance that two independent wrong answers to a question pick the same option
+        rates = {}
+        for column, counts in distractors.items():
+            total = sum(counts)
+            rates[column] = sum(count * count for count in counts) / (total * total) if total else 0
+        return rates
+
+    def score_pair(self, first, second, match_rates):
+        """Bitset statistics for one pair of sheets"""
+        same_choice = 0
+        for mine, theirs in zip(first.choices, second.choices):
+            same_choice |= mine & theirs
+        both_wrong = first.wrong & second.wrong
+        shared_wrong = same_choice & both_wrong
+
+        # Expected identical wrong answers (and variance) over the questions both got wrong
+        expected = 0.0
+        variance = 0.0
+        remaining = both_wrong
+        while remaining:
+            low_bit = remaining & -remaining
+            rate = match_rates.get(low_bit.bit_length() - 1, 0)
+            expected += rate
+            variance += rate * (1 - rate)
+            remaining ^= low_bit
+
+        shared_count = shared_wrong.bit_count()
+        z_score = (shared_count - expected) / math.sqrt(variance) if variance else 0.0
+        return {
+            'shared_wrong': shared_count,
+            'both_wrong': both_wrong.bit_count(),
+            'same_answers': same_choice.bit_count(),
+            'answered_both': (first.answered & second.answered).bit_count(),
+            'expected_shared_wrong': round(expected, 2),
+            'z_score': round(z_score, 2)
+        }
+
+    def report(self, sheets, distractors, limit=100):
+        """Ranks the candidate pairs, most suspicious first, and flags the ones beyond chance
+
+        A pair is flagged when its z-score clears a threshold corrected for the number of
+        pairs in the cohort (Bonferroni at false_alarm_rate), so a large exam does not
+        flag students just because it contains many pairs.
+        """
+        match_rates = self._match_rates(distractors)
+        pairs = self.candidate_pairs(sheets, distractors)
+        total_pairs = len(sheets) * (len(sheets) - 1) // 2
+        threshold = NormalDist().inv_cdf(1 - self.false_alarm_rate / max(total_pairs, 1))
+
+        ranked = []
+        flagged = 0
+        for i, j in pairs:
+            first, second = sheets[i], sheets[j]
+            # Two attempts by the same student are retakes, not collusion
+            if first.student_id == second.student_id:
+                continue
+            stats = self.score_pair(first, second, match_rates)
+            if stats['shared_wrong'] < self.min_shared_wrong or stats['z_score'] <= 0:
+                continue
+            stats['flagged'] = stats['z_score'] >= threshold
+            flagged += stats['flagged']
+            stats['first'] = {'attempt_id': first.attempt_id, 'student_id': first.student_id,
+                              'student_name': first.student_name}
+            stats['second'] = {'attempt_id': second.attempt_id, 'student_id': second.student_id,
+                               'student_name': second.student_name}
+            ranked.append(stats)
+
+        ranked = heapq.nsmallest(limit, ranked, key=lambda stats: (-stats['z_score'], -stats['shared_wrong']))
+        return {
+            'attempts': len(sheets),
+            'candidate_pairs': len(pairs),
+            'total_pairs': total_pairs,
+            'threshold': round(threshold, 2),
+            'flagged': flagged,
+            'pairs': ranked
+        }
+
+
+# Shared by the teacher pages
+collusion_detector = CollusionDetector()
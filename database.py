@@ -3,32 +3,702 @@ Database Manager Module for Quiz Pool App
 Handles all database operations for the Quiz Pool App
 """
 
-import pyodbc
+import os
+import threading
+import time
+from collections import OrderedDict
+from circuit_breaker import db_circuit, GuardedConnection, HALF_OPEN, CONNECT_ATTEMPTS, retry_delay
+from duplicate_index import duplicate_index
+from quiz_tables import quiz_tables, is_quiz_table_name, quote_table_name, like_pattern, fulltext_condition
+
+
+# Questions shown per page in the question editor
+QUESTION_PAGE_SIZE = 50
+
+# Full-text catalog holding the question search indexes
+FULLTEXT_CATALOG = 'QuizPoolCatalog'
+
+# Monotonic per-quiz version, bumped in the same transaction as every question change
+QUIZ_VERSIONS_DDL = """
+    IF OBJECT_ID('dbo.QuizVersions', 'U') IS NULL
+    CREATE TABLE dbo.QuizVersions (
+        TableName NVARCHAR(128) NOT NULL PRIMARY KEY,
+        Version INT NOT NULL
+    )
+"""
+
+# Immutable published versions of quizzes. Question content lives in QuizQuestionRows and is
+# shared between snapshots; a snapshot only writes new rows for questions that changed
+QUIZ_SNAPSHOTS_DDL = """
+    IF OBJECT_ID('dbo.QuizQuestionRows', 'U') IS NULL
+    CREATE TABLE dbo.QuizQuestionRows (
+        RowID INT IDENTITY(1,1) PRIMARY KEY,
+        Question NVARCHAR(MAX) NOT NULL,
+        Option1 NVARCHAR(MAX) NOT NULL,
+        Option2 NVARCHAR(MAX) NOT NULL,
+        Option3 NVARCHAR(MAX) NOT NULL,
+        Option4 NVARCHAR(MAX) NOT NULL,
+        RightAnswer INT NOT NULL
+    );
+    IF OBJECT_ID('dbo.QuizSnapshots', 'U') IS NULL
+    CREATE TABLE dbo.QuizSnapshots (
+        SnapshotID INT IDENTITY(1,1) PRIMARY KEY,
+        TableName NVARCHAR(128) NOT NULL,
+        Version INT NOT NULL,
+        SourceVersion INT NOT NULL,
+        TimerMinutes INT NOT NULL,
+        NegativeMarking BIT NOT NULL,
+        PublishedDate DATETIME DEFAULT GETDATE(),
+        CONSTRAINT UQ_QuizSnapshots_Version UNIQUE (TableName, Version)
+    );
+    IF OBJECT_ID('dbo.QuizSnapshotQuestions', 'U') IS NULL
+    CREATE TABLE dbo.QuizSnapshotQuestions (
+        SnapshotID INT NOT NULL,
+        Position INT NOT NULL,
+        SourceID INT NOT NULL,
+        RowID INT NOT NULL,
+        PRIMARY KEY (SnapshotID, Position)
+    )
+"""
+
+SELECT_SNAPSHOT_ROWS = """
+    SELECT r.Question, r.Option1, r.Option2, r.Option3, r.Option4, r.RightAnswer, r.RowID
+    FROM dbo.QuizSnapshotQuestions sq JOIN dbo.QuizQuestionRows r ON r.RowID = sq.RowID
+    WHERE sq.SnapshotID = ? ORDER BY sq.Position
+"""
+
+# Published snapshots are cached in process. Their questions only change when an answer key is
+# corrected, which evicts them here; other processes are caught by record_attempt_result
+SNAPSHOT_CACHE_SIZE = 64
+
+# Which registered teacher owns each quiz table; replaces discovering quizzes by name prefix
+QUIZ_OWNERSHIP_DDL = """
+    CREATE TABLE dbo.QuizOwnership (
+        TableName NVARCHAR(128) NOT NULL PRIMARY KEY,
+        TeacherID INT NOT NULL,
+        QuizName NVARCHAR(255) NOT NULL,
+        TimerMinutes INT NOT NULL DEFAULT 0,
+        NegativeMarking BIT NOT NULL DEFAULT 1,
+        CreatedDate DATETIME DEFAULT GETDATE()
+    );
+    CREATE INDEX IX_QuizOwnership_Teacher ON dbo.QuizOwnership (TeacherID, TableName)
+        INCLUDE (QuizName, TimerMinutes, NegativeMarking)
+"""
+
+# Columns every quiz table has; a table without all of them is not a quiz
+QUIZ_COLUMNS = ('Question', 'Option1', 'Option2', 'Option3', 'Option4', 'RightAnswer')
+
+# Tables carrying all the quiz columns
+QUIZ_SCHEMA_QUERY = """
+    SELECT COUNT(*) 
+    FROM INFORMATION_SCHEMA.COLUMNS 
+    WHERE TABLE_SCHEMA = 'dbo' AND TABLE_NAME = ? AND COLUMN_NAME IN (?, ?, ?, ?, ?, ?)
+"""
+
+# Quiz tables are the dbo tables with a RightAnswer column, apart from the shared snapshot rows
+# (callers also drop the other app tables with is_quiz_table_name)
+QUIZ_TABLES_QUERY = """
+    SELECT TABLE_NAME 
+    FROM INFORMATION_SCHEMA.COLUMNS 
+    WHERE TABLE_SCHEMA = 'dbo' AND COLUMN_NAME = 'RightAnswer' AND TABLE_NAME <> 'QuizQuestionRows'
+"""
+
+# Graded attempts and their per-question responses, kept for gradebook exports
+QUIZ_ATTEMPTS_DDL = """
+    IF OBJECT_ID('dbo.QuizAttempts', 'U') IS NULL
+    BEGIN
+        CREATE TABLE dbo.QuizAttempts (
+            AttemptID CHAR(32) NOT NULL PRIMARY KEY,
+            TableName NVARCHAR(128) NOT NULL,
+            SnapshotID INT NULL,
+            StudentID NVARCHAR(255) NOT NULL,
+            StudentName NVARCHAR(255) NOT NULL,
+            Section NVARCHAR(255) NULL,
+            Intake NVARCHAR(255) NULL,
+            University NVARCHAR(255) NULL,
+            StartedDate DATETIME NOT NULL DEFAULT GETDATE(),
+            SubmittedDate DATETIME NULL,
+            Score FLOAT NULL,
+            Total INT NULL,
+            Percentage FLOAT NULL,
+            CorrectAnswers INT NULL,
+            WrongAnswers INT NULL,
+            Unanswered INT NULL,
+            ElapsedSeconds INT NULL,
+            AutoSubmitted BIT NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IX_QuizAttempts_Table ON dbo.QuizAttempts (TableName, StartedDate);
+    END;
+    IF OBJECT_ID('dbo.QuizAttemptResponses', 'U') IS NULL
+    CREATE TABLE dbo.QuizAttemptResponses (
+        AttemptID CHAR(32) NOT NULL,
+        Position INT NOT NULL,
+        StudentChoice TINYINT NOT NULL,
+        CorrectChoice TINYINT NOT NULL,
+        IsCorrect BIT NOT NULL,
+        Points FLOAT NOT NULL,
+        PRIMARY KEY (AttemptID, Position)
+    )
+"""
+
+# Lets a re-grade find the attempts holding one question's responses: its position in each
+# snapshot that contains it, then the attempts pinned to those snapshots
+REGRADE_INDEX_DDL = """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes 
+                   WHERE name = 'IX_QuizSnapshotQuestions_Source' AND object_id = OBJECT_ID('dbo.QuizSnapshotQuestions'))
+    CREATE INDEX IX_QuizSnapshotQuestions_Source ON dbo.QuizSnapshotQuestions (SourceID, SnapshotID) 
+        INCLUDE (Position, RowID);
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes 
+                   WHERE name = 'IX_QuizAttempts_Snapshot' AND object_id = OBJECT_ID('dbo.QuizAttempts'))
+    CREATE INDEX IX_QuizAttempts_Snapshot ON dbo.QuizAttempts (SnapshotID) INCLUDE (SubmittedDate)
+"""
+
+# Latest IRT calibration per quiz: item parameters keyed by source question ID, and student abilities
+QUIZ_IRT_DDL = """
+    IF OBJECT_ID('dbo.QuizItemParameters', 'U') IS NULL
+    CREATE TABLE dbo.QuizItemParameters (
+        TableName NVARCHAR(128) NOT NULL,
+        SourceID INT NOT NULL,
+        Model VARCHAR(3) NOT NULL,
+        Difficulty FLOAT NOT NULL,
+        Discrimination FLOAT NOT NULL,
+        Responses INT NOT NULL,
+        CalibratedDate DATETIME NOT NULL DEFAULT GETDATE(),
+        PRIMARY KEY (TableName, SourceID)
+    );
+    IF OBJECT_ID('dbo.QuizStudentAbilities', 'U') IS NULL
+    CREATE TABLE dbo.QuizStudentAbilities (
+        TableName NVARCHAR(128) NOT NULL,
+        StudentID NVARCHAR(255) NOT NULL,
+        Ability FLOAT NOT NULL,
+        StandardError FLOAT NOT NULL,
+        Responses INT NOT NULL,
+        CalibratedDate DATETIME NOT NULL DEFAULT GETDATE(),
+        PRIMARY KEY (TableName, StudentID)
+    )
+"""
+
+# Rows pulled per round trip when streaming large result sets
+FETCH_BATCH_SIZE = 500
+
+# Seconds of replication lag tolerated before reads fall back to the primary
+DEFAULT_MAX_STALENESS = 5
+
+# Runs on a readable secondary and returns how many seconds it is behind (NULL if suspended)
+REPLICA_LAG_QUERY = """
+    SELECT CASE WHEN is_suspended = 1 THEN NULL
+                ELSE DATEDIFF(SECOND, last_redone_time, last_received_time) END
+    FROM sys.dm_hadr_database_replica_states
+    WHERE is_local = 1 AND database_id = DB_ID()
+"""
+
+
+# Seconds to wait for a login, and for any one statement, before giving up on the server
+LOGIN_TIMEOUT = 5
+QUERY_TIMEOUT = 30
+
+
+def _default_connect(connection_string):
+    # Imported on first connect so loading the app does not load the ODBC driver manager
+    import pyodbc
+    connection = pyodbc.connect(connection_string, timeout=LOGIN_TIMEOUT)
+    connection.timeout = QUERY_TIMEOUT
+    return connection
+
+
+class BatchEditError(Exception):
+    """A batch of question edits was rejected; nothing was written"""
+    
+    def __init__(self, message, operation_index=None, conflict=False):
+        super().__init__(message)
+        self.operation_index = operation_index
+        self.conflict = conflict
+
+
+def validate_question_fields(question, options, right_answer):
+    """Returns an error message for invalid question fields, or None"""
+    if not question:
+        return 'Question cannot be empty.'
+    if len(options) != 4 or any(not opt for opt in options):
+        return 'All options must be filled.'
+    if len(set(options)) != len(options):
+        return 'Options must be unique.'
+    if right_answer not in (1, 2, 3, 4):
+        return 'Correct answer must be 1, 2, 3 or 4.'
+    return None
+
+
+class ReadReplica:
+    """A read-only copy of the database and its last measured freshness"""
+    
+    def __init__(self, connection_string):
+        self.connection_string = connection_string
+        self.fresh_as_of = 0.0
+        self.probed_at = 0.0
+        self.healthy = False
 
 
 class DatabaseManager:
     """Handles all database operations for the Quiz Pool App"""
     
-    def __init__(self):
+    def __init__(self, replica_connection_strings=None, max_staleness=DEFAULT_MAX_STALENESS,
+                 connect_function=None, replica_lag_query=REPLICA_LAG_QUERY):
         self.server = "DESKTOP-UI6PRJS\\SQLEXPRESS"
         self.database = "Anika Database"
         self.connection_string = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={self.server};DATABASE={self.database};Trusted_Connection=yes;"
-        self.connection = None
+        self._connect_function = connect_function or _default_connect
+        # pyodbc connections must not be shared between threads, so each worker thread gets its own
+        self._local = threading.local()
+        
+        # Read replicas, e.g. QUIZ_DB_REPLICAS="REPLICA1\\SQLEXPRESS,REPLICA2\\SQLEXPRESS"
+        if replica_connection_strings is None:
+            servers = [name.strip() for name in os.environ.get('QUIZ_DB_REPLICAS', '').split(',') if name.strip()]
+            replica_connection_strings = [
+                f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};DATABASE={self.database};"
+                f"Trusted_Connection=yes;ApplicationIntent=ReadOnly;"
+                for server in servers
+            ]
+        self.replicas = [ReadReplica(conn_str) for conn_str in replica_connection_strings]
+        self.max_staleness = max_staleness
+        self.replica_lag_query = replica_lag_query
+        self._next_replica = 0
+    
+    @property
+    def connection(self):
+        """Connection owned by the calling thread"""
+        return getattr(self._local, 'connection', None)
+    
+    @connection.setter
+    def connection(self, value):
+        self._local.connection = value
     
     def connect(self):
-        """Establishes connection to SQL Server database"""
-        try:
-            self.connection = pyodbc.connect(self.connection_string)
-            return True
-        except Exception as e:
-            print(f"Database connection error: {e}")
+        """Establishes connection to SQL Server database
+        
+        While the circuit breaker is open this returns False at once instead of waiting
+        out a login timeout; otherwise a failed attempt is retried after a jittered backoff.
+        """
+        if not db_circuit.acquire():
             return False
+        
+        stale = getattr(self._local, 'connection', None)
+        if stale is not None:
+            stale.close()
+            self.connection = None
+        
+        # The half-open probe gets a single attempt so a dead server is detected quickly
+        attempts = 1 if db_circuit.state == HALF_OPEN else CONNECT_ATTEMPTS
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(retry_delay(attempt - 1))
+            try:
+                self.connection = GuardedConnection(self._connect_function(self.connection_string), db_circuit)
+                db_circuit.connected()
+                return True
+            except Exception as e:
+                error = e
+        
+        print(f"Database connection error: {error}")
+        db_circuit.failure()
+        return False
     
     def disconnect(self):
         """Closes database connection"""
-        if self.connection:
+        if getattr(self._local, 'connection', None) is not None:
             self.connection.close()
             self.connection = None
+        for replica_connection in getattr(self._local, 'replica_connections', {}).values():
+            replica_connection.close()
+        self._local.replica_connections = {}
+    
+    def _commit(self):
+        """Commits on the primary and remembers when this thread last wrote"""
+        self.connection.commit()
+        self._local.last_write = time.time()
+    
+    def _maintenance_cursor(self):
+        """Cursor without QUERY_TIMEOUT, for index builds and other DDL that can outlast it
+        
+        The ODBC driver applies the connection's timeout when a cursor is allocated, so it
+        is lifted just for this one and restored for the statements that follow.
+        """
+        timeout = self.connection.timeout
+        self.connection.timeout = 0
+        try:
+            return self.connection.cursor()
+        finally:
+            self.connection.timeout = timeout
+    
+    def last_write_time(self):
+        """When the current thread last committed a write, or 0"""
+        return getattr(self._local, 'last_write', 0)
+    
+    def read_after(self, timestamp):
+        """Requires reads on the current thread to see every write committed up to timestamp
+        
+        Used for read-your-writes: a teacher who just edited a quiz must not read
+        an older copy of it from a lagging replica.
+        """
+        self._local.read_floor = timestamp or 0
+        self._local.last_write = 0
+    
+    def _replica_connection(self, index):
+        connections = getattr(self._local, 'replica_connections', None)
+        if connections is None:
+            connections = self._local.replica_connections = {}
+        if index not in connections:
+            connections[index] = self._connect_function(self.replicas[index].connection_string)
+        return connections[index]
+    
+    def _probe_replica(self, index, now):
+        """Measures a replica's lag; marks it unhealthy if it cannot answer"""
+        replica = self.replicas[index]
+        replica.probed_at = now
+        try:
+            cursor = self._replica_connection(index).cursor()
+            cursor.execute(self.replica_lag_query)
+            row = cursor.fetchone()
+            cursor.close()
+            if row is None or row[0] is None:
+                replica.healthy = False
+                return
+            replica.fresh_as_of = now - max(0, row[0])
+            replica.healthy = True
+        except Exception as e:
+            print(f"Read replica {index} unavailable: {e}")
+            replica.healthy = False
+            self._local.replica_connections.pop(index, None)
+    
+    def _read_connection(self):
+        """Returns a connection for a read-only query: a fresh-enough replica, else the primary"""
+        if self.replicas:
+            now = time.time()
+            floor = max(getattr(self._local, 'read_floor', 0), self.last_write_time())
+            count = len(self.replicas)
+            start = self._next_replica
+            self._next_replica = (start + 1) % count
+            
+            for offset in range(count):
+                index = (start + offset) % count
+                replica = self.replicas[index]
+                # Re-measure lag often enough that the staleness bound is not overshot between probes
+                if now - replica.probed_at > self.max_staleness / 2:
+                    self._probe_replica(index, now)
+                if not replica.healthy:
+                    continue
+                if replica.fresh_as_of >= floor and now - replica.fresh_as_of <= self.max_staleness:
+                    try:
+                        return self._replica_connection(index)
+                    except Exception as e:
+                        print(f"Read replica {index} unavailable: {e}")
+                        replica.healthy = False
+        
+        if not self.connection:
+            if not self.connect():
+                return None
+        return self.connection
+    
+    @staticmethod
+    def _stream_rows(connection, query, *params, batch_size=FETCH_BATCH_SIZE):
+        """Yields rows in fetchmany batches so only one batch is held in memory at a time"""
+        cursor = connection.cursor()
+        try:
+            cursor.arraysize = batch_size
+            cursor.execute(query, *params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+    
+    _versions_ready = False
+    
+    def _bump_version(self, cursor, table_name):
+        """Increments a quiz's version inside the caller's transaction and returns it"""
+        if not DatabaseManager._versions_ready:
+            cursor.execute(QUIZ_VERSIONS_DDL)
+            DatabaseManager._versions_ready = True
+        
+        cursor.execute("UPDATE dbo.QuizVersions SET Version = Version + 1 OUTPUT INSERTED.Version WHERE TableName = ?", table_name)
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+        cursor.execute("INSERT INTO dbo.QuizVersions (TableName, Version) VALUES (?, 1)", table_name)
+        return 1
+    
+    def _locked_version(self, cursor, table_name):
+        """Reads a quiz's version and holds an update lock on it until the transaction ends"""
+        if not DatabaseManager._versions_ready:
+            cursor.execute(QUIZ_VERSIONS_DDL)
+            DatabaseManager._versions_ready = True
+        
+        cursor.execute("SELECT Version FROM dbo.QuizVersions WITH (UPDLOCK, HOLDLOCK) WHERE TableName = ?", table_name)
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    
+    _snapshots_ready = False
+    _snapshot_cache = OrderedDict()
+    _snapshot_cache_lock = threading.Lock()
+    
+    def _ensure_snapshot_tables(self, cursor):
+        if not DatabaseManager._snapshots_ready:
+            cursor.execute(QUIZ_SNAPSHOTS_DDL)
+            DatabaseManager._snapshots_ready = True
+    
+    def _latest_snapshot(self, cursor, table_name, lock=False):
+        """Returns (SnapshotID, Version, SourceVersion) of a quiz's newest snapshot, or None"""
+        hint = " WITH (UPDLOCK, HOLDLOCK)" if lock else ""
+        cursor.execute(f"SELECT TOP 1 SnapshotID, Version, SourceVersion FROM dbo.QuizSnapshots{hint} "
+                       f"WHERE TableName = ? ORDER BY Version DESC", table_name)
+        return cursor.fetchone()
+    
+    def get_current_snapshot(self, table_name):
+        """Returns the snapshot a new attempt should pin, publishing one if the quiz changed since the last
+        
+        Returns {'snapshot_id', 'version', 'changed'} or None if the quiz could not be snapshotted.
+        """
+        if not self.connection:
+            if not self.connect():
+                return None
+        
+        # Cheap unlocked check first; most attempts start on an already published version
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute("""
+                SELECT TOP 1 s.SnapshotID, s.Version
+                FROM dbo.QuizSnapshots s LEFT JOIN dbo.QuizVersions v ON v.TableName = s.TableName
+                WHERE s.TableName = ? AND s.SourceVersion = ISNULL(v.Version, 0)
+                ORDER BY s.Version DESC
+            """, table_name)
+            row = cursor.fetchone()
+            cursor.close()
+            if row:
+                return {'snapshot_id': row[0], 'version': row[1], 'changed': 0}
+        except Exception as e:
+            # The snapshot tables do not exist until the first publish
+            print(f"Error checking quiz snapshot: {e}")
+        
+        return self.publish_quiz_version(table_name)
+    
+    def publish_quiz_version(self, table_name):
+        """Publishes the quiz's current questions as an immutable, numbered snapshot
+        
+        Questions unchanged since the previous snapshot reuse its rows, so only changed
+        questions are copied. If nothing changed the previous snapshot is returned.
+        Returns {'snapshot_id', 'version', 'changed'} or None on failure.
+        """
+        if not self.connection:
+            if not self.connect():
+                return None
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return None
+        
+        cursor = self.connection.cursor()
+        try:
+            self._ensure_snapshot_tables(cursor)
+            # Holding the version lock keeps edits out while the snapshot is taken
+            source_version = self._locked_version(cursor, table_name)
+            latest = self._latest_snapshot(cursor, table_name, lock=True)
+            if latest and latest[2] == source_version:
+                self._commit()
+                return {'snapshot_id': latest[0], 'version': latest[1], 'changed': 0}
+            
+            previous = {}
+            if latest:
+                cursor.execute("""
+                    SELECT sq.SourceID, sq.RowID, r.Question, r.Option1, r.Option2, r.Option3, r.Option4, r.RightAnswer
+                    FROM dbo.QuizSnapshotQuestions sq JOIN dbo.QuizQuestionRows r ON r.RowID = sq.RowID
+                    WHERE sq.SnapshotID = ?
+                """, latest[0])
+                previous = {row[0]: (row[1], tuple(row[2:])) for row in cursor.fetchall()}
+            
+            cursor.execute(quiz_table.select_questions_with_id)
+            live_rows = cursor.fetchall()
+            
+            # Copy-on-write: only questions that differ from the previous snapshot get new rows
+            members = []
+            changed = 0
+            for position, row in enumerate(live_rows):
+                source_id, content = row[0], tuple(row[1:])
+                shared = previous.get(source_id)
+                if shared and shared[1] == content:
+                    row_id = shared[0]
+                else:
+                    cursor.execute("INSERT INTO dbo.QuizQuestionRows (Question, Option1, Option2, Option3, Option4, RightAnswer) "
+                                   "OUTPUT INSERTED.RowID VALUES (?, ?, ?, ?, ?, ?)", *content)
+                    row_id = cursor.fetchone()[0]
+                    changed += 1
+                members.append((position, source_id, row_id))
+            
+            cursor.execute(quiz_table.select_quiz_info)
+            info = cursor.fetchone()
+            version = latest[1] + 1 if latest else 1
+            cursor.execute("INSERT INTO dbo.QuizSnapshots (TableName, Version, SourceVersion, TimerMinutes, NegativeMarking) "
+                           "OUTPUT INSERTED.SnapshotID VALUES (?, ?, ?, ?, ?)",
+                           table_name, version, source_version, (info[0] or 0) if info else 0, bool(info[1]) if info else True)
+            snapshot_id = cursor.fetchone()[0]
+            
+            if members:
+                cursor.fast_executemany = True
+                cursor.executemany("INSERT INTO dbo.QuizSnapshotQuestions (SnapshotID, Position, SourceID, RowID) VALUES (?, ?, ?, ?)",
+                                   [(snapshot_id, position, source_id, row_id) for position, source_id, row_id in members])
+                cursor.fast_executemany = False
+            
+            self._commit()
+            return {'snapshot_id': snapshot_id, 'version': version, 'changed': changed}
+            
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = DatabaseManager._snapshots_ready = False
+            print(f"Error publishing quiz version: {e}")
+            return None
+        finally:
+            cursor.close()
+    
+    def _load_snapshot(self, snapshot_id, primary=False):
+        """Returns a snapshot's (rows, row IDs) in quiz order, from the cache when possible"""
+        with DatabaseManager._snapshot_cache_lock:
+            entry = DatabaseManager._snapshot_cache.get(snapshot_id)
+            if entry is not None:
+                DatabaseManager._snapshot_cache.move_to_end(snapshot_id)
+                return entry
+        
+        if primary:
+            if not self.connection:
+                if not self.connect():
+                    return [], []
+            connection = self.connection
+        else:
+            connection = self._read_connection()
+            if not connection:
+                return [], []
+        
+        try:
+            rows = []
+            row_ids = []
+            for row in self._stream_rows(connection, SELECT_SNAPSHOT_ROWS, snapshot_id):
+                rows.append(tuple(row[:6]))
+                row_ids.append(row[6])
+        except Exception as e:
+            print(f"Error retrieving quiz snapshot: {e}")
+            return [], []
+        
+        # An empty result may be a replica that has not caught up yet, so it is not cached
+        if rows:
+            with DatabaseManager._snapshot_cache_lock:
+                DatabaseManager._snapshot_cache[snapshot_id] = (rows, row_ids)
+                while len(DatabaseManager._snapshot_cache) > SNAPSHOT_CACHE_SIZE:
+                    DatabaseManager._snapshot_cache.popitem(last=False)
+        return rows, row_ids
+    
+    def get_snapshot_rows(self, snapshot_id, primary=False):
+        """Returns a snapshot's (Question, Option1-4, RightAnswer) rows in quiz order
+        
+        primary reads from the primary instead of a replica, for callers that cannot
+        take a lagging replica's empty answer for the snapshot (e.g. background grading).
+        """
+        return self._load_snapshot(snapshot_id, primary)[0]
+    
+    def get_snapshot_row_ids(self, snapshot_id):
+        """Returns the QuizQuestionRows IDs of a snapshot's questions in quiz order"""
+        return self._load_snapshot(snapshot_id)[1]
+    
+    def get_latest_snapshot_id(self, table_name):
+        """Returns the ID of a quiz's newest published snapshot, or None if it was never published"""
+        connection = self._read_connection()
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT TOP 1 SnapshotID FROM dbo.QuizSnapshots WHERE TableName = ? ORDER BY Version DESC", table_name)
+            row = cursor.fetchone()
+            cursor.close()
+            return row[0] if row else None
+            
+        except Exception as e:
+            print(f"Error getting latest quiz snapshot: {e}")
+            return None
+    
+    def get_snapshot_questions(self, snapshot_id):
+        """Retrieves a snapshot's questions as (question, options, correct) tuples"""
+        return [(row[0], list(row[1:5]), row[5]) for row in self.get_snapshot_rows(snapshot_id)]
+
+    def get_snapshot_table(self, snapshot_id):
+        """Returns the quiz table a snapshot was published from, or None if there is no such snapshot"""
+        connection = self._read_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT TableName FROM dbo.QuizSnapshots WHERE SnapshotID = ?", snapshot_id)
+            row = cursor.fetchone()
+            cursor.close()
+            return row[0] if row else None
+
+        except Exception as e:
+            print(f"Error getting quiz snapshot: {e}")
+            return None
+
+    def get_quiz_version(self, table_name):
+        """Gets the current version of a quiz's questions (0 if never edited)"""
+        connection = self._read_connection()
+        if not connection:
+            return None
+        
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT Version FROM dbo.QuizVersions WHERE TableName = ?", table_name)
+            row = cursor.fetchone()
+            cursor.close()
+            return row[0] if row else 0
+            
+        except Exception as e:
+            # The versions table does not exist until the first edit
+            print(f"Error getting quiz version: {e}")
+            return 0
+    
+    def _quiz_table(self, table_name):
+        """Resolves a route-level quiz name to a validated table handle, or None"""
+        handle = quiz_tables.get(table_name)
+        if handle is None:
+            if not is_quiz_table_name(table_name):
+                print(f"Rejected invalid quiz table name: {table_name!r}")
+                return None
+            
+            if not self.has_quiz_schema(table_name):
+                print(f"Quiz table not found: {table_name}")
+                return None
+            
+            handle = quiz_tables.add(table_name)
+        
+        if not handle.sort_ready and not self._ensure_sort_column(handle):
+            return None
+        return handle
+    
+    def _ensure_sort_column(self, quiz_table):
+        """Adds the SortOrder column to a quiz table created before questions could be reordered"""
+        if not self.connection:
+            if not self.connect():
+                return False
+        
+        try:
+            cursor = self._maintenance_cursor()
+            cursor.execute(quiz_table.add_sort_column)
+            self._commit()
+            cursor.close()
+            quiz_table.sort_ready = True
+            return True
+            
+        except Exception as e:
+            self.connection.rollback()
+            print(f"Error preparing quiz table: {e}")
+            return False
     
     def create_quiz_table(self, table_name):
         """Creates a new table for a quiz subject with the required columns"""
@@ -41,19 +711,20 @@ class DatabaseManager:
             
             # Create table with 6 columns: Question, Option1, Option2, Option3, Option4, RightAnswer
             create_table_query = f"""
-            CREATE TABLE dbo.{table_name} (
+            CREATE TABLE {quote_table_name(table_name)} (
                 ID INT IDENTITY(1,1) PRIMARY KEY,
                 Question NVARCHAR(MAX) NOT NULL,
                 Option1 NVARCHAR(MAX) NOT NULL,
                 Option2 NVARCHAR(MAX) NOT NULL,
                 Option3 NVARCHAR(MAX) NOT NULL,
                 Option4 NVARCHAR(MAX) NOT NULL,
-                RightAnswer INT NOT NULL CHECK (RightAnswer IN (1, 2, 3, 4))
+                RightAnswer INT NOT NULL CHECK (RightAnswer IN (1, 2, 3, 4)),
+                SortOrder INT NULL
             )
             """
             
             cursor.execute(create_table_query)
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
             
@@ -83,74 +754,446 @@ class DatabaseManager:
             print(f"Error checking table existence: {e}")
             return False
     
-    def insert_question(self, table_name, question, option1, option2, option3, option4, right_answer):
-        """Inserts a new question into the specified quiz table"""
+    def has_quiz_schema(self, table_name):
+        """Checks that a dbo table exists with every quiz column, so that it can be treated as a quiz"""
         if not self.connection:
             if not self.connect():
                 return False
         
         try:
             cursor = self.connection.cursor()
-            insert_query = f"""
-            INSERT INTO dbo.{table_name} (Question, Option1, Option2, Option3, Option4, RightAnswer)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """
-            
-            cursor.execute(insert_query, question, option1, option2, option3, option4, right_answer)
-            self.connection.commit()
+            cursor.execute(QUIZ_SCHEMA_QUERY, table_name, *QUIZ_COLUMNS)
+            has_schema = cursor.fetchone()[0] == len(QUIZ_COLUMNS)
             cursor.close()
-            return True
+            return has_schema
             
         except Exception as e:
+            print(f"Error checking quiz table: {e}")
+            return False
+    
+    def insert_question(self, table_name, question, option1, option2, option3, option4, right_answer):
+        """Inserts a new question into the specified quiz table"""
+        if not self.connection:
+            if not self.connect():
+                return False
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return False
+        
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(quiz_table.insert_question, question, option1, option2, option3, option4, right_answer)
+            question_id = cursor.fetchone()[0]
+            self._bump_version(cursor, table_name)
+            self._commit()
+            
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = False
             print(f"Error inserting question: {e}")
             return False
+        finally:
+            cursor.close()
+        
+        duplicate_index.add((table_name, question_id), question)
+        return True
     
     def get_all_questions(self, table_name):
         """Retrieves all questions from a quiz table"""
+        try:
+            return list(self.iter_questions(table_name))
+            
+        except Exception as e:
+            print(f"Error retrieving questions: {e}")
+            return []
+    
+    def iter_questions(self, table_name, batch_size=FETCH_BATCH_SIZE):
+        """Streams (question, options, correct) tuples from a quiz table
+        
+        Database errors are raised to the caller, since part of the quiz may already have been consumed.
+        """
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return
+        
+        for row in self._stream_rows(connection, quiz_table.select_questions, batch_size=batch_size):
+            yield (row[0], [row[1], row[2], row[3], row[4]], row[5])
+    
+    def get_questions_page(self, table_name, after_id=None, before_id=None, search=None, page_size=QUESTION_PAGE_SIZE):
+        """Gets one page of questions in quiz order using keyset pagination
+        
+        Pass after_id to page forward or before_id to page backward. search matches
+        question and option text, through the full-text index when the table has one.
+        """
+        empty = {'questions': [], 'has_next': False, 'has_prev': False, 'total': 0}
+        connection = self._read_connection()
+        if not connection:
+            return empty
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return empty
+        
+        try:
+            cursor = connection.cursor()
+            
+            search = (search or '').strip()
+            search_params = []
+            search_mode = None
+            if search:
+                if quiz_table.fulltext is None:
+                    cursor.execute("SELECT OBJECTPROPERTY(OBJECT_ID(?), 'TableHasActiveFulltextIndex')", quiz_table.quoted)
+                    row = cursor.fetchone()
+                    quiz_table.fulltext = bool(row and row[0])
+                condition = fulltext_condition(search) if quiz_table.fulltext else ''
+                if condition:
+                    search_mode = 'fulltext'
+                    search_params = [condition]
+                else:
+                    search_mode = 'like'
+                    search_params = [like_pattern(search)] * len(quiz_table.SEARCH_COLUMNS)
+            
+            backward = before_id is not None
+            direction = 'before' if backward else 'after'
+            boundary = before_id if backward else (after_id or 0)
+            
+            # One extra row tells us whether another page exists in this direction
+            cursor.execute(quiz_table.page_questions[(direction, search_mode)],
+                           page_size + 1, boundary, boundary, *search_params)
+            rows = cursor.fetchall()
+            more = len(rows) > page_size
+            rows = rows[:page_size]
+            if backward:
+                rows.reverse()
+            
+            cursor.execute(quiz_table.count_questions)
+            total = cursor.fetchone()[0]
+            cursor.close()
+            
+            return {
+                'questions': [{
+                    'id': row[0],
+                    'question': row[1],
+                    'options': [row[2], row[3], row[4], row[5]],
+                    'correct': row[6]
+                } for row in rows],
+                'has_next': (not backward and more) or (backward and bool(rows)),
+                'has_prev': (backward and more) or (not backward and boundary > 0),
+                'total': total
+            }
+            
+        except Exception as e:
+            print(f"Error getting questions page: {e}")
+            return empty
+    
+    def enable_question_search(self, table_name):
+        """Creates a full-text index over question and option text, if full-text search is installed"""
         if not self.connection:
             if not self.connect():
-                return []
+                return False
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return False
         
+        cursor = None
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"SELECT Question, Option1, Option2, Option3, Option4, RightAnswer FROM dbo.{table_name}")
+            cursor = self._maintenance_cursor()
+            cursor.execute("SELECT CAST(SERVERPROPERTY('IsFullTextInstalled') AS INT)")
+            row = cursor.fetchone()
+            if not row or not row[0]:
+                quiz_table.fulltext = False
+                return False
             
-            questions = []
-            for row in cursor.fetchall():
-                question_text = row[0]
-                options = [row[1], row[2], row[3], row[4]]
-                correct_answer = row[5]
-                questions.append((question_text, options, correct_answer))
+            cursor.execute("SELECT name FROM sys.indexes WHERE object_id = OBJECT_ID(?) AND is_primary_key = 1", quiz_table.quoted)
+            row = cursor.fetchone()
+            if not row:
+                return False
+            key_index = row[0].replace(']', ']]')
+            
+            # Full-text DDL cannot run inside a user transaction
+            self.connection.autocommit = True
+            cursor.execute(f"IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = '{FULLTEXT_CATALOG}') "
+                           f"CREATE FULLTEXT CATALOG {FULLTEXT_CATALOG}")
+            cursor.execute(f"CREATE FULLTEXT INDEX ON {quiz_table.quoted} ({', '.join(quiz_table.SEARCH_COLUMNS)}) "
+                           f"KEY INDEX [{key_index}] ON {FULLTEXT_CATALOG} WITH CHANGE_TRACKING AUTO")
+            quiz_table.fulltext = True
+            return True
             
-            cursor.close()
-            return questions
+        except Exception as e:
+            print(f"Error enabling question search: {e}")
+            return False
+        
+        finally:
+            if cursor:
+                cursor.close()
+            if self.connection:
+                self.connection.autocommit = False
+    
+    def _load_duplicate_index(self):
+        """Indexes every existing question once, the first time duplicates are looked up"""
+        if duplicate_index.loaded:
+            return True
+        
+        connection = self._read_connection()
+        if not connection:
+            return False
+        
+        try:
+            table_names = [row[0] for row in self._stream_rows(connection, QUIZ_TABLES_QUERY)]
+            for table_name in table_names:
+                if not is_quiz_table_name(table_name):
+                    continue
+                quiz_table = quiz_tables.add(table_name)
+                for question_id, question in self._stream_rows(connection, quiz_table.select_question_texts):
+                    duplicate_index.add((table_name, question_id), question)
+            
+            duplicate_index.loaded = True
+            return True
             
         except Exception as e:
-            print(f"Error retrieving questions: {e}")
+            print(f"Error loading duplicate index: {e}")
+            return False
+    
+    def find_similar_questions(self, question, table_name=None, question_id=None, tables=None):
+        """Finds existing questions that duplicate or nearly duplicate the given text
+        
+        table_name and question_id identify the question being edited, so it does not match itself.
+        tables limits the search to those quiz tables (e.g. the teacher's own); None searches every quiz.
+        """
+        if not self._load_duplicate_index():
             return []
+        
+        exclude = (table_name, question_id) if question_id is not None else None
+        include = (lambda key: key[0] in tables) if tables is not None else None
+        return [{
+            'table_name': match['key'][0],
+            'question_id': match['key'][1],
+            'question': match['text'],
+            'similarity': match['similarity'],
+            'exact': match['exact']
+        } for match in duplicate_index.find(question, exclude=exclude, include=include)]
     
     def update_question(self, table_name, question_id, question, option1, option2, option3, option4, right_answer):
-        """Updates an existing question in the quiz table"""
+        """Updates an existing question in the quiz table
+        
+        A changed answer key re-grades the question's stored results and published versions
+        in the same transaction (see _regrade_source), so the edit and the re-grade land together.
+        Returns {'regraded': list of changed attempts, or None if the key did not change}, or
+        False if the question could not be updated.
+        """
         if not self.connection:
             if not self.connect():
                 return False
         
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return False
+        
+        cursor = self.connection.cursor()
         try:
-            cursor = self.connection.cursor()
-            update_query = f"""
-            UPDATE dbo.{table_name} 
-            SET Question = ?, Option1 = ?, Option2 = ?, Option3 = ?, Option4 = ?, RightAnswer = ?
-            WHERE ID = ?
-            """
+            # The version lock keeps other edits of this quiz out until the re-grade is done
+            self._locked_version(cursor, table_name)
+            cursor.execute(quiz_table.select_question_by_id, question_id)
+            previous = cursor.fetchone()
+            if not previous:
+                self.connection.rollback()
+                return False
             
-            cursor.execute(update_query, question, option1, option2, option3, option4, right_answer, question_id)
-            self.connection.commit()
-            cursor.close()
-            return True
+            cursor.execute(quiz_table.update_question, question, option1, option2, option3, option4, right_answer, question_id)
+            regraded = None
+            snapshot_ids = ()
+            if previous[6] != right_answer:
+                regraded, snapshot_ids = self._regrade_source(cursor, table_name, question_id, previous[1], right_answer)
+            self._bump_version(cursor, table_name)
+            self._commit()
             
         except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = DatabaseManager._regrade_ready = False
             print(f"Error updating question: {e}")
             return False
+        finally:
+            cursor.close()
+        
+        self._evict_snapshots(snapshot_ids)
+        duplicate_index.add((table_name, question_id), question)
+        return {'regraded': regraded}
+    
+    def apply_question_batch(self, table_name, operations, base_version=None):
+        """Applies many question changes in one transaction with a single commit
+        
+        Each operation is a dict with an 'op' key:
+            {'op': 'add', 'question': ..., 'options': [4 strings], 'correct': 1-4}
+            {'op': 'edit', 'id': ..., 'question': ..., 'options': [...], 'correct': 1-4}
+            {'op': 'delete', 'id': ...}
+            {'op': 'reorder', 'order': [ids in their new order]}
+        Operations apply in sequence. Reordering changes only where the listed questions
+        appear; each question keeps its ID, so edits and deletes after a reorder still
+        name the same question.
+        
+        Questions whose answer key ends up changed are re-graded in the same transaction.
+        
+        Returns {'version': new version, 'added': [new IDs], 'regraded': [changed attempts]}.
+        Raises BatchEditError if the batch is invalid, names a question that does not exist,
+        or base_version is stale; nothing is written in that case.
+        """
+        normalized = self._normalize_batch(operations)
+        
+        if not self.connection:
+            if not self.connect():
+                raise BatchEditError('Database unavailable.')
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            raise BatchEditError('Quiz not found.')
+        
+        cursor = self.connection.cursor()
+        index_updates = []
+        added = []
+        try:
+            # Optimistic concurrency: reject edits made against an outdated copy of the quiz
+            current_version = self._locked_version(cursor, table_name)
+            if base_version is not None and base_version != current_version:
+                raise BatchEditError(f'Quiz changed since version {base_version} (now {current_version}).', conflict=True)
+            
+            # The version lock keeps other edits out, so this stays accurate as the batch is applied
+            cursor.execute(quiz_table.select_answer_keys)
+            original = {row[0]: (row[2], row[1]) for row in cursor.fetchall()}
+            existing = set(original)
+            final_keys = {}
+            
+            position = 0
+            while position < len(normalized):
+                kind = normalized[position][0]
+                # Consecutive edits or deletes go to the server as one array-bound statement
+                run_end = position + 1
+                if kind in ('edit', 'delete'):
+                    while run_end < len(normalized) and normalized[run_end][0] == kind:
+                        run_end += 1
+                run = normalized[position:run_end]
+                if kind in ('edit', 'delete'):
+                    for index, operation in enumerate(run, start=position):
+                        if operation[1] not in existing:
+                            raise BatchEditError(f'Question {operation[1]} not found.', index)
+                        if kind == 'delete':
+                            existing.discard(operation[1])
+                
+                if kind == 'add':
+                    _, question, options, correct = run[0]
+                    cursor.execute(quiz_table.insert_question, question, *options, correct)
+                    question_id = cursor.fetchone()[0]
+                    existing.add(question_id)
+                    added.append(question_id)
+                    index_updates.append(('add', question_id, question))
+                elif kind == 'edit':
+                    cursor.fast_executemany = True
+                    cursor.executemany(quiz_table.update_question,
+                                       [(question, *options, correct, question_id) for _, question_id, question, options, correct in run])
+                    cursor.fast_executemany = False
+                    index_updates.extend(('add', question_id, question) for _, question_id, question, _, _ in run)
+                    final_keys.update((question_id, correct) for _, question_id, _, _, correct in run)
+                elif kind == 'delete':
+                    cursor.fast_executemany = True
+                    cursor.executemany(quiz_table.delete_question, [(question_id,) for _, question_id in run])
+                    cursor.fast_executemany = False
+                    index_updates.extend(('remove', question_id, None) for _, question_id in run)
+                else:
+                    self._reorder_questions(cursor, quiz_table, run[0][1], position)
+                
+                position = run_end
+            
+            regraded = []
+            snapshot_ids = set()
+            for question_id, right_answer in final_keys.items():
+                if question_id in original and question_id in existing and original[question_id][1] != right_answer:
+                    changed, snapshots = self._regrade_source(cursor, table_name, question_id, original[question_id][0], right_answer)
+                    regraded.extend(changed)
+                    snapshot_ids.update(snapshots)
+            
+            version = self._bump_version(cursor, table_name)
+            self._commit()
+            
+        except BatchEditError:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = False
+            raise
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = DatabaseManager._regrade_ready = False
+            print(f"Error applying question batch: {e}")
+            raise BatchEditError('Batch could not be applied; no changes were saved.')
+        finally:
+            cursor.close()
+        
+        self._evict_snapshots(snapshot_ids)
+        for action, question_id, question in index_updates:
+            if action == 'add':
+                duplicate_index.add((table_name, question_id), question)
+            else:
+                duplicate_index.remove((table_name, question_id))
+        
+        return {'version': version, 'added': added, 'regraded': regraded}
+    
+    @staticmethod
+    def _normalize_batch(operations):
+        """Validates a batch up front and converts it to tuples, so bad input never reaches the database"""
+        if not isinstance(operations, list) or not operations:
+            raise BatchEditError('No operations given.')
+        
+        normalized = []
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                raise BatchEditError('Operation must be an object.', index)
+            kind = operation.get('op')
+            try:
+                if kind in ('add', 'edit'):
+                    question = str(operation.get('question', '')).strip()
+                    options = [str(opt).strip() for opt in operation.get('options') or []]
+                    correct = int(operation.get('correct', 0))
+                    error = validate_question_fields(question, options, correct)
+                    if error:
+                        raise BatchEditError(error, index)
+                    if kind == 'add':
+                        normalized.append(('add', question, options, correct))
+                    else:
+                        normalized.append(('edit', int(operation['id']), question, options, correct))
+                elif kind == 'delete':
+                    normalized.append(('delete', int(operation['id'])))
+                elif kind == 'reorder':
+                    order = [int(question_id) for question_id in operation.get('order') or []]
+                    if len(set(order)) != len(order):
+                        raise BatchEditError('Reorder lists a question twice.', index)
+                    normalized.append(('reorder', order))
+                else:
+                    raise BatchEditError(f'Unknown operation: {kind!r}', index)
+            except (KeyError, TypeError, ValueError):
+                raise BatchEditError('Operation has a missing or invalid field.', index)
+        return normalized
+    
+    def _reorder_questions(self, cursor, quiz_table, order, operation_index):
+        """Sets SortOrder so the listed questions appear in the given order
+        
+        The listed questions swap sort keys among themselves, so unlisted questions keep
+        their places and the keys stay unique; question content and IDs are not touched.
+        """
+        cursor.execute(quiz_table.select_sort_keys)
+        keys = {row[0]: row[1] for row in cursor.fetchall()}
+        missing = [question_id for question_id in order if question_id not in keys]
+        if missing:
+            raise BatchEditError(f'Questions not found: {missing}', operation_index)
+        
+        moves = [(key, question_id) for key, question_id in zip(sorted(keys[question_id] for question_id in order), order)
+                 if keys[question_id] != key]
+        if moves:
+            cursor.fast_executemany = True
+            cursor.executemany(quiz_table.update_sort_order, moves)
+            cursor.fast_executemany = False
     
     def delete_question(self, table_name, question_id):
         """Deletes a question from the quiz table"""
@@ -158,26 +1201,40 @@ class DatabaseManager:
             if not self.connect():
                 return False
         
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return False
+        
+        cursor = self.connection.cursor()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"DELETE FROM dbo.{table_name} WHERE ID = ?", question_id)
-            self.connection.commit()
-            cursor.close()
-            return True
+            cursor.execute(quiz_table.delete_question, question_id)
+            self._bump_version(cursor, table_name)
+            self._commit()
             
         except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = False
             print(f"Error deleting question: {e}")
             return False
+        finally:
+            cursor.close()
+        
+        duplicate_index.remove((table_name, question_id))
+        return True
     
     def get_question_by_id(self, table_name, question_id):
         """Gets a specific question by ID"""
-        if not self.connection:
-            if not self.connect():
-                return None
+        connection = self._read_connection()
+        if not connection:
+            return None
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return None
         
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"SELECT ID, Question, Option1, Option2, Option3, Option4, RightAnswer FROM dbo.{table_name} WHERE ID = ?", question_id)
+            cursor = connection.cursor()
+            cursor.execute(quiz_table.select_question_by_id, question_id)
             
             row = cursor.fetchone()
             if row:
@@ -199,28 +1256,28 @@ class DatabaseManager:
     
     def get_all_quiz_tables(self):
         """Gets all quiz tables (excluding system tables)"""
-        if not self.connection:
-            if not self.connect():
-                return []
-        
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
+            return list(self.iter_quiz_tables())
+            
+        except Exception as e:
+            print(f"Error getting quiz tables: {e}")
+            return []
+    
+    def iter_quiz_tables(self, batch_size=FETCH_BATCH_SIZE):
+        """Streams quiz table names; database errors are raised to the caller"""
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        for row in self._stream_rows(connection, """
                 SELECT TABLE_NAME 
                 FROM INFORMATION_SCHEMA.TABLES 
                 WHERE TABLE_SCHEMA = 'dbo' 
                 AND TABLE_NAME NOT LIKE 'sys%'
                 AND TABLE_NAME NOT IN ('dtproperties')
                 ORDER BY TABLE_NAME
-            """)
-            
-            tables = [row[0] for row in cursor.fetchall()]
-            cursor.close()
-            return tables
-            
-        except Exception as e:
-            print(f"Error getting quiz tables: {e}")
-            return []
+            """, batch_size=batch_size):
+            yield row[0]
     
     def drop_table(self, table_name):
         """Drops a quiz table"""
@@ -228,16 +1285,30 @@ class DatabaseManager:
             if not self.connect():
                 return False
         
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return False
+        
+        cursor = self.connection.cursor()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"DROP TABLE dbo.{table_name}")
-            self.connection.commit()
-            cursor.close()
-            return True
+            cursor.execute(quiz_table.drop)
+            # Keeps versions monotonic so a quiz recreated under this name never matches an old snapshot
+            self._bump_version(cursor, table_name)
+            if self._ensure_ownership_index(cursor):
+                cursor.execute("DELETE FROM dbo.QuizOwnership WHERE TableName = ?", table_name)
+            self._commit()
             
         except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._versions_ready = DatabaseManager._ownership_ready = False
             print(f"Error dropping table: {e}")
             return False
+        finally:
+            cursor.close()
+        
+        quiz_tables.forget(table_name)
+        duplicate_index.remove_where(lambda key: key[0] == table_name)
+        return True
     
     def create_registered_teachers_table(self):
         """Creates the RegisteredTeachers table for storing teacher login credentials"""
@@ -261,7 +1332,7 @@ class DatabaseManager:
             """
             
             cursor.execute(create_table_query)
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
             
@@ -271,29 +1342,27 @@ class DatabaseManager:
     
     def get_all_teachers(self):
         """Gets all teachers from the Teachers table"""
-        if not self.connection:
-            if not self.connect():
-                return []
-        
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT ID, TeacherName, EducationMailID FROM dbo.Teachers ORDER BY TeacherName")
-            
-            teachers = []
-            for row in cursor.fetchall():
-                teachers.append({
-                    'id': row[0],
-                    'name': row[1],
-                    'email': row[2]
-                })
-            
-            cursor.close()
-            return teachers
+            return list(self.iter_teachers())
             
         except Exception as e:
             print(f"Error getting teachers: {e}")
             return []
     
+    def iter_teachers(self, batch_size=FETCH_BATCH_SIZE):
+        """Streams teacher dicts from the Teachers table; database errors are raised to the caller"""
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        for row in self._stream_rows(connection, "SELECT ID, TeacherName, EducationMailID FROM dbo.Teachers ORDER BY TeacherName",
+                                     batch_size=batch_size):
+            yield {
+                'id': row[0],
+                'name': row[1],
+                'email': row[2]
+            }
+    
     def validate_teacher_email(self, teacher_id, email):
         """Validates if the email matches the teacher's email in the database"""
         if not self.connection:
@@ -330,7 +1399,7 @@ class DatabaseManager:
             """
             
             cursor.execute(insert_query, teacher_id, teacher_name, email, password)
-            self.connection.commit()
+            self._commit()
             cursor.close()
             return True
             
@@ -370,80 +1439,345 @@ class DatabaseManager:
             print(f"Error authenticating teacher: {e}")
             return None
     
-    def create_teacher_folder(self, teacher_id, teacher_name):
-        """Creates a folder/namespace for a teacher's quizzes"""
-        if not self.connection:
-            if not self.connect():
-                return False
+    def create_teacher_folder(self, teacher_id, teacher_name):
+        """Creates a folder/namespace for a teacher's quizzes"""
+        if not self.connection:
+            if not self.connect():
+                return False
+        
+        try:
+            # Create a folder table for the teacher
+            folder_name = f"Teacher_{teacher_id}_{teacher_name.replace(' ', '_')}"
+            cursor = self.connection.cursor()
+            
+            # Check if folder already exists
+            cursor.execute("SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = ?", f"{folder_name}_Metadata")
+            folder_exists = cursor.fetchone()[0] > 0
+            
+            if folder_exists:
+                print(f"Teacher folder already exists: {folder_name}_Metadata")
+                cursor.close()
+                return True
+            
+            # Create a metadata table for the teacher's folder
+            create_folder_query = f"""
+            CREATE TABLE {quote_table_name(folder_name + '_Metadata')} (
+                ID INT IDENTITY(1,1) PRIMARY KEY,
+                QuizName NVARCHAR(255) NOT NULL,
+                QuizTableName NVARCHAR(255) NOT NULL,
+                TimerMinutes INT DEFAULT 0,
+                NegativeMarking BIT DEFAULT 1,
+                CreatedDate DATETIME DEFAULT GETDATE(),
+                LastModified DATETIME DEFAULT GETDATE(),
+                QuestionCount INT DEFAULT 0
+            )
+            """
+            
+            cursor.execute(create_folder_query)
+            self._commit()
+            cursor.close()
+            print(f"Teacher folder created: {folder_name}_Metadata")
+            return True
+            
+        except Exception as e:
+            print(f"Error creating teacher folder: {e}")
+            return False
+    
+    _ownership_ready = False
+    
+    def _ensure_ownership_index(self, cursor):
+        """Creates the ownership index on first use, filling it from the old naming convention
+        
+        Returns False if the index could not be created (e.g. no DDL permission).
+        """
+        if DatabaseManager._ownership_ready:
+            return True
+        
+        try:
+            cursor.execute("SELECT OBJECT_ID('dbo.QuizOwnership', 'U')")
+            if cursor.fetchone()[0] is None:
+                ddl_cursor = self._maintenance_cursor()
+                try:
+                    ddl_cursor.execute(QUIZ_OWNERSHIP_DDL)
+                    self._migrate_quiz_ownership(ddl_cursor)
+                finally:
+                    ddl_cursor.close()
+            DatabaseManager._ownership_ready = True
+            return True
+            
+        except Exception as e:
+            print(f"Error creating quiz ownership index: {e}")
+            return False
+    
+    def migrate_quiz_ownership(self):
+        """Assigns every quiz not yet in the ownership index to a teacher; returns how many were assigned"""
+        if not self.connection:
+            if not self.connect():
+                return 0
+        
+        cursor = self._maintenance_cursor()
+        try:
+            cursor.execute("SELECT OBJECT_ID('dbo.QuizOwnership', 'U')")
+            if cursor.fetchone()[0] is None:
+                cursor.execute(QUIZ_OWNERSHIP_DDL)
+            assigned = self._migrate_quiz_ownership(cursor)
+            self._commit()
+            DatabaseManager._ownership_ready = True
+            return assigned
+            
+        except Exception as e:
+            self.connection.rollback()
+            print(f"Error migrating quiz ownership: {e}")
+            return 0
+        finally:
+            cursor.close()
+    
+    def _migrate_quiz_ownership(self, cursor):
+        """Fills the ownership index from teacher folders and the table name prefix convention
+        
+        A quiz listed in a teacher's Teacher_{id}_{name}_Metadata folder goes to that teacher.
+        Any other quiz goes to the registered teacher with the longest matching name prefix, so
+        "Ann_Lee_Math" belongs to Ann Lee rather than Ann.
+        """
+        cursor.execute("SELECT TeacherID, TeacherName FROM dbo.RegisteredTeachers WHERE IsActive = 1")
+        teachers = [(row[0], row[1]) for row in cursor.fetchall()]
+        
+        cursor.execute("SELECT TableName FROM dbo.QuizOwnership")
+        owned = {row[0] for row in cursor.fetchall()}
+        cursor.execute(QUIZ_TABLES_QUERY)
+        unowned = sorted(row[0] for row in cursor.fetchall() if row[0] not in owned and is_quiz_table_name(row[0]))
+        
+        cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = 'dbo' AND TABLE_NAME LIKE 'Teacher[_]%[_]Metadata'")
+        folders = {row[0] for row in cursor.fetchall()}
+        
+        owners = {}
+        for teacher_id, teacher_name in teachers:
+            folder = f"Teacher_{teacher_id}_{teacher_name.replace(' ', '_')}_Metadata"
+            if folder in folders:
+                cursor.execute(f"SELECT QuizTableName, QuizName FROM {quote_table_name(folder)}")
+                for quiz_table_name, quiz_name in cursor.fetchall():
+                    owners[quiz_table_name] = (teacher_id, quiz_name)
+        
+        prefixes = sorted(((teacher_name.replace(' ', '_').replace('-', '_') + '_', teacher_id) for teacher_id, teacher_name in teachers),
+                          key=lambda prefix: len(prefix[0]), reverse=True)
+        rows = []
+        for table_name in unowned:
+            owner = owners.get(table_name)
+            if owner is None:
+                prefix, teacher_id = next(((prefix, teacher_id) for prefix, teacher_id in prefixes
+                                           if table_name.startswith(prefix)), (None, None))
+                if prefix is None:
+                    continue
+                owner = (teacher_id, table_name[len(prefix):].replace('_', ' ').title())
+            
+            quiz_table = quiz_tables.add(table_name)
+            cursor.execute(quiz_table.select_quiz_info)
+            info = cursor.fetchone()
+            rows.append((table_name, owner[0], owner[1], (info[0] or 0) if info else 0, bool(info[1]) if info and info[1] is not None else True))
+        
+        if rows:
+            cursor.fast_executemany = True
+            cursor.executemany("INSERT INTO dbo.QuizOwnership (TableName, TeacherID, QuizName, TimerMinutes, NegativeMarking) VALUES (?, ?, ?, ?, ?)", rows)
+            cursor.fast_executemany = False
+        
+        print(f"Assigned {len(rows)} quizzes to their teachers")
+        return len(rows)
+    
+    def _quiz_owner(self, cursor, table_name):
+        cursor.execute("SELECT TeacherID FROM dbo.QuizOwnership WHERE TableName = ?", table_name)
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def _ownership_index_ready(self):
+        """Makes sure the ownership index exists; False if it is unavailable (e.g. no DDL permission)"""
+        if DatabaseManager._ownership_ready:
+            return True
+        
+        if not self.connection:
+            if not self.connect():
+                return False
+        cursor = self.connection.cursor()
+        try:
+            ready = self._ensure_ownership_index(cursor)
+            if ready:
+                self._commit()
+            else:
+                self.connection.rollback()
+        finally:
+            cursor.close()
+        return ready
+    
+    def is_quiz_owner(self, table_name, teacher_id, teacher_name=None):
+        """Checks whether a registered teacher owns a quiz
+        
+        Without the ownership index this falls back to the table name prefix convention,
+        matching what get_simple_quizzes lists for the teacher.
+        """
+        if not self._ownership_index_ready():
+            prefix = (teacher_name or '').replace(' ', '_').replace('-', '_')
+            return bool(prefix) and table_name.startswith(prefix + '_')
+        
+        connection = self._read_connection()
+        if not connection:
+            return False
+        
+        try:
+            cursor = connection.cursor()
+            owner = self._quiz_owner(cursor, table_name)
+            cursor.close()
+            return owner is not None and owner == teacher_id
+            
+        except Exception as e:
+            print(f"Error checking quiz owner: {e}")
+            return False
+    
+    def _owned_quizzes(self, teacher_id):
+        """Lists a teacher's quizzes from the ownership index, or returns None if it is unavailable"""
+        if not self._ownership_index_ready():
+            return None
+        
+        connection = self._read_connection()
+        if not connection:
+            return None
+        
+        try:
+            quizzes = []
+            for row in self._stream_rows(connection, """
+                    SELECT TableName, QuizName, TimerMinutes, NegativeMarking 
+                    FROM dbo.QuizOwnership 
+                    WHERE TeacherID = ? 
+                    ORDER BY TableName
+                """, teacher_id):
+                quizzes.append({
+                    'name': row[1],
+                    'table_name': row[0],
+                    'timer_minutes': row[2] or 0,
+                    'negative_marking': bool(row[3])
+                })
+            return quizzes
+            
+        except Exception as e:
+            print(f"Error getting owned quizzes: {e}")
+            return None
+    
+    @staticmethod
+    def simple_quiz_table_name(quiz_name, teacher_name="Admin"):
+        """Builds the table name a teacher's quiz is stored under"""
+        # Clean quiz name for table name
+        table_name = ''.join(c for c in quiz_name if c.isalnum() or c in ('_', '-')).strip()
+        if not table_name:
+            table_name = quiz_name.replace(' ', '_').replace('-', '_')
+        
+        # Add teacher prefix to make it unique
+        teacher_prefix = teacher_name.replace(' ', '_').replace('-', '_')
+        return f"{teacher_prefix}_{table_name}"
+    
+    def clone_quiz(self, table_name, quiz_name, teacher_name="Admin", teacher_id=None):
+        """Copies a quiz into a new quiz, e.g. to reuse it in another term
+        
+        The source is published first and the clone starts from that snapshot, sharing its
+        question rows. Returns the new table name, or None on failure.
+        """
+        snapshot = self.publish_quiz_version(table_name)
+        quiz_info = self.get_quiz_info(table_name)
+        if not snapshot:
+            return None
+        
+        new_table_name = self.simple_quiz_table_name(quiz_name, teacher_name)
+        if new_table_name == table_name or self.table_exists(new_table_name):
+            print(f"Quiz table already exists: {new_table_name}")
+            return None
+        
+        timer_minutes = quiz_info['timer_minutes'] if quiz_info else 0
+        if not self.create_simple_quiz(quiz_name, timer_minutes, teacher_name, teacher_id):
+            return None
+        
+        new_table = self._quiz_table(new_table_name)
+        if not new_table:
+            return None
         
+        cursor = self.connection.cursor()
         try:
-            # Create a folder table for the teacher
-            folder_name = f"Teacher_{teacher_id}_{teacher_name.replace(' ', '_')}"
-            cursor = self.connection.cursor()
-            
-            # Check if folder already exists
-            cursor.execute(f"SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{folder_name}_Metadata'")
-            folder_exists = cursor.fetchone()[0] > 0
-            
-            if folder_exists:
-                print(f"Teacher folder already exists: {folder_name}_Metadata")
-                cursor.close()
-                return True
-            
-            # Create a metadata table for the teacher's folder
-            create_folder_query = f"""
-            CREATE TABLE dbo.{folder_name}_Metadata (
-                ID INT IDENTITY(1,1) PRIMARY KEY,
-                QuizName NVARCHAR(255) NOT NULL,
-                QuizTableName NVARCHAR(255) NOT NULL,
-                TimerMinutes INT DEFAULT 0,
-                NegativeMarking BIT DEFAULT 1,
-                CreatedDate DATETIME DEFAULT GETDATE(),
-                LastModified DATETIME DEFAULT GETDATE(),
-                QuestionCount INT DEFAULT 0
-            )
-            """
-            
-            cursor.execute(create_folder_query)
-            self.connection.commit()
-            cursor.close()
-            print(f"Teacher folder created: {folder_name}_Metadata")
-            return True
+            # One server-side copy into the editable table; IDs follow snapshot order from 1
+            cursor.execute(f"""
+                INSERT INTO {new_table.quoted} (Question, Option1, Option2, Option3, Option4, RightAnswer, NegativeMarking)
+                SELECT r.Question, r.Option1, r.Option2, r.Option3, r.Option4, r.RightAnswer, s.NegativeMarking
+                FROM dbo.QuizSnapshotQuestions sq
+                JOIN dbo.QuizQuestionRows r ON r.RowID = sq.RowID
+                JOIN dbo.QuizSnapshots s ON s.SnapshotID = sq.SnapshotID
+                WHERE sq.SnapshotID = ? ORDER BY sq.Position
+            """, snapshot['snapshot_id'])
+            
+            # The clone's first version points at the source's rows instead of copying them
+            source_version = self._locked_version(cursor, new_table_name)
+            latest = self._latest_snapshot(cursor, new_table_name, lock=True)
+            cursor.execute("INSERT INTO dbo.QuizSnapshots (TableName, Version, SourceVersion, TimerMinutes, NegativeMarking) "
+                           "OUTPUT INSERTED.SnapshotID "
+                           "SELECT ?, ?, ?, TimerMinutes, NegativeMarking FROM dbo.QuizSnapshots WHERE SnapshotID = ?",
+                           new_table_name, latest[1] + 1 if latest else 1, source_version, snapshot['snapshot_id'])
+            clone_snapshot_id = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO dbo.QuizSnapshotQuestions (SnapshotID, Position, SourceID, RowID) "
+                           "SELECT ?, Position, Position + 1, RowID FROM dbo.QuizSnapshotQuestions WHERE SnapshotID = ?",
+                           clone_snapshot_id, snapshot['snapshot_id'])
+            self._commit()
             
         except Exception as e:
-            print(f"Error creating teacher folder: {e}")
-            return False
+            self.connection.rollback()
+            print(f"Error cloning quiz: {e}")
+            self.drop_table(new_table_name)
+            return None
+        finally:
+            cursor.close()
+        
+        for question_id, (question, *_) in enumerate(self.get_snapshot_rows(snapshot['snapshot_id']), start=1):
+            duplicate_index.add((new_table_name, question_id), question)
+        return new_table_name
     
-    def create_simple_quiz(self, quiz_name, timer_minutes=0, teacher_name="Admin"):
-        """Creates a simple quiz table - NEW SIMPLIFIED APPROACH"""
+    def create_simple_quiz(self, quiz_name, timer_minutes=0, teacher_name="Admin", teacher_id=None):
+        """Creates a simple quiz table - NEW SIMPLIFIED APPROACH
+        
+        Quizzes created by a registered teacher (teacher_id) are recorded in the ownership index.
+        """
         if not self.connection:
             if not self.connect():
                 return False
         
         try:
-            # Clean quiz name for table name
-            table_name = ''.join(c for c in quiz_name if c.isalnum() or c in ('_', '-')).strip()
-            if not table_name:
-                table_name = quiz_name.replace(' ', '_').replace('-', '_')
-            
-            # Add teacher prefix to make it unique
-            teacher_prefix = teacher_name.replace(' ', '_').replace('-', '_')
-            full_table_name = f"{teacher_prefix}_{table_name}"
+            full_table_name = self.simple_quiz_table_name(quiz_name, teacher_name)
+            if not is_quiz_table_name(full_table_name):
+                print(f"Rejected invalid quiz table name: {full_table_name!r}")
+                return False
             
             cursor = self.connection.cursor()
+            track_owner = teacher_id is not None and self._ensure_ownership_index(cursor)
             
             # Check if table already exists
-            cursor.execute(f"SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{full_table_name}'")
+            cursor.execute("SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = ?", full_table_name)
             table_exists = cursor.fetchone()[0] > 0
             
             if table_exists:
                 print(f"Quiz table already exists: {full_table_name}")
+                if teacher_id is None:
+                    cursor.close()
+                    return True  # Return success for existing table
+                
+                # Names can collide across teachers ("Ann" + "Lee Math" vs "Ann Lee" + "Math"), so an
+                # existing table is only this teacher's if the index says so, or if nobody owns it yet
+                # and it really is a quiz, in which case it is recorded as theirs
+                owner = self._quiz_owner(cursor, full_table_name) if track_owner else None
+                if owner is None and track_owner:
+                    cursor.execute(QUIZ_SCHEMA_QUERY, full_table_name, *QUIZ_COLUMNS)
+                    if cursor.fetchone()[0] == len(QUIZ_COLUMNS):
+                        cursor.execute("INSERT INTO dbo.QuizOwnership (TableName, TeacherID, QuizName, TimerMinutes) VALUES (?, ?, ?, ?)",
+                                       full_table_name, teacher_id, quiz_name.strip(), int(timer_minutes))
+                        owner = teacher_id
+                self._commit()
                 cursor.close()
-                return True  # Return success for existing table
+                return owner == teacher_id
             
             # Create the quiz table with timer and negative marking
             create_quiz_query = f"""
-            CREATE TABLE dbo.{full_table_name} (
+            CREATE TABLE {quote_table_name(full_table_name)} (
                 ID INT IDENTITY(1,1) PRIMARY KEY,
                 Question NVARCHAR(MAX) NOT NULL,
                 Option1 NVARCHAR(MAX) NOT NULL,
@@ -451,50 +1785,70 @@ class DatabaseManager:
                 Option3 NVARCHAR(MAX) NOT NULL,
                 Option4 NVARCHAR(MAX) NOT NULL,
                 RightAnswer INT NOT NULL CHECK (RightAnswer IN (1, 2, 3, 4)),
-                TimerMinutes INT DEFAULT {timer_minutes},
+                SortOrder INT NULL,
+                TimerMinutes INT DEFAULT {int(timer_minutes)},
                 NegativeMarking BIT DEFAULT 1,
                 CreatedDate DATETIME DEFAULT GETDATE()
             )
             """
             
             cursor.execute(create_quiz_query)
-            self.connection.commit()
+            if track_owner:
+                cursor.execute("INSERT INTO dbo.QuizOwnership (TableName, TeacherID, QuizName, TimerMinutes) VALUES (?, ?, ?, ?)",
+                               full_table_name, teacher_id, quiz_name.strip(), int(timer_minutes))
+            self._commit()
             cursor.close()
             
             print(f"Successfully created quiz table: {full_table_name}")
+            
+            # Best effort: searching falls back to LIKE when full-text search is unavailable
+            self.enable_question_search(full_table_name)
             return True
             
         except Exception as e:
             print(f"Error creating simple quiz: {e}")
             return False
     
-    def get_simple_quizzes(self, teacher_name="Admin"):
-        """Gets all quizzes for a teacher using simple approach"""
-        if not self.connection:
-            if not self.connect():
-                return []
+    def get_simple_quizzes(self, teacher_name="Admin", teacher_id=None):
+        """Gets all quizzes for a teacher using simple approach
+        
+        Registered teachers (teacher_id) are looked up in the ownership index; the table
+        name prefix scan remains for the admin login and when the index is unavailable.
+        """
+        if teacher_id is not None:
+            quizzes = self._owned_quizzes(teacher_id)
+            if quizzes is not None:
+                return quizzes
+        
+        connection = self._read_connection()
+        if not connection:
+            return []
         
         try:
             teacher_prefix = teacher_name.replace(' ', '_').replace('-', '_')
-            cursor = self.connection.cursor()
+            cursor = connection.cursor()
             
-            # Get all tables that start with teacher prefix
-            cursor.execute(f"""
+            # Get all tables that start with teacher prefix ('_', '%' and '[' are LIKE wildcards)
+            like_prefix = teacher_prefix.replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')
+            cursor.execute("""
                 SELECT TABLE_NAME 
-                FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_NAME LIKE '{teacher_prefix}_%' 
-                AND TABLE_SCHEMA = 'dbo'
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_NAME LIKE ? 
+                AND TABLE_SCHEMA = 'dbo' AND COLUMN_NAME = 'RightAnswer'
                 ORDER BY TABLE_NAME
-            """)
+            """, f"{like_prefix}[_]%")
             
             quizzes = []
             for row in cursor.fetchall():
                 table_name = row[0]
+                if not is_quiz_table_name(table_name):
+                    continue
+                quiz_table = quiz_tables.add(table_name)
                 quiz_display_name = table_name.replace(f"{teacher_prefix}_", "").replace("_", " ").title()
                 
                 # Get timer and negative marking info
                 try:
-                    cursor.execute(f"SELECT TOP 1 TimerMinutes, NegativeMarking FROM dbo.{table_name}")
+                    cursor.execute(quiz_table.select_quiz_info)
                     timer_info = cursor.fetchone()
                     timer_minutes = timer_info[0] if timer_info and timer_info[0] else 0
                     negative_marking = bool(timer_info[1]) if timer_info and timer_info[1] is not None else True
@@ -518,15 +1872,19 @@ class DatabaseManager:
     
     def get_teacher_quizzes(self, teacher_id, teacher_name):
         """Gets all quizzes for a specific teacher"""
-        if not self.connection:
-            if not self.connect():
-                return []
+        quizzes = self._owned_quizzes(teacher_id)
+        if quizzes is not None:
+            return quizzes
+        
+        connection = self._read_connection()
+        if not connection:
+            return []
         
         try:
             folder_name = f"Teacher_{teacher_id}_{teacher_name.replace(' ', '_')}"
-            cursor = self.connection.cursor()
+            cursor = connection.cursor()
             
-            cursor.execute(f"SELECT QuizName, QuizTableName, TimerMinutes, NegativeMarking FROM dbo.{folder_name}_Metadata ORDER BY CreatedDate DESC")
+            cursor.execute(f"SELECT QuizName, QuizTableName, TimerMinutes, NegativeMarking FROM {quote_table_name(folder_name + '_Metadata')} ORDER BY CreatedDate DESC")
             
             quizzes = []
             for row in cursor.fetchall():
@@ -564,12 +1922,12 @@ class DatabaseManager:
     
     def get_all_registered_teachers(self):
         """Gets all registered teachers for student selection"""
-        if not self.connection:
-            if not self.connect():
-                return []
+        connection = self._read_connection()
+        if not connection:
+            return []
         
         try:
-            cursor = self.connection.cursor()
+            cursor = connection.cursor()
             cursor.execute("""
                 SELECT rt.TeacherID, rt.TeacherName, rt.Email, t.EducationMailID
                 FROM dbo.RegisteredTeachers rt
@@ -596,13 +1954,17 @@ class DatabaseManager:
     
     def get_quiz_info(self, table_name):
         """Gets quiz information including timer and negative marking settings"""
-        if not self.connection:
-            if not self.connect():
-                return None
+        connection = self._read_connection()
+        if not connection:
+            return None
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return None
         
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"SELECT TOP 1 TimerMinutes, NegativeMarking FROM dbo.{table_name}")
+            cursor = connection.cursor()
+            cursor.execute(quiz_table.select_quiz_info)
             
             row = cursor.fetchone()
             if row:
@@ -620,80 +1982,674 @@ class DatabaseManager:
             print(f"Error getting quiz info: {e}")
             return None
     
-    def calculate_quiz_score(self, table_name, student_answers, negative_marking=True):
-        """Calculates quiz score with CORRECT negative marking logic"""
+    _attempts_ready = False
+    
+    def _ensure_attempt_tables(self, cursor):
+        if not DatabaseManager._attempts_ready:
+            cursor.execute(QUIZ_ATTEMPTS_DDL)
+            DatabaseManager._attempts_ready = True
+    
+    def start_attempt(self, attempt_id, table_name, student_details, snapshot_id=None):
+        """Records that a student started a quiz attempt"""
         if not self.connection:
             if not self.connect():
-                return {'score': 0, 'total': 0, 'percentage': 0, 'details': []}
+                return False
         
+        cursor = self.connection.cursor()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(f"SELECT Question, Option1, Option2, Option3, Option4, RightAnswer FROM dbo.{table_name}")
+            self._ensure_attempt_tables(cursor)
+            cursor.execute("""
+                INSERT INTO dbo.QuizAttempts (AttemptID, TableName, SnapshotID, StudentID, StudentName, Section, Intake, University)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, attempt_id, table_name, snapshot_id, student_details.get('student_id', ''), student_details.get('name', ''),
+                student_details.get('section'), student_details.get('intake'), student_details.get('university'))
+            self._commit()
+            return True
             
-            questions = cursor.fetchall()
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._attempts_ready = False
+            print(f"Error recording quiz attempt: {e}")
+            return False
+        finally:
             cursor.close()
+    
+    def record_attempt_result(self, attempt_id, score_result, elapsed_seconds=None, auto_submitted=False):
+        """Stores a graded attempt and its responses; an attempt is only ever graded once"""
+        if not self.connection:
+            if not self.connect():
+                return False
+        
+        cursor = self.connection.cursor()
+        try:
+            self._ensure_attempt_tables(cursor)
+            # Grade with the answer keys as they are now: a key corrected while the attempt was in
+            # progress may not have reached the snapshot this process graded it from
+            cursor.execute("""
+                SELECT sq.Position, q.RightAnswer, CHOOSE(q.RightAnswer, q.Option1, q.Option2, q.Option3, q.Option4)
+                FROM dbo.QuizAttempts a
+                JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = a.SnapshotID
+                JOIN dbo.QuizQuestionRows q ON q.RowID = sq.RowID
+                WHERE a.AttemptID = ?
+            """, attempt_id)
+            self.apply_answer_keys(score_result, {row[0]: (row[1], row[2]) for row in cursor.fetchall()})
             
-            total = len(questions)
-            correct_answers = 0
-            wrong_answers = 0
-            unanswered = 0
-            details = []
-            
-            # First pass: count correct, wrong, and unanswered
-            for i, (q_text, opt1, opt2, opt3, opt4, correct) in enumerate(questions):
-                student_choice = student_answers.get(i, 0)
-                options = [opt1, opt2, opt3, opt4]
-                
-                if student_choice == correct:
-                    correct_answers += 1
-                    details.append({
-                        'question': q_text,
-                        'student_answer': options[student_choice - 1] if student_choice else "No answer",
-                        'correct_answer': options[correct - 1],
-                        'is_correct': True,
-                        'points': 1
-                    })
-                elif student_choice > 0:  # Wrong answer (student attempted)
-                    wrong_answers += 1
-                    details.append({
-                        'question': q_text,
-                        'student_answer': options[student_choice - 1] if student_choice else "No answer",
-                        'correct_answer': options[correct - 1],
-                        'is_correct': False,
-                        'points': -0.25
-                    })
-                else:  # No answer
-                    unanswered += 1
-                    details.append({
-                        'question': q_text,
-                        'student_answer': "No answer",
-                        'correct_answer': options[correct - 1],
-                        'is_correct': False,
-                        'points': 0
-                    })
-            
-            # Calculate final score using CORRECT logic
-            if negative_marking:
-                # Score = Correct answers - (Wrong answers * 0.25)
-                final_score = correct_answers - (wrong_answers * 0.25)
-            else:
-                # Score = Only correct answers (no negative marking)
-                final_score = correct_answers
+            cursor.execute("""
+                UPDATE dbo.QuizAttempts 
+                SET SubmittedDate = GETDATE(), Score = ?, Total = ?, Percentage = ?, CorrectAnswers = ?, 
+                    WrongAnswers = ?, Unanswered = ?, ElapsedSeconds = ?, AutoSubmitted = ?
+                WHERE AttemptID = ? AND SubmittedDate IS NULL
+            """, score_result['score'], score_result['total'], score_result['percentage'],
+                score_result.get('correct_answers', 0), score_result.get('wrong_answers', 0), score_result.get('unanswered', 0),
+                elapsed_seconds, bool(auto_submitted), attempt_id)
+            if cursor.rowcount != 1:
+                self.connection.rollback()
+                return False
             
-            # Calculate percentage based on total possible score
-            percentage = (final_score / total) * 100 if total > 0 else 0
+            responses = [(attempt_id, position, detail.get('student_choice', 0), detail.get('correct_choice', 0),
+                          bool(detail['is_correct']), detail['points'])
+                         for position, detail in enumerate(score_result['details'])]
+            if responses:
+                cursor.fast_executemany = True
+                cursor.executemany("INSERT INTO dbo.QuizAttemptResponses (AttemptID, Position, StudentChoice, CorrectChoice, IsCorrect, Points) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)", responses)
+                cursor.fast_executemany = False
+            self._commit()
+            return True
             
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._attempts_ready = False
+            print(f"Error recording quiz result: {e}")
+            return False
+        finally:
+            cursor.close()
+
+    def get_attempt_result(self, attempt_id):
+        """A submitted attempt's stored result, shaped like calculate_quiz_score() plus 'elapsed' and 'auto_submitted'
+
+        Returns None if the attempt has not been submitted or could not be read. Read from
+        the primary, since it decides whether a submission is graded again.
+        """
+        if not self.connection:
+            if not self.connect():
+                return None
+
+        cursor = self.connection.cursor()
+        try:
+            self._ensure_attempt_tables(cursor)
+            cursor.execute("""
+                SELECT Score, Total, Percentage, CorrectAnswers, WrongAnswers, Unanswered, ElapsedSeconds, AutoSubmitted
+                FROM dbo.QuizAttempts
+                WHERE AttemptID = ? AND SubmittedDate IS NOT NULL
+            """, attempt_id)
+            row = cursor.fetchone()
+            if not row:
+                return None
+
+            cursor.execute("""
+                SELECT r.Position, r.StudentChoice, r.CorrectChoice, r.IsCorrect, r.Points,
+                       q.Question, q.Option1, q.Option2, q.Option3, q.Option4
+                FROM dbo.QuizAttemptResponses r
+                JOIN dbo.QuizAttempts a ON a.AttemptID = r.AttemptID
+                LEFT JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = a.SnapshotID AND sq.Position = r.Position
+                LEFT JOIN dbo.QuizQuestionRows q ON q.RowID = sq.RowID
+                WHERE r.AttemptID = ?
+                ORDER BY r.Position
+            """, attempt_id)
+            details = []
+            for position, student_choice, correct_choice, is_correct, points, question, *options in cursor.fetchall():
+                # Attempts on the live table have no snapshot rows to name their questions
+                options = options if question is not None else [''] * 4
+                details.append({
+                    'question': question if question is not None else f'Question {position + 1}',
+                    'student_answer': options[student_choice - 1] if student_choice else "No answer",
+                    'correct_answer': options[correct_choice - 1] if correct_choice else '',
+                    'is_correct': bool(is_correct),
+                    'points': points,
+                    'student_choice': student_choice,
+                    'correct_choice': correct_choice
+                })
+
+            score, total, percentage, correct_answers, wrong_answers, unanswered, elapsed, auto_submitted = row
             return {
-                'score': round(final_score, 2),
+                'score': score,
                 'total': total,
-                'correct_answers': correct_answers,
-                'wrong_answers': wrong_answers,
-                'unanswered': unanswered,
-                'percentage': round(percentage, 2),
+                'correct_answers': correct_answers or 0,
+                'wrong_answers': wrong_answers or 0,
+                'unanswered': unanswered or 0,
+                'percentage': percentage,
                 'details': details,
-                'negative_marking_applied': negative_marking
+                'elapsed': elapsed or 0,
+                'auto_submitted': bool(auto_submitted)
+            }
+
+        except Exception as e:
+            print(f"Error reading quiz result: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    def get_item_statistics(self, table_name):
+        """Item-analysis sums for a quiz's stored attempts, keyed by snapshot question row
+
+        Returns {'attempts', 'score_sum', 'score_sq_sum', 'items', 'recent'} in the form kept by
+        analytics.QuizAnalytics, where 'recent' holds the attempts stored in the last minute (whose
+        quiz_submitted events may still be on their way), or None if the attempts could not be read.
+        Read from the primary so that attempts already announced are not missing.
+        """
+        if not self.connection:
+            if not self.connect():
+                return None
+
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT COUNT(*), ISNULL(SUM(CAST(CorrectAnswers AS BIGINT)), 0),
+                       ISNULL(SUM(CAST(CorrectAnswers AS BIGINT) * CorrectAnswers), 0)
+                FROM dbo.QuizAttempts
+                WHERE TableName = ? AND SubmittedDate IS NOT NULL AND SnapshotID IS NOT NULL
+            """, table_name)
+            attempts, score_sum, score_sq_sum = cursor.fetchone()
+
+            cursor.execute("""
+                SELECT sq.RowID, MAX(r.CorrectChoice), COUNT(*), SUM(CAST(r.IsCorrect AS INT)),
+                       SUM(CAST(a.CorrectAnswers AS BIGINT)), SUM(CAST(a.CorrectAnswers AS BIGINT) * a.CorrectAnswers),
+                       SUM(CASE WHEN r.IsCorrect = 1 THEN CAST(a.CorrectAnswers AS BIGINT) ELSE 0 END),
+                       SUM(CASE WHEN r.StudentChoice = 0 THEN 1 ELSE 0 END), SUM(CASE WHEN r.StudentChoice = 1 THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN r.StudentChoice = 2 THEN 1 ELSE 0 END), SUM(CASE WHEN r.StudentChoice = 3 THEN 1 ELSE 0 END),
+                       SUM(CASE WHEN r.StudentChoice = 4 THEN 1 ELSE 0 END)
+                FROM dbo.QuizAttempts a
+                JOIN dbo.QuizAttemptResponses r ON r.AttemptID = a.AttemptID
+                JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = a.SnapshotID AND sq.Position = r.Position
+                WHERE a.TableName = ? AND a.SubmittedDate IS NOT NULL
+                GROUP BY sq.RowID
+            """, table_name)
+            items = {}
+            for row in cursor.fetchall():
+                items[row[0]] = {
+                    'correct_choice': row[1],
+                    'attempts': row[2],
+                    'correct': row[3],
+                    'score_sum': row[4],
+                    'score_sq_sum': row[5],
+                    'correct_score_sum': row[6],
+                    'choices': list(row[7:12])
+                }
+
+            cursor.execute("""
+                SELECT AttemptID FROM dbo.QuizAttempts
+                WHERE TableName = ? AND SubmittedDate >= DATEADD(SECOND, -60, GETDATE())
+            """, table_name)
+            recent = {row[0] for row in cursor.fetchall()}
+
+            return {
+                'attempts': attempts,
+                'score_sum': score_sum,
+                'score_sq_sum': score_sq_sum,
+                'items': items,
+                'recent': recent
             }
+
+        except Exception as e:
+            print(f"Error computing item statistics: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    def iter_gradebook_attempts(self, table_name, batch_size=FETCH_BATCH_SIZE):
+        """Streams a quiz's graded attempts, oldest first, in gradebook.ATTEMPT_COLUMNS order
+        
+        Database errors are raised to the caller, since part of the export may already have been sent.
+        """
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        yield from self._stream_rows(connection, """
+            SELECT AttemptID, StudentID, StudentName, Section, Intake, University, SnapshotID,
+                   CONVERT(VARCHAR(19), StartedDate, 126), CONVERT(VARCHAR(19), SubmittedDate, 126),
+                   Score, Total, Percentage, CorrectAnswers, WrongAnswers, Unanswered, ElapsedSeconds, AutoSubmitted
+            FROM dbo.QuizAttempts 
+            WHERE TableName = ? AND SubmittedDate IS NOT NULL
+            ORDER BY StartedDate, AttemptID
+        """, table_name, batch_size=batch_size)
+    
+    def iter_gradebook_responses(self, table_name, batch_size=FETCH_BATCH_SIZE):
+        """Streams one row per question answered in a quiz's graded attempts, in gradebook.RESPONSE_COLUMNS order"""
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        yield from self._stream_rows(connection, """
+            SELECT a.AttemptID, a.StudentID, r.Position + 1, r.StudentChoice, r.CorrectChoice, r.IsCorrect, r.Points
+            FROM dbo.QuizAttempts a 
+            JOIN dbo.QuizAttemptResponses r ON r.AttemptID = a.AttemptID
+            WHERE a.TableName = ? AND a.SubmittedDate IS NOT NULL
+            ORDER BY a.StartedDate, a.AttemptID, r.Position
+        """, table_name, batch_size=batch_size)
+    
+    _regrade_ready = False
+    
+    def regrade_question(self, table_name, question_id, question_text, right_answer):
+        """Re-grades a question after its answer key was corrected outside update_question
+        
+        Returns the attempts whose score changed (see _regrade_source), or None on error.
+        """
+        if not self.connection:
+            if not self.connect():
+                return None
+        
+        cursor = self.connection.cursor()
+        try:
+            changed, snapshot_ids = self._regrade_source(cursor, table_name, question_id, question_text, right_answer)
+            self._commit()
+            
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._regrade_ready = False
+            print(f"Error re-grading question {question_id} in {table_name}: {e}")
+            return None
+        finally:
+            cursor.close()
+        
+        self._evict_snapshots(snapshot_ids)
+        return changed
+    
+    def _regrade_source(self, cursor, table_name, question_id, question_text, right_answer):
+        """Applies a corrected answer key to everything already graded or about to be graded
+        
+        The published versions of this quiz holding the question (matched by ID and its
+        pre-edit text) get a corrected copy of its row, so attempts still in progress on an
+        older version are graded with the new key; the row itself may be shared with clones
+        in other quizzes, which keep their own key. Then only the submitted responses to the
+        question are rewritten, and each affected attempt's totals are adjusted by the change
+        in that one response instead of being re-scored.
+        
+        Runs in the caller's transaction. Returns (changed, snapshot IDs repointed), where
+        changed lists {'attempt_id', 'student_id', 'student_name', 'old_score', 'new_score',
+        'total'} for the attempts whose score changed.
+        """
+        self._ensure_snapshot_tables(cursor)
+        self._ensure_attempt_tables(cursor)
+        if not DatabaseManager._regrade_ready:
+            ddl_cursor = self._maintenance_cursor()
+            try:
+                ddl_cursor.execute(REGRADE_INDEX_DDL)
+            finally:
+                ddl_cursor.close()
+            DatabaseManager._regrade_ready = True
+        
+        cursor.execute("""
+            SELECT DISTINCT sq.RowID
+            FROM dbo.QuizSnapshots s
+            JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = s.SnapshotID AND sq.SourceID = ?
+            JOIN dbo.QuizQuestionRows q ON q.RowID = sq.RowID
+            WHERE s.TableName = ? AND q.Question = ? AND q.RightAnswer <> ?
+        """, question_id, table_name, question_text, right_answer)
+        snapshot_ids = set()
+        for (row_id,) in cursor.fetchall():
+            cursor.execute("INSERT INTO dbo.QuizQuestionRows (Question, Option1, Option2, Option3, Option4, RightAnswer) "
+                           "OUTPUT INSERTED.RowID "
+                           "SELECT Question, Option1, Option2, Option3, Option4, ? FROM dbo.QuizQuestionRows WHERE RowID = ?",
+                           right_answer, row_id)
+            corrected_row_id = cursor.fetchone()[0]
+            cursor.execute("""
+                UPDATE sq SET RowID = ?
+                OUTPUT INSERTED.SnapshotID
+                FROM dbo.QuizSnapshotQuestions sq JOIN dbo.QuizSnapshots s ON s.SnapshotID = sq.SnapshotID
+                WHERE s.TableName = ? AND sq.SourceID = ? AND sq.RowID = ?
+            """, corrected_row_id, table_name, question_id, row_id)
+            snapshot_ids.update(row[0] for row in cursor.fetchall())
+        
+        cursor.execute("""
+            UPDATE r 
+            SET CorrectChoice = ?,
+                IsCorrect = CASE WHEN r.StudentChoice = ? THEN 1 ELSE 0 END,
+                Points = CASE WHEN r.StudentChoice = ? THEN 1 WHEN r.StudentChoice > 0 THEN -0.25 ELSE 0 END
+            OUTPUT INSERTED.AttemptID, a.StudentID, a.StudentName, a.Score, a.Total, s.NegativeMarking,
+                   CAST(INSERTED.IsCorrect AS INT) - CAST(DELETED.IsCorrect AS INT)
+            FROM dbo.QuizSnapshots s
+            JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = s.SnapshotID AND sq.SourceID = ?
+            JOIN dbo.QuizQuestionRows q ON q.RowID = sq.RowID
+            JOIN dbo.QuizAttempts a ON a.SnapshotID = s.SnapshotID
+            JOIN dbo.QuizAttemptResponses r ON r.AttemptID = a.AttemptID AND r.Position = sq.Position
+            WHERE s.TableName = ? AND q.Question = ? AND a.SubmittedDate IS NOT NULL AND r.CorrectChoice <> ?
+        """, right_answer, right_answer, right_answer, question_id, table_name, question_text, right_answer)
+        
+        changed = []
+        adjustments = []
+        for attempt_id, student_id, student_name, score, total, negative_marking, correct_delta in cursor.fetchall():
+            # A response that stays wrong (or unanswered) only gets its correct choice rewritten
+            if not correct_delta:
+                continue
+            score_delta = correct_delta * (1.25 if negative_marking else 1)
+            adjustments.append((score_delta, correct_delta, correct_delta, score_delta, attempt_id))
+            changed.append({
+                'attempt_id': attempt_id,
+                'student_id': student_id,
+                'student_name': student_name,
+                'old_score': score,
+                'new_score': round(score + score_delta, 2),
+                'total': total
+            })
+        
+        if adjustments:
+            # Relative updates, so concurrent re-grades of other questions compose correctly
+            cursor.fast_executemany = True
+            cursor.executemany("""
+                UPDATE dbo.QuizAttempts 
+                SET Score = ROUND(Score + ?, 2), CorrectAnswers = CorrectAnswers + ?, WrongAnswers = WrongAnswers - ?,
+                    Percentage = CASE WHEN Total > 0 THEN ROUND(ROUND(Score + ?, 2) * 100.0 / Total, 2) ELSE 0 END
+                WHERE AttemptID = ?
+            """, adjustments)
+            cursor.fast_executemany = False
+        return changed, snapshot_ids
+    
+    @staticmethod
+    def _evict_snapshots(snapshot_ids):
+        """Drops cached snapshots whose rows were corrected by a re-grade"""
+        with DatabaseManager._snapshot_cache_lock:
+            for snapshot_id in snapshot_ids:
+                DatabaseManager._snapshot_cache.pop(snapshot_id, None)
+    
+    def iter_answer_sheets(self, table_name, batch_size=FETCH_BATCH_SIZE):
+        """Streams (AttemptID, StudentID, StudentName, source question ID, StudentChoice, CorrectChoice)
+        for every graded attempt pinned to a version, grouped by attempt"""
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        yield from self._stream_rows(connection, """
+            SELECT a.AttemptID, a.StudentID, a.StudentName, sq.SourceID, r.StudentChoice, r.CorrectChoice
+            FROM dbo.QuizAttempts a
+            JOIN dbo.QuizAttemptResponses r ON r.AttemptID = a.AttemptID
+            JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = a.SnapshotID AND sq.Position = r.Position
+            WHERE a.TableName = ? AND a.SubmittedDate IS NOT NULL
+            ORDER BY a.AttemptID
+        """, table_name, batch_size=batch_size)
+    
+    def get_calibration_items(self, table_name):
+        """Returns the source question IDs that appear in any published version of a quiz"""
+        connection = self._read_connection()
+        if not connection:
+            return []
+        
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT DISTINCT sq.SourceID 
+                FROM dbo.QuizSnapshots s JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = s.SnapshotID
+                WHERE s.TableName = ? ORDER BY sq.SourceID
+            """, table_name)
+            return [row[0] for row in cursor.fetchall()]
+            
+        except Exception as e:
+            print(f"Error getting calibration items: {e}")
+            return []
+        finally:
+            cursor.close()
+    
+    def iter_calibration_responses(self, table_name, batch_size=FETCH_BATCH_SIZE):
+        """Streams (StudentID, source question ID, IsCorrect) from each student's latest graded attempt
+        
+        Responses are keyed by source question so attempts on different versions line up;
+        unanswered questions count as incorrect. Attempts not pinned to a version are skipped.
+        """
+        connection = self._read_connection()
+        if not connection:
+            return
+        
+        yield from self._stream_rows(connection, """
+            WITH latest AS (
+                SELECT AttemptID, SnapshotID, StudentID,
+                       ROW_NUMBER() OVER (PARTITION BY StudentID ORDER BY SubmittedDate DESC, AttemptID DESC) AS Recency
+                FROM dbo.QuizAttempts 
+                WHERE TableName = ? AND SubmittedDate IS NOT NULL AND SnapshotID IS NOT NULL
+            )
+            SELECT l.StudentID, sq.SourceID, r.IsCorrect
+            FROM latest l
+            JOIN dbo.QuizAttemptResponses r ON r.AttemptID = l.AttemptID
+            JOIN dbo.QuizSnapshotQuestions sq ON sq.SnapshotID = l.SnapshotID AND sq.Position = r.Position
+            WHERE l.Recency = 1
+            ORDER BY l.StudentID
+        """, table_name, batch_size=batch_size)
+    
+    _irt_ready = False
+    
+    def save_calibration(self, table_name, result):
+        """Replaces a quiz's stored IRT parameters and abilities with an irt.calibrate() result"""
+        if not self.connection:
+            if not self.connect():
+                return False
+        
+        cursor = self.connection.cursor()
+        try:
+            if not DatabaseManager._irt_ready:
+                cursor.execute(QUIZ_IRT_DDL)
+                DatabaseManager._irt_ready = True
+            
+            cursor.execute("DELETE FROM dbo.QuizItemParameters WHERE TableName = ?", table_name)
+            cursor.execute("DELETE FROM dbo.QuizStudentAbilities WHERE TableName = ?", table_name)
+            cursor.fast_executemany = True
+            if result['items']:
+                cursor.executemany("""
+                    INSERT INTO dbo.QuizItemParameters (TableName, SourceID, Model, Difficulty, Discrimination, Responses)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, [(table_name, item['item_id'], result['model'], item['difficulty'], item['discrimination'],
+                       item['responses']) for item in result['items']])
+            if result['students']:
+                cursor.executemany("""
+                    INSERT INTO dbo.QuizStudentAbilities (TableName, StudentID, Ability, StandardError, Responses)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(table_name, student['student_id'], student['ability'], student['standard_error'],
+                       student['responses']) for student in result['students']])
+            cursor.fast_executemany = False
+            self._commit()
+            return True
+            
+        except Exception as e:
+            self.connection.rollback()
+            DatabaseManager._irt_ready = False
+            print(f"Error saving calibration: {e}")
+            return False
+        finally:
+            cursor.close()
+    
+    def get_item_parameters(self, table_name):
+        """Returns the stored IRT parameters for the questions in a quiz's latest version, in quiz order
+        
+        Each item is {'number', 'source_id', 'model', 'difficulty', 'discrimination', 'responses', 'calibrated'};
+        questions without parameters are left out. Returns [] if the quiz was never calibrated.
+        """
+        connection = self._read_connection()
+        if not connection:
+            return []
+        
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT sq.Position + 1, p.SourceID, p.Model, p.Difficulty, p.Discrimination, p.Responses, p.CalibratedDate
+                FROM dbo.QuizItemParameters p
+                JOIN dbo.QuizSnapshotQuestions sq ON sq.SourceID = p.SourceID AND sq.SnapshotID = (
+                    SELECT TOP 1 SnapshotID FROM dbo.QuizSnapshots WHERE TableName = ? ORDER BY Version DESC)
+                WHERE p.TableName = ?
+                ORDER BY sq.Position
+            """, table_name, table_name)
+            return [{
+                'number': row[0],
+                'source_id': row[1],
+                'model': row[2],
+                'difficulty': row[3],
+                'discrimination': row[4],
+                'responses': row[5],
+                'calibrated': row[6]
+            } for row in cursor.fetchall()]
+            
+        except Exception:
+            # The parameter table does not exist until the first calibration
+            return []
+        finally:
+            cursor.close()
+    
+    def calculate_quiz_score(self, table_name, student_answers, negative_marking=True, snapshot_id=None):
+        """Calculates quiz score with CORRECT negative marking logic
+        
+        Attempts pinned to a published snapshot are graded against that snapshot, read from the primary.
+        """
+        if snapshot_id is not None:
+            return self.score_answers(self.get_snapshot_rows(snapshot_id, primary=True), student_answers, negative_marking)
+        
+        if not self.connection:
+            if not self.connect():
+                return {'score': 0, 'total': 0, 'percentage': 0, 'details': []}
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return {'score': 0, 'total': 0, 'percentage': 0, 'details': []}
+        
+        try:
+            # Rows are scored as they arrive instead of being fetched into a list first
+            questions = self._stream_rows(self.connection, quiz_table.select_questions)
+            return self.score_answers(questions, student_answers, negative_marking)
             
         except Exception as e:
             print(f"Error calculating quiz score: {e}")
             return {'score': 0, 'total': 0, 'percentage': 0, 'details': []}
+    
+    def grade_quiz_attempts(self, table_name, answer_sets, negative_marking=True, snapshot_id=None):
+        """Grades several answer sets for the same quiz with a single read of its questions
+        
+        Questions are read from the primary. Returns None if they could not be read.
+        """
+        if snapshot_id is not None:
+            questions = self.get_snapshot_rows(snapshot_id, primary=True)
+            return [self.score_answers(questions, answers, negative_marking) for answers in answer_sets] if questions else None
+        
+        if not self.connection:
+            if not self.connect():
+                return None
+        
+        quiz_table = self._quiz_table(table_name)
+        if not quiz_table:
+            return None
+        
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(quiz_table.select_questions)
+            
+            questions = cursor.fetchall()
+            cursor.close()
+            
+            return [self.score_answers(questions, answers, negative_marking) for answers in answer_sets]
+            
+        except Exception as e:
+            print(f"Error grading quiz attempts: {e}")
+            return None
+    
+    @staticmethod
+    def apply_answer_keys(score_result, keys):
+        """Re-scores a graded result in place where its answer keys differ from keys
+        
+        keys maps question position to (RightAnswer, text of the right option). Returns
+        True if anything changed.
+        """
+        details = score_result['details']
+        changed = False
+        for position, (correct, correct_answer) in keys.items():
+            if position >= len(details) or details[position].get('correct_choice') == correct:
+                continue
+            detail = details[position]
+            student_choice = detail.get('student_choice', 0)
+            detail['correct_choice'] = correct
+            detail['correct_answer'] = correct_answer
+            detail['is_correct'] = student_choice == correct
+            detail['points'] = 1 if student_choice == correct else (-0.25 if student_choice > 0 else 0)
+            changed = True
+        if not changed:
+            return False
+        
+        correct_answers = sum(1 for detail in details if detail['is_correct'])
+        unanswered = sum(1 for detail in details if not detail.get('student_choice'))
+        wrong_answers = len(details) - correct_answers - unanswered
+        final_score = correct_answers - wrong_answers * 0.25 if score_result.get('negative_marking_applied', True) else correct_answers
+        total = score_result['total']
+        score_result.update({
+            'score': round(final_score, 2),
+            'correct_answers': correct_answers,
+            'wrong_answers': wrong_answers,
+            'unanswered': unanswered,
+            'percentage': round(final_score / total * 100, 2) if total > 0 else 0
+        })
+        return True
+    
+    @staticmethod
+    def score_answers(questions, student_answers, negative_marking=True):
+        """Scores student answers against an iterable of (Question, Option1-4, RightAnswer) rows"""
+        total = 0
+        correct_answers = 0
+        wrong_answers = 0
+        unanswered = 0
+        details = []
+        
+        # First pass: count correct, wrong, and unanswered
+        for i, (q_text, opt1, opt2, opt3, opt4, correct) in enumerate(questions):
+            total += 1
+            student_choice = student_answers.get(i, 0)
+            options = [opt1, opt2, opt3, opt4]
+            
+            if student_choice == correct:
+                correct_answers += 1
+                details.append({
+                    'question': q_text,
+                    'student_answer': options[student_choice - 1] if student_choice else "No answer",
+                    'correct_answer': options[correct - 1],
+                    'is_correct': True,
+                    'points': 1,
+                    'student_choice': student_choice,
+                    'correct_choice': correct
+                })
+            elif student_choice > 0:  # Wrong answer (student attempted)
+                wrong_answers += 1
+                details.append({
+                    'question': q_text,
+                    'student_answer': options[student_choice - 1] if student_choice else "No answer",
+                    'correct_answer': options[correct - 1],
+                    'is_correct': False,
+                    'points': -0.25,
+                    'student_choice': student_choice,
+                    'correct_choice': correct
+                })
+            else:  # No answer
+                unanswered += 1
+                details.append({
+                    'question': q_text,
+                    'student_answer': "No answer",
+                    'correct_answer': options[correct - 1],
+                    'is_correct': False,
+                    'points': 0,
+                    'student_choice': student_choice,
+                    'correct_choice': correct
+                })
+        
+        # Calculate final score using CORRECT logic
+        if negative_marking:
+            # Score = Correct answers - (Wrong answers * 0.25)
+            final_score = correct_answers - (wrong_answers * 0.25)
+        else:
+            # Score = Only correct answers (no negative marking)
+            final_score = correct_answers
+        
+        # Calculate percentage based on total possible score
+        percentage = (final_score / total) * 100 if total > 0 else 0
+        
+        return {
+            'score': round(final_score, 2),
+            'total': total,
+            'correct_answers': correct_answers,
+            'wrong_answers': wrong_answers,
+            'unanswered': unanswered,
+            'percentage': round(percentage, 2),
+            'details': details,
+            'negative_marking_applied': negative_marking
+        }
\ No newline at end of file
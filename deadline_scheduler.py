@@ -0,0 +1,170 @@
+"""
+Deadline Scheduler Module for Quiz Pool App
+Enforces quiz time limits on the server and auto-finalizes expired attempts
+"""
+
+import heapq
+import threading
+import time
+
+
+class DeadlineScheduler:
+    """Tracks timed quiz attempts in a heap ordered by expiry"""
+
+    def __init__(self, draft_store, grader, grace_seconds=5, sweep_interval=1.0, result_ttl=3600, on_result=None):
+        """
+        Args:
+            draft_store: DraftStore holding the in-progress answers
+            grader: Callable(table_name, negative_marking, [answers, ...], snapshot_id) returning a list of
+                score results, or None if the attempts could not be graded yet
+            grace_seconds: Allowance for network latency after the deadline
+            sweep_interval: Seconds between background sweeps
+            result_ttl: Seconds an auto-finalized result is kept for the student to collect
+            on_result: Optional callable(attempt_id, result, table_name, snapshot_id) run for each auto-finalized attempt
+        """
+        self.draft_store = draft_store
+        self.grader = grader
+        self.grace_seconds = grace_seconds
+        self.sweep_interval = sweep_interval
+        self.result_ttl = result_ttl
+        self.on_result = on_result
+        self._heap = []
+        self._attempts = {}
+        self._finalized = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, attempt_id, deadline, table_name, negative_marking, snapshot_id=None):
+        """Starts tracking an attempt that must be finished by the given epoch time"""
+        with self._lock:
+            self._attempts[attempt_id] = {
+                'deadline': deadline,
+                'table_name': table_name,
+                'negative_marking': negative_marking,
+                'snapshot_id': snapshot_id
+            }
+            heapq.heappush(self._heap, (deadline, attempt_id))
+        self.start()
+
+    def cancel(self, attempt_id):
+        """Stops tracking an attempt; its heap entry is skipped lazily"""
+        with self._lock:
+            self._attempts.pop(attempt_id, None)
+
+    def remaining(self, attempt_id, now=None):
+        """Seconds left for an attempt, or None if it is not tracked"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            attempt = self._attempts.get(attempt_id)
+            if attempt is None:
+                return None
+            return attempt['deadline'] - now
+
+    def is_expired(self, attempt_id, now=None):
+        """True once an attempt is past its deadline plus the grace period"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            if attempt_id in self._finalized:
+                return True
+            attempt = self._attempts.get(attempt_id)
+            return attempt is not None and now > attempt['deadline'] + self.grace_seconds
+
+    def collect(self, attempt_id):
+        """Returns and forgets the auto-finalized result for an attempt, if any"""
+        with self._lock:
+            entry = self._finalized.pop(attempt_id, None)
+        return entry[1] if entry else None
+
+    def sweep(self, now=None):
+        """Finalizes every attempt past its deadline. Returns the number finalized
+
+        An attempt's draft is only removed once it has been graded. When grading fails
+        (e.g. the database is unreachable) the attempt stays tracked and expired, and is
+        retried on the next sweep; a student submitting meanwhile is graded from the draft.
+        """
+        now = now if now is not None else time.time()
+        cutoff = now - self.grace_seconds
+        expired = []
+
+        with self._lock:
+            while self._heap and self._heap[0][0] <= cutoff:
+                deadline, attempt_id = heapq.heappop(self._heap)
+                attempt = self._attempts.get(attempt_id)
+                # Skip cancelled attempts and stale entries from re-registration
+                if attempt is None or attempt['deadline'] != deadline:
+                    continue
+                expired.append((attempt_id, attempt))
+
+            # Forget results nobody came back for
+            stale = [key for key, (finished, _) in self._finalized.items() if finished < now - self.result_ttl]
+            for key in stale:
+                del self._finalized[key]
+
+        if not expired:
+            return 0
+
+        # Group by quiz version so each version's questions are read once per sweep
+        by_quiz = {}
+        for attempt_id, attempt in expired:
+            answers = self.draft_store.get(attempt_id)
+            if answers is None:
+                # Submitted or discarded since it was popped
+                self._forget(attempt_id, attempt)
+                continue
+            key = (attempt['table_name'], attempt['negative_marking'], attempt['snapshot_id'])
+            by_quiz.setdefault(key, []).append((attempt_id, attempt, answers))
+
+        finalized = 0
+        for (table_name, negative_marking, snapshot_id), batch in by_quiz.items():
+            try:
+                results = self.grader(table_name, negative_marking, [answers for _, _, answers in batch], snapshot_id)
+            except Exception as e:
+                print(f"Error grading expired attempts for {table_name}: {e}")
+                results = None
+            if not results:
+                self._requeue(batch)
+                continue
+
+            for (attempt_id, attempt, _), result in zip(batch, results):
+                # A student who submitted while this was graded finalized the draft first; theirs stands
+                if self.draft_store.finalize(attempt_id) is None:
+                    self._forget(attempt_id, attempt)
+                    continue
+                with self._lock:
+                    if self._attempts.get(attempt_id) is attempt:
+                        del self._attempts[attempt_id]
+                    self._finalized[attempt_id] = (now, result)
+                finalized += 1
+                if self.on_result:
+                    self.on_result(attempt_id, result, attempt['table_name'], attempt['snapshot_id'])
+        return finalized
+
+    def _forget(self, attempt_id, attempt):
+        with self._lock:
+            if self._attempts.get(attempt_id) is attempt:
+                del self._attempts[attempt_id]
+
+    def _requeue(self, batch):
+        """Puts attempts whose grading failed back on the heap for the next sweep"""
+        with self._lock:
+            for attempt_id, attempt, _ in batch:
+                if self._attempts.get(attempt_id) is attempt:
+                    heapq.heappush(self._heap, (attempt['deadline'], attempt_id))
+
+    def start(self):
+        """Starts the background sweeper thread if it is not already running"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='quiz-deadline-sweeper', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping quiz deadlines: {e}")
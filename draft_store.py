@@ -0,0 +1,128 @@
+"""
+Draft Store Module for Quiz Pool App
+Keeps in-progress quiz answers on the server while a student is taking a quiz
+"""
+
+import threading
+import time
+import uuid
+from array import array
+
+# Seconds a draft may go untouched before it is treated as abandoned and dropped.
+# Timed attempts are finalized at their deadline long before this; it bounds the
+# memory held by untimed attempts whose student never submitted
+DRAFT_MAX_AGE = 12 * 3600
+
+# Abandoned drafts are swept at most this often, when a new attempt starts
+PURGE_INTERVAL = 300
+
+
+class QuizDraft:
+    """Compact answer sheet for a single quiz attempt"""
+
+    __slots__ = ('answers', 'seqs', 'updated')
+
+    def __init__(self, question_count):
+        # One byte per question: 0 = unanswered, 1-4 = chosen option
+        self.answers = bytearray(question_count)
+        # Sequence number of the batch that last set each answer
+        self.seqs = array('Q', bytes(8 * question_count))
+        self.updated = time.time()
+
+    def apply(self, deltas, seq=None):
+        """Applies a {question_index: choice} mapping, ignoring invalid entries
+
+        With a seq, an answer is only overwritten by a batch newer than the one that
+        set it, so a delayed batch cannot undo later changes to the same question but
+        still delivers its other answers. Without one the deltas are final and always apply.
+        """
+        applied = 0
+        for index, choice in deltas.items():
+            try:
+                index = int(index)
+                choice = int(choice)
+            except (TypeError, ValueError):
+                continue
+            if not (0 <= index < len(self.answers) and 0 <= choice <= 4):
+                continue
+            if seq is not None:
+                if seq <= self.seqs[index]:
+                    continue
+                self.seqs[index] = seq
+            self.answers[index] = choice
+            applied += 1
+        self.updated = time.time()
+        return applied
+
+    def as_dict(self):
+        """Returns answers in the {index: choice} shape used by calculate_quiz_score"""
+        return {i: choice for i, choice in enumerate(self.answers)}
+
+
+class DraftStore:
+    """Thread-safe in-process store of quiz drafts keyed by attempt ID"""
+
+    def __init__(self, max_age=DRAFT_MAX_AGE):
+        self.max_age = max_age
+        self._drafts = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+
+    def start(self, question_count):
+        """Creates an empty draft and returns its attempt ID"""
+        attempt_id = uuid.uuid4().hex
+        with self._lock:
+            self._drafts[attempt_id] = QuizDraft(question_count)
+            due = time.time() - self._last_purge >= PURGE_INTERVAL
+        if due:
+            self.purge_stale(self.max_age)
+        return attempt_id
+
+    def save(self, attempt_id, deltas, seq=None):
+        """Applies a batch of answer deltas. Returns the number applied or None if the draft is unknown
+
+        Batches can arrive out of order; each answer keeps the newest batch's value.
+        """
+        if seq is not None and seq <= 0:
+            return 0
+        with self._lock:
+            draft = self._drafts.get(attempt_id)
+            if draft is None:
+                return None
+            return draft.apply(deltas, seq)
+
+    def get(self, attempt_id):
+        """Returns the current answers for an attempt, or None if unknown"""
+        with self._lock:
+            draft = self._drafts.get(attempt_id)
+            return draft.as_dict() if draft else None
+
+    def finalize(self, attempt_id, deltas=None):
+        """Applies any last deltas, removes the draft and returns its answers"""
+        with self._lock:
+            draft = self._drafts.pop(attempt_id, None)
+            if draft is None:
+                return None
+            if deltas:
+                draft.apply(deltas)
+            return draft.as_dict()
+
+    def discard(self, attempt_id):
+        """Drops a draft without grading it"""
+        with self._lock:
+            self._drafts.pop(attempt_id, None)
+
+    def purge_stale(self, max_age_seconds):
+        """Removes drafts that have not been touched for max_age_seconds"""
+        now = time.time()
+        cutoff = now - max_age_seconds
+        with self._lock:
+            self._last_purge = now
+            stale = [key for key, draft in self._drafts.items() if draft.updated < cutoff]
+            for key in stale:
+                del self._drafts[key]
+        return len(stale)
+
+
+# Shared store used by the student routes
+draft_store = DraftStore()
@@ -0,0 +1,146 @@
+"""
+Duplicate Index Module for Quiz Pool App
+Finds duplicate and near-duplicate questions with MinHash signatures and LSH banding
+"""
+
+import hashlib
+import random
+import re
+import threading
+import zlib
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 64) - 1
+_WORD = re.compile(r"\w+")
+
+
+def normalize_question(text):
+    """Lower-cases and strips punctuation and extra whitespace so trivial edits compare equal"""
+    return ' '.join(_WORD.findall((text or '').lower()))
+
+
+class DuplicateIndex:
+    """In-memory near-duplicate index over question text
+
+    Exact duplicates (after normalization) are found with a hash lookup. Near
+    duplicates are found through LSH: a question is only compared with the
+    questions sharing at least one band of its MinHash signature, so lookups do
+    not scan the whole question bank.
+    """
+
+    def __init__(self, num_perm=32, bands=8, shingle_size=4, threshold=0.6, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+        self._entries = {}   # key -> (normalized hash, signature, text)
+        self._exact = {}     # normalized hash -> set of keys
+        self._buckets = {}   # (band, band values) -> set of keys
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def _shingles(self, normalized):
+        # Character shingles keep short questions comparable despite small wording edits
+        if len(normalized) <= self.shingle_size:
+            return {normalized} if normalized else set()
+        return {normalized[i:i + self.shingle_size] for i in range(len(normalized) - self.shingle_size + 1)}
+
+    def _signature(self, normalized):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in self._shingles(normalized)]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms)
+
+    def _bands(self, signature):
+        for band in range(self.bands):
+            yield (band, signature[band * self.rows:(band + 1) * self.rows])
+
+    def _fingerprint(self, text):
+        normalized = normalize_question(text)
+        exact = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+        return exact, self._signature(normalized)
+
+    def add(self, key, text):
+        """Indexes (or re-indexes) a question under key, e.g. (table_name, question_id)"""
+        exact, signature = self._fingerprint(text)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (exact, signature, text)
+            self._exact.setdefault(exact, set()).add(key)
+            for band in self._bands(signature):
+                self._buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        """Removes a question from the index"""
+        with self._lock:
+            self._remove(key)
+
+    def remove_where(self, predicate):
+        """Removes every key matching predicate, e.g. all questions of a dropped quiz"""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        exact, signature, _ = entry
+        self._discard(self._exact, exact, key)
+        for band in self._bands(signature):
+            self._discard(self._buckets, band, key)
+
+    @staticmethod
+    def _discard(mapping, bucket, key):
+        keys = mapping.get(bucket)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del mapping[bucket]
+
+    def find(self, text, exclude=None, limit=5, include=None):
+        """Returns up to limit matches as dicts with key, text, similarity and exact flag
+
+        include, if given, is a predicate on keys restricting which entries may match.
+        """
+        exact, signature = self._fingerprint(text)
+        with self._lock:
+            candidates = set(self._exact.get(exact, ()))
+            exact_keys = set(candidates)
+            for band in self._bands(signature):
+                candidates.update(self._buckets.get(band, ()))
+            candidates.discard(exclude)
+            if include is not None:
+                candidates = {key for key in candidates if include(key)}
+
+            matches = []
+            for key in candidates:
+                other_exact, other_signature, other_text = self._entries[key]
+                if key in exact_keys:
+                    similarity = 1.0
+                else:
+                    # Fraction of agreeing MinHash values estimates the Jaccard similarity
+                    agree = sum(1 for x, y in zip(signature, other_signature) if x == y)
+                    similarity = agree / self.num_perm
+                if similarity >= self.threshold:
+                    matches.append({
+                        'key': key,
+                        'text': other_text,
+                        'similarity': round(similarity, 2),
+                        'exact': key in exact_keys
+                    })
+
+        matches.sort(key=lambda match: match['similarity'], reverse=True)
+        return matches[:limit]
+
+
+# Shared index across the question bank; filled from the database on first use
+duplicate_index = DuplicateIndex()
@@ -0,0 +1,165 @@
+"""
+Event Bus Module for Quiz Pool App
+In-process publish/subscribe bus and the live exam monitor built on it
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from draft_store import DRAFT_MAX_AGE
+
+
+class EventBus:
+    """Synchronous in-process publish/subscribe bus"""
+
+    def __init__(self):
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, event_type, handler):
+        """Registers handler(**data) for an event type"""
+        with self._lock:
+            self._handlers.setdefault(event_type, []).append(handler)
+
+    def publish(self, event_type, **data):
+        """Delivers an event to every handler; a failing handler does not affect the others"""
+        with self._lock:
+            handlers = list(self._handlers.get(event_type, ()))
+        for handler in handlers:
+            try:
+                handler(**data)
+            except Exception as e:
+                print(f"Error handling {event_type} event: {e}")
+
+
+class ExamMonitor:
+    """Aggregates quiz activity once and shares the result with every viewer
+
+    Attempts count as in progress from quiz_started until they are submitted or
+    abandoned (quiz_abandoned), or until they have been idle as long as their draft
+    is kept (DRAFT_MAX_AGE), after which they can no longer be submitted either.
+    """
+
+    HISTOGRAM_BUCKETS = 10
+
+    def __init__(self, bus, idle_timeout=DRAFT_MAX_AGE, clock=time.time):
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._quizzes = {}
+        # attempt_id -> (table_name, last activity), least recently active first
+        self._open = OrderedDict()
+        self._version = 0
+        self._changed = threading.Condition()
+        bus.subscribe('quiz_started', self._on_started)
+        bus.subscribe('answers_saved', self._on_answered)
+        bus.subscribe('quiz_submitted', self._on_submitted)
+        bus.subscribe('quiz_abandoned', self._on_abandoned)
+
+    def _quiz(self, table_name):
+        quiz = self._quizzes.get(table_name)
+        if quiz is None:
+            quiz = {
+                'started': 0,
+                'in_progress': 0,
+                'answered': 0,
+                'submitted': 0,
+                'score_total': 0.0,
+                'histogram': [0] * self.HISTOGRAM_BUCKETS,
+                'updated': 0.0
+            }
+            self._quizzes[table_name] = quiz
+        return quiz
+
+    def _bump(self, quiz):
+        quiz['updated'] = time.time()
+        self._version += 1
+        self._changed.notify_all()
+
+    def _close(self, attempt_id):
+        """Stops counting an attempt as in progress; returns its quiz, or None if it was not open"""
+        entry = self._open.pop(attempt_id, None)
+        if entry is None:
+            return None
+        quiz = self._quiz(entry[0])
+        quiz['in_progress'] -= 1
+        return quiz
+
+    def _expire_idle(self):
+        cutoff = self._clock() - self.idle_timeout
+        while self._open:
+            attempt_id, (_, last_active) = next(iter(self._open.items()))
+            if last_active >= cutoff:
+                break
+            self._bump(self._close(attempt_id))
+
+    def _on_started(self, table_name, attempt_id=None, **_):
+        with self._changed:
+            quiz = self._quiz(table_name)
+            quiz['started'] += 1
+            if attempt_id is not None and attempt_id not in self._open:
+                self._open[attempt_id] = (table_name, self._clock())
+                quiz['in_progress'] += 1
+            self._bump(quiz)
+
+    def _on_answered(self, table_name, count=1, attempt_id=None, **_):
+        with self._changed:
+            quiz = self._quiz(table_name)
+            quiz['answered'] += count
+            if attempt_id in self._open:
+                self._open[attempt_id] = (table_name, self._clock())
+                self._open.move_to_end(attempt_id)
+            self._bump(quiz)
+
+    def _on_submitted(self, table_name, percentage=0, attempt_id=None, **_):
+        with self._changed:
+            self._close(attempt_id)
+            quiz = self._quiz(table_name)
+            quiz['submitted'] += 1
+            quiz['score_total'] += percentage
+            # Negative marking can push a score below zero; those land in the first bucket
+            bucket = int(max(0, min(percentage, 100)) * self.HISTOGRAM_BUCKETS // 100)
+            quiz['histogram'][min(bucket, self.HISTOGRAM_BUCKETS - 1)] += 1
+            self._bump(quiz)
+
+    def _on_abandoned(self, attempt_id=None, **_):
+        with self._changed:
+            quiz = self._close(attempt_id)
+            if quiz is not None:
+                self._bump(quiz)
+
+    def snapshot(self, prefix='', tables=None):
+        """Returns (version, {table_name: stats}) for quizzes whose table starts with prefix
+        
+        When tables is given, only those quizzes are included.
+        """
+        with self._changed:
+            self._expire_idle()
+            quizzes = {}
+            for table_name, quiz in self._quizzes.items():
+                if not table_name.startswith(prefix):
+                    continue
+                if tables is not None and table_name not in tables:
+                    continue
+                submitted = quiz['submitted']
+                quizzes[table_name] = {
+                    'started': quiz['started'],
+                    'in_progress': quiz['in_progress'],
+                    'answered': quiz['answered'],
+                    'submitted': submitted,
+                    'average_percentage': round(quiz['score_total'] / submitted, 2) if submitted else 0,
+                    'histogram': list(quiz['histogram']),
+                    'updated': quiz['updated']
+                }
+            return self._version, quizzes
+
+    def wait_for_change(self, since_version, timeout):
+        """Blocks until the aggregate changes after since_version or the timeout passes"""
+        with self._changed:
+            self._expire_idle()
+            self._changed.wait_for(lambda: self._version != since_version, timeout)
+            return self._version
+
+
+# Shared bus and monitor for the whole process
+event_bus = EventBus()
+exam_monitor = ExamMonitor(event_bus)
@@ -0,0 +1,297 @@
+"""
+Gradebook Module for Quiz Pool App
+Streams graded attempts and per-question responses as CSV, NDJSON or a columnar format
+
+Usable from the teacher pages and from the command line:
+
+    python gradebook.py Ann_Lee_Math --kind responses --format columnar -o math.parquet
+"""
+
+import argparse
+import csv
+import io
+import json
+import struct
+import sys
+
+# Rows encoded per chunk; memory stays bounded by this, not by the cohort size
+EXPORT_CHUNK_ROWS = 10000
+
+# Column layouts, in the order DatabaseManager.iter_gradebook_* yields them
+ATTEMPT_COLUMNS = (
+    ('attempt_id', 'str'),
+    ('student_id', 'str'),
+    ('student_name', 'str'),
+    ('section', 'str'),
+    ('intake', 'str'),
+    ('university', 'str'),
+    ('snapshot_id', 'int'),
+    ('started', 'str'),
+    ('submitted', 'str'),
+    ('score', 'float'),
+    ('total', 'int'),
+    ('percentage', 'float'),
+    ('correct_answers', 'int'),
+    ('wrong_answers', 'int'),
+    ('unanswered', 'int'),
+    ('elapsed_seconds', 'int'),
+    ('auto_submitted', 'bool'),
+)
+
+RESPONSE_COLUMNS = (
+    ('attempt_id', 'str'),
+    ('student_id', 'str'),
+    ('question_number', 'int'),
+    ('student_choice', 'int'),
+    ('correct_choice', 'int'),
+    ('is_correct', 'bool'),
+    ('points', 'float'),
+)
+
+EXPORT_KINDS = {
+    'attempts': ATTEMPT_COLUMNS,
+    'responses': RESPONSE_COLUMNS
+}
+
+# Format name -> (mimetype, file extension); 'columnar' resolves to parquet or compact
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'compact': ('application/octet-stream', 'qgb')
+}
+
+# Compact binary format, used when pyarrow is not installed. All integers little-endian:
+#   header: b'QPGB', version (u8), column count (u16), then per column:
+#           type code (u8: i=int64, d=float64, b=bool, s=string), name length (u16), UTF-8 name
+#   chunk:  row count (u32), then per column a null bitmap (bit set = NULL, ceil(rows / 8) bytes)
+#           followed by int64/float64/u8 values, or for strings u32 offsets (rows + 1) and a UTF-8 blob
+#   end:    row count 0
+COMPACT_MAGIC = b'QPGB'
+COMPACT_VERSION = 1
+_COMPACT_TYPES = {'int': b'i', 'float': b'd', 'bool': b'b', 'str': b's'}
+
+
+def _chunks(rows, size=EXPORT_CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_csv(rows, columns):
+    """Yields a CSV export in encoded chunks"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def export_ndjson(rows, columns):
+    """Yields one JSON object per line, in encoded chunks"""
+    names = [name for name, _ in columns]
+    for chunk in _chunks(rows):
+        yield ''.join(json.dumps(dict(zip(names, row)), default=str) + '\n' for row in chunk).encode('utf-8')
+
+
+def _compact_column(values, column_type):
+    count = len(values)
+    bitmap = bytearray((count + 7) // 8)
+    for index, value in enumerate(values):
+        if value is None:
+            bitmap[index // 8] |= 1 << (index % 8)
+
+    if column_type == 'str':
+        encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+        offsets = [0]
+        for item in encoded:
+            offsets.append(offsets[-1] + len(item))
+        return bytes(bitmap) + struct.pack(f'<{count + 1}I', *offsets) + b''.join(encoded)
+    if column_type == 'float':
+        return bytes(bitmap) + struct.pack(f'<{count}d', *(0.0 if value is None else float(value) for value in values))
+    if column_type == 'bool':
+        return bytes(bitmap) + bytes(0 if value is None else int(bool(value)) for value in values)
+    return bytes(bitmap) + struct.pack(f'<{count}q', *(0 if value is None else int(value) for value in values))
+
+
+def export_compact(rows, columns):
+    """Yields the compact columnar binary format described above, one chunk at a time"""
+    header = [COMPACT_MAGIC, struct.pack('<BH', COMPACT_VERSION, len(columns))]
+    for name, column_type in columns:
+        encoded_name = name.encode('utf-8')
+        header.append(_COMPACT_TYPES[column_type] + struct.pack('<H', len(encoded_name)) + encoded_name)
+    yield b''.join(header)
+
+    for chunk in _chunks(rows):
+        parts = [struct.pack('<I', len(chunk))]
+        for index, (_, column_type) in enumerate(columns):
+            parts.append(_compact_column([row[index] for row in chunk], column_type))
+        yield b''.join(parts)
+    yield struct.pack('<I', 0)
+
+
+def read_compact(stream):
+    """Reads the compact format back, yielding one dict per row"""
+    def read(size):
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError("Truncated gradebook export")
+        return data
+
+    if read(4) != COMPACT_MAGIC:
+        raise ValueError("Not a compact gradebook export")
+    version, column_count = struct.unpack('<BH', read(3))
+    if version != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact gradebook version: {version}")
+
+    codes = {code: column_type for column_type, code in _COMPACT_TYPES.items()}
+    columns = []
+    for _ in range(column_count):
+        column_type = codes[read(1)]
+        name_length, = struct.unpack('<H', read(2))
+        columns.append((read(name_length).decode('utf-8'), column_type))
+
+    while True:
+        count, = struct.unpack('<I', read(4))
+        if not count:
+            return
+        values = []
+        for _, column_type in columns:
+            bitmap = read((count + 7) // 8)
+            if column_type == 'str':
+                offsets = struct.unpack(f'<{count + 1}I', read(4 * (count + 1)))
+                blob = read(offsets[-1])
+                column = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+            elif column_type == 'float':
+                column = list(struct.unpack(f'<{count}d', read(8 * count)))
+            elif column_type == 'bool':
+                column = [bool(value) for value in read(count)]
+            else:
+                column = list(struct.unpack(f'<{count}q', read(8 * count)))
+            values.append([None if bitmap[i // 8] >> (i % 8) & 1 else value for i, value in enumerate(column)])
+        for i in range(count):
+            yield {name: column[i] for (name, _), column in zip(columns, values)}
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def export_parquet(rows, columns):
+    """Yields a Parquet file with one row group per chunk (requires pyarrow)"""
+    # Imported here so the app does not load pyarrow unless a Parquet export is requested
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {'int': pa.int64(), 'float': pa.float64(), 'bool': pa.bool_(), 'str': pa.string()}
+    schema = pa.schema([(name, arrow_types[column_type]) for name, column_type in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+    try:
+        for chunk in _chunks(rows):
+            arrays = [pa.array([row[index] for row in chunk], type=schema.field(index).type)
+                      for index in range(len(columns))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def columnar_format():
+    """Parquet when pyarrow is installed, otherwise the compact binary format"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'compact'
+
+
+def export(rows, kind, export_format):
+    """Returns (chunk generator, mimetype, file extension) for an export
+
+    Raises ValueError for an unknown kind or format.
+    """
+    if kind not in EXPORT_KINDS:
+        raise ValueError(f"Unknown gradebook kind: {kind!r}")
+    if export_format == 'columnar':
+        export_format = columnar_format()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown gradebook format: {export_format!r}")
+
+    writers = {
+        'csv': export_csv,
+        'ndjson': export_ndjson,
+        'parquet': export_parquet,
+        'compact': export_compact
+    }
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    return writers[export_format](rows, EXPORT_KINDS[kind]), mimetype, extension
+
+
+def gradebook_rows(db_manager, table_name, kind):
+    """Streams the rows of one export kind from the database"""
+    if kind == 'responses':
+        return db_manager.iter_gradebook_responses(table_name)
+    return db_manager.iter_gradebook_attempts(table_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a quiz gradebook")
+    parser.add_argument('table_name', help="Quiz table name, e.g. Ann_Lee_Math")
+    parser.add_argument('--kind', choices=sorted(EXPORT_KINDS), default='attempts')
+    parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS) + ['columnar'], default='csv')
+    parser.add_argument('-o', '--output', help="Output file (default: standard output)")
+    args = parser.parse_args(argv)
+
+    from database import DatabaseManager
+    db_manager = DatabaseManager()
+    chunks, _, _ = export(gradebook_rows(db_manager, args.table_name, args.kind), args.kind, args.export_format)
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+        db_manager.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+IRT Module for Quiz Pool App
+Calibrates 1PL/2PL item response theory models over a quiz's stored responses
+
+Requires NumPy, which is only imported when a calibration runs. Usable from the
+teacher analytics page and from the command line:
+
+    python irt.py Ann_Lee_Math --model 2pl
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+MODELS = ('1pl', '2pl')
+
+# Students per vectorized pass; working memory is a few (chunk x items) arrays, not the cohort
+CALIBRATION_CHUNK_ROWS = 2048
+
+# Responses mapped into the matrix per batch while it is being built
+BUILD_BATCH_ROWS = 65536
+
+# Ability quadrature: fixed nodes over a standard normal population distribution
+QUADRATURE_POINTS = 21
+QUADRATURE_RANGE = 4.0
+
+MAX_EM_CYCLES = 200
+NEWTON_STEPS = 3
+TOLERANCE = 1e-4
+
+# Weak normal priors keep items everyone (or no one) answered correctly from diverging
+DISCRIMINATION_PRIOR_VAR = 4.0
+INTERCEPT_PRIOR_VAR = 25.0
+DISCRIMINATION_BOUNDS = (0.05, 8.0)
+
+# Matrix cell for a question the student was never shown (e.g. added in a later version)
+NOT_PRESENTED = -1
+
+
+class ResponseMatrix:
+    """Students x items matrix of scored responses: 1 correct, 0 incorrect, NOT_PRESENTED otherwise
+
+    Stored densely as int8, so 100k students x 1k items takes 100 MB; the fit reads
+    it a chunk of students at a time.
+    """
+
+    def __init__(self, values, student_ids, item_ids):
+        self.values = values
+        self.student_ids = student_ids
+        self.item_ids = item_ids
+
+    @classmethod
+    def from_rows(cls, rows, item_ids):
+        """Builds the matrix from (student_id, item_id, is_correct) rows; unknown items are skipped"""
+        import numpy as np
+
+        item_ids = list(item_ids)
+        columns = {item_id: index for index, item_id in enumerate(item_ids)}
+        students = {}
+        values = np.full((1024, len(item_ids)), NOT_PRESENTED, dtype=np.int8)
+        batch_rows, batch_columns, batch_values = [], [], []
+
+        def flush(values):
+            if not batch_rows:
+                return values
+            row_index = np.array(batch_rows, dtype=np.int64)
+            needed = len(students)
+            if needed > len(values):
+                # Doubling keeps the number of copies logarithmic in the cohort size
+                grown = np.full((max(needed, 2 * len(values)), len(item_ids)), NOT_PRESENTED, dtype=np.int8)
+                grown[:len(values)] = values
+                values = grown
+            values[row_index, np.array(batch_columns, dtype=np.int64)] = np.array(batch_values, dtype=np.int8)
+            del batch_rows[:], batch_columns[:], batch_values[:]
+            return values
+
+        for student_id, item_id, is_correct in rows:
+            column = columns.get(item_id)
+            if column is None:
+                continue
+            row = students.get(student_id)
+            if row is None:
+                row = students[student_id] = len(students)
+            batch_rows.append(row)
+            batch_columns.append(column)
+            batch_values.append(1 if is_correct else 0)
+            if len(batch_rows) >= BUILD_BATCH_ROWS:
+                values = flush(values)
+        values = flush(values)
+
+        return cls(values[:len(students)], list(students), item_ids)
+
+    def chunks(self, chunk_rows=CALIBRATION_CHUNK_ROWS):
+        """Yields (start row, float correct indicators, float presented indicators) per chunk of students"""
+        for start in range(0, len(self.student_ids), chunk_rows):
+            block = self.values[start:start + chunk_rows]
+            yield start, (block == 1).astype(float), (block != NOT_PRESENTED).astype(float)
+
+
+def _log_sigmoid(z):
+    import numpy as np
+    return -np.logaddexp(0, -z)
+
+
+def _posterior(correct, presented, log_p, log_q, log_prior):
+    """Posterior weights over the quadrature nodes for a chunk of students, and their log-likelihood"""
+    import numpy as np
+
+    log_weights = correct @ log_p + (presented - correct) @ log_q + log_prior
+    peak = log_weights.max(axis=1, keepdims=True)
+    weights = np.exp(log_weights - peak)
+    totals = weights.sum(axis=1, keepdims=True)
+    return weights / totals, float((peak + np.log(totals)).sum())
+
+
+def calibrate(matrix, model='2pl', chunk_rows=CALIBRATION_CHUNK_ROWS, max_cycles=MAX_EM_CYCLES, tolerance=TOLERANCE):
+    """Fits a 1PL or 2PL model by marginal maximum likelihood (Bock-Aitkin EM)
+
+    Each EM cycle is one chunked pass over the students: the E-step turns a chunk
+    into posterior weights over fixed ability nodes with two matrix products, and
+    accumulates expected correct/presented counts per item and node. The M-step
+    then takes vectorized Newton steps for every item at once. Abilities are the
+    posterior means (EAP) under the final item parameters.
+
+    Returns {'model', 'cycles', 'converged', 'log_likelihood', 'items', 'students'}.
+    Raises ValueError for an unknown model or a matrix with no responses.
+    """
+    import numpy as np
+
+    if model not in MODELS:
+        raise ValueError(f"Unknown IRT model: {model!r}")
+    student_count, item_count = matrix.values.shape
+    if not student_count or not item_count:
+        raise ValueError("No submitted responses to calibrate.")
+
+    nodes = np.linspace(-QUADRATURE_RANGE, QUADRATURE_RANGE, QUADRATURE_POINTS)
+    log_prior = -0.5 * nodes ** 2
+    log_prior -= np.log(np.exp(log_prior).sum())
+
+    # Start from the classical p-values: intercept = logit(p), unit discrimination
+    presented_counts = np.zeros(item_count)
+    correct_counts = np.zeros(item_count)
+    for _, correct, presented in matrix.chunks(chunk_rows):
+        correct_counts += correct.sum(axis=0)
+        presented_counts += presented.sum(axis=0)
+    p_values = (correct_counts + 0.5) / (presented_counts + 1.0)
+    intercept = np.log(p_values / (1 - p_values))
+    slope = np.ones(item_count)
+
+    converged = False
+    log_likelihood = None
+    cycle = 0
+    for cycle in range(1, max_cycles + 1):
+        # E-step: expected correct (r) and presented (n) counts per item and ability node
+        logits = slope[:, None] * nodes[None, :] + intercept[:, None]
+        log_p, log_q = _log_sigmoid(logits), _log_sigmoid(-logits)
+        expected_correct = np.zeros((item_count, QUADRATURE_POINTS))
+        expected_presented = np.zeros((item_count, QUADRATURE_POINTS))
+        log_likelihood = 0.0
+        for _, correct, presented in matrix.chunks(chunk_rows):
+            weights, chunk_likelihood = _posterior(correct, presented, log_p, log_q, log_prior)
+            expected_correct += correct.T @ weights
+            expected_presented += presented.T @ weights
+            log_likelihood += chunk_likelihood
+
+        # M-step: Newton steps on each item's (slope, intercept), all items at once
+        previous_slope, previous_intercept = slope.copy(), intercept.copy()
+        for _ in range(NEWTON_STEPS):
+            probability = 1 / (1 + np.exp(-(slope[:, None] * nodes[None, :] + intercept[:, None])))
+            residual = expected_correct - expected_presented * probability
+            information = expected_presented * probability * (1 - probability)
+            gradient_c = residual.sum(axis=1) - intercept / INTERCEPT_PRIOR_VAR
+            hessian_cc = information.sum(axis=1) + 1 / INTERCEPT_PRIOR_VAR
+            if model == '2pl':
+                gradient_a = (residual * nodes).sum(axis=1) - (slope - 1) / DISCRIMINATION_PRIOR_VAR
+                hessian_aa = (information * nodes ** 2).sum(axis=1) + 1 / DISCRIMINATION_PRIOR_VAR
+                hessian_ac = (information * nodes).sum(axis=1)
+                determinant = hessian_aa * hessian_cc - hessian_ac ** 2
+                step_a = (hessian_cc * gradient_a - hessian_ac * gradient_c) / determinant
+                step_c = (hessian_aa * gradient_c - hessian_ac * gradient_a) / determinant
+                slope = np.clip(slope + np.clip(step_a, -1, 1), *DISCRIMINATION_BOUNDS)
+            else:
+                step_c = gradient_c / hessian_cc
+            intercept = intercept + np.clip(step_c, -1, 1)
+
+        change = max(np.abs(slope - previous_slope).max(), np.abs(intercept - previous_intercept).max())
+        if change < tolerance:
+            converged = True
+            break
+
+    # Abilities: posterior mean and standard deviation per student under the final parameters
+    logits = slope[:, None] * nodes[None, :] + intercept[:, None]
+    log_p, log_q = _log_sigmoid(logits), _log_sigmoid(-logits)
+    ability = np.empty(student_count)
+    standard_error = np.empty(student_count)
+    answered = np.empty(student_count, dtype=np.int64)
+    for start, correct, presented in matrix.chunks(chunk_rows):
+        weights, _ = _posterior(correct, presented, log_p, log_q, log_prior)
+        mean = weights @ nodes
+        end = start + len(mean)
+        ability[start:end] = mean
+        standard_error[start:end] = np.sqrt(np.maximum(weights @ nodes ** 2 - mean ** 2, 0))
+        answered[start:end] = presented.sum(axis=1)
+
+    difficulty = -intercept / slope
+    return {
+        'model': model,
+        'cycles': cycle,
+        'converged': converged,
+        'log_likelihood': round(log_likelihood, 3),
+        'items': [{
+            'item_id': item_id,
+            'difficulty': round(float(difficulty[index]), 4),
+            'discrimination': round(float(slope[index]), 4),
+            'responses': int(presented_counts[index]),
+            'p_value': round(float(correct_counts[index] / presented_counts[index]), 4) if presented_counts[index] else None
+        } for index, item_id in enumerate(matrix.item_ids)],
+        'students': [{
+            'student_id': student_id,
+            'ability': round(float(ability[index]), 4),
+            'standard_error': round(float(standard_error[index]), 4),
+            'responses': int(answered[index])
+        } for index, student_id in enumerate(matrix.student_ids)]
+    }
+
+
+def calibrate_quiz(db_manager, table_name, model='2pl'):
+    """Builds a quiz's response matrix from its graded attempts, fits the model and stores the results
+
+    Raises ImportError without NumPy and ValueError when there is nothing to calibrate
+    or the results could not be saved.
+    """
+    import numpy  # noqa: F401  (fail before reading the responses)
+
+    items = db_manager.get_calibration_items(table_name)
+    matrix = ResponseMatrix.from_rows(db_manager.iter_calibration_responses(table_name), items)
+    result = calibrate(matrix, model)
+    if not db_manager.save_calibration(table_name, result):
+        raise ValueError("Calibration results could not be saved.")
+    return result
+
+
+class CalibrationJobs:
+    """Runs calibrations in background threads, at most one per quiz, and keeps each quiz's last outcome
+
+    An EM fit over a large cohort takes far longer than a request should, so the teacher
+    starts it and the analytics page shows its status until the parameters are saved.
+    """
+
+    def __init__(self, clock=time.time):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def start(self, db_manager, table_name, model='2pl'):
+        """Starts calibrating a quiz; returns False if a calibration of it is already running
+
+        Raises ImportError without NumPy and ValueError for an unknown model, before any work starts.
+        """
+        import numpy  # noqa: F401
+        if model not in MODELS:
+            raise ValueError(f"Unknown IRT model: {model!r}")
+
+        with self._lock:
+            job = self._jobs.get(table_name)
+            if job and job['state'] == 'running':
+                return False
+            self._jobs[table_name] = {'state': 'running', 'model': model, 'started': self._clock(),
+                                      'finished': None, 'message': None}
+
+        thread = threading.Thread(target=self._run, args=(db_manager, table_name, model),
+                                  name=f'irt-{table_name}', daemon=True)
+        thread.start()
+        return True
+
+    def _run(self, db_manager, table_name, model):
+        try:
+            result = calibrate_quiz(db_manager, table_name, model)
+        except Exception as e:
+            print(f"Error calibrating {table_name}: {e}")
+            self._finish(table_name, 'failed', str(e) if isinstance(e, ValueError) else 'Calibration failed.')
+        else:
+            self._finish(table_name, 'done',
+                         f"Calibrated {len(result['items'])} questions from {len(result['students'])} students "
+                         f"({model.upper()}, {result['cycles']} EM cycles"
+                         f"{'' if result['converged'] else ', not fully converged'}).")
+        finally:
+            # The connection was opened for this thread only
+            db_manager.disconnect()
+
+    def _finish(self, table_name, state, message):
+        with self._lock:
+            job = self._jobs.get(table_name)
+            if job:
+                job.update(state=state, finished=self._clock(), message=message)
+
+    def status(self, table_name):
+        """Returns a copy of a quiz's latest job {'state', 'model', 'started', 'finished', 'message'}, or None"""
+        with self._lock:
+            job = self._jobs.get(table_name)
+            return dict(job) if job else None
+
+
+# Calibrations started from the teacher pages
+calibration_jobs = CalibrationJobs()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate IRT parameters for a quiz")
+    parser.add_argument('table_name', help="Quiz table name, e.g. Ann_Lee_Math")
+    parser.add_argument('--model', choices=MODELS, default='2pl')
+    args = parser.parse_args(argv)
+
+    from database import DatabaseManager
+    db_manager = DatabaseManager()
+    try:
+        result = calibrate_quiz(db_manager, args.table_name, args.model)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db_manager.disconnect()
+
+    print(f"{args.model.upper()}: {len(result['items'])} questions, {len(result['students'])} students, "
+          f"{result['cycles']} EM cycles{'' if result['converged'] else ' (not converged)'}")
+    for item in result['items']:
+        print(f"  question {item['item_id']}: difficulty {item['difficulty']:+.3f}, "
+              f"discrimination {item['discrimination']:.3f}, {item['responses']} responses")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Listing Cache Module for Quiz Pool App
+Short-lived cache of teacher and quiz listings with ETag-based conditional responses
+"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from flask import make_response, render_template, request, session
+from circuit_breaker import db_circuit
+
+# Seconds a cached listing is served before it is read again; bounds staleness from
+# changes made outside this process, since changes made here invalidate immediately
+DEFAULT_LISTING_TTL = 10
+
+# Changes on every restart, so a deploy with new templates never answers 304 for old pages
+_PROCESS_TAG = uuid.uuid4().hex[:8]
+
+
+class ListingCache:
+    """Caches listing query results per (namespace, key) with a catalog version per entry
+
+    The version is a fingerprint of the listing itself, so a listing reloaded after
+    its TTL with the same content keeps its version and browser caches stay valid.
+    """
+
+    def __init__(self, ttl=DEFAULT_LISTING_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, loader):
+        """Returns (listing, version), calling loader() only when the entry is missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry and entry[0] > now:
+                return entry[1], entry[2]
+
+        # Loaded outside the lock; concurrent misses may load twice, which is harmless
+        listing = loader()
+        version = hashlib.sha1(json.dumps(listing, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+        # An empty listing from an unreachable database must not outlive the outage
+        if not db_circuit.unavailable_this_request():
+            with self._lock:
+                self._entries[(namespace, key)] = (now + self.ttl, listing, version)
+        return listing, version
+
+    def invalidate(self, namespace=None):
+        """Drops every cached listing in a namespace (or all of them), e.g. after a quiz is created"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == namespace]:
+                    del self._entries[entry_key]
+
+
+def render_listing(template, versions, user_context, **context):
+    """Renders a listing page with an ETag, answering 304 when the browser's copy is current
+
+    The ETag covers the listing versions plus user_context, the per-user values the
+    page shows (e.g. the student's details), so one user's copy never validates for
+    another's page. The listings themselves are only represented by their versions.
+    """
+    # Pending flash messages make the page differ from the last render
+    if session.get('_flashes'):
+        return render_template(template, **context)
+
+    fingerprint = json.dumps([_PROCESS_TAG, template, versions, user_context], sort_keys=True, default=str)
+    etag = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(render_template(template, **context))
+    response.set_etag(etag)
+    # Browsers keep the page but must revalidate it, which costs one 304 when nothing changed
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# Shared by the student and teacher blueprints; the routes that change listings invalidate it
+listing_cache = ListingCache()
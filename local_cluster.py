@@ -0,0 +1,77 @@
+"""
+Local Cluster Module for Quiz Pool App
+SQLite stand-in for a SQL Server primary with read replicas, for exercising replica routing locally
+
+Only the routing layer is exercised: the stand-in answers the lag probe and plain
+queries, not the SQL Server dialect used by the quiz tables.
+
+Example:
+    cluster = LocalCluster(replica_count=2)
+    db = cluster.database_manager(max_staleness=5)
+    cluster.set_lag(0, 30)      # replica 0 is now 30 seconds behind
+    cluster.replicate()         # copy the primary's data to every replica
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from database import DatabaseManager
+
+PRIMARY = 'primary'
+LAG_QUERY = "SELECT lag_seconds FROM replica_status"
+
+
+class LocalCluster:
+    """A primary and N replica SQLite databases in a temporary directory"""
+    
+    def __init__(self, replica_count=1, directory=None):
+        self.directory = directory or tempfile.mkdtemp(prefix='quiz_cluster_')
+        self.replica_names = [f"replica{i}" for i in range(replica_count)]
+        self.connections_opened = {name: 0 for name in [PRIMARY] + self.replica_names}
+        for name in self.replica_names:
+            self._execute(name, "CREATE TABLE IF NOT EXISTS replica_status (lag_seconds INTEGER)")
+            self._execute(name, "DELETE FROM replica_status")
+            self._execute(name, "INSERT INTO replica_status VALUES (0)")
+    
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.db")
+    
+    def _execute(self, name, sql, *params):
+        connection = sqlite3.connect(self._path(name))
+        connection.execute(sql, params)
+        connection.commit()
+        connection.close()
+    
+    def connect(self, connection_string):
+        """connect_function for DatabaseManager: the connection string is the database name"""
+        self.connections_opened[connection_string] += 1
+        return sqlite3.connect(self._path(connection_string), check_same_thread=False)
+    
+    def set_lag(self, index, seconds):
+        """Sets what a replica reports as its lag; None simulates a suspended replica"""
+        self._execute(self.replica_names[index], "UPDATE replica_status SET lag_seconds = ?", seconds)
+    
+    def replicate(self, index=None):
+        """Copies the primary's tables onto one replica (or all), keeping its status row"""
+        targets = self.replica_names if index is None else [self.replica_names[index]]
+        source = sqlite3.connect(self._path(PRIMARY))
+        for name in targets:
+            target = sqlite3.connect(self._path(name))
+            lag = target.execute("SELECT lag_seconds FROM replica_status").fetchone()[0]
+            source.backup(target)
+            target.execute("CREATE TABLE IF NOT EXISTS replica_status (lag_seconds INTEGER)")
+            target.execute("DELETE FROM replica_status")
+            target.execute("INSERT INTO replica_status VALUES (?)", (lag,))
+            target.commit()
+            target.close()
+        source.close()
+    
+    def database_manager(self, max_staleness=5):
+        """Builds a DatabaseManager wired to this cluster"""
+        manager = DatabaseManager(replica_connection_strings=self.replica_names,
+                                  max_staleness=max_staleness,
+                                  connect_function=self.connect,
+                                  replica_lag_query=LAG_QUERY)
+        manager.connection_string = PRIMARY
+        return manager
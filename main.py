@@ -3,10 +3,15 @@ Main Application Module for Quiz Pool App
 Entry point that coordinates all modules and provides the main interface
 """
 
-from flask import Flask, render_template, redirect, url_for, flash, session
+from flask import Flask, render_template, redirect, url_for, flash, session, request, jsonify
 from database import DatabaseManager
+from circuit_breaker import db_circuit, OPEN, RESET_TIMEOUT
 from teacher import teacher_bp
 from student import student_bp
+import assets
+import math_render
+import media_store
+import math
 import os
 
 app = Flask(__name__)
@@ -16,14 +21,53 @@ app.secret_key = 'your-secret-key-change-this-in-production'
 app.register_blueprint(teacher_bp)
 app.register_blueprint(student_bp)
 
-# Initialize database manager
+# Fingerprinted static files from build_assets.py, when they have been built
+assets.init_app(app)
+
+# Question images, served from the content-addressed store at /media/<digest>
+media_store.init_app(app)
+
+# Formulas typeset when questions are saved, served from /math/<key>.svg
+math_render.init_app(app)
+
+# Initialize database manager; connections are opened lazily on first use
 db_manager = DatabaseManager()
 
-# Test database connection on startup
-if not db_manager.connect():
-    print("WARNING: Could not connect to database. Please check your SQL Server connection.")
-else:
-    print("Database connection established successfully.")
+
+def check_database_connection():
+    """Verifies the database is reachable, for the development server's startup banner"""
+    if not db_manager.connect():
+        print("WARNING: Could not connect to database. Please check your SQL Server connection.")
+    else:
+        print("Database connection established successfully.")
+
+
+def degraded_response():
+    """503 answer for pages that need the database while it is unreachable"""
+    retry_after = math.ceil(db_circuit.retry_after()) or RESET_TIMEOUT
+    if request.is_json or (request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html):
+        response = jsonify({'error': 'The database is temporarily unavailable.', 'retry_after': retry_after})
+        response.status_code = 503
+    else:
+        response = app.make_response((render_template('degraded.html', retry_after=retry_after), 503))
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+@app.before_request
+def fail_fast_while_database_down():
+    """Answers database-backed pages at once while the circuit breaker is open"""
+    db_circuit.begin_request()
+    if request.blueprint in ('teacher', 'student') and db_circuit.state == OPEN:
+        return degraded_response()
+
+
+@app.after_request
+def degrade_unavailable_requests(response):
+    """Replaces a page built while the database was unreachable, which would show empty lists"""
+    if db_circuit.unavailable_this_request() and response.status_code < 500:
+        return degraded_response()
+    return response
 
 
 @app.route('/')
@@ -61,4 +105,7 @@ if __name__ == '__main__':
         os.makedirs('static/css')
         os.makedirs('static/js')
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    check_database_connection()
+    
+    # Development server; set QUIZ_DEBUG=0 to turn the debugger off. Use wsgi.py for production.
+    app.run(debug=os.environ.get('QUIZ_DEBUG', '1') == '1', host='0.0.0.0', port=5000, threaded=True)
@@ -0,0 +1,251 @@
+"""
+Math Render Module for Quiz Pool App
+Typesets LaTeX formulas in question text once, when the question is saved, and reuses the result everywhere
+
+Formulas are written between $...$ or \\(...\\) for inline math and $$...$$ or \\[...\\]
+for display math. Each one is rendered with matplotlib's mathtext (imported only when a
+formula is rendered) to an SVG for the quiz pages and a PNG for PDF reports, and stored
+on disk under the hash of the formula, so a formula shared by many questions is rendered once.
+"""
+
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from flask import abort, send_file, url_for
+from markupsafe import Markup, escape
+
+# Bump when the rendering changes, so formulas are typeset again under new keys
+RENDER_VERSION = 1
+
+# Point size formulas are typeset at; pages scale them to the surrounding text in em
+FONT_SIZE = 16
+
+# PNGs for PDF reports are rendered at 3x so they stay sharp when printed
+PNG_DPI = 216
+
+# Rendered formulas never change under their key, so browsers may keep them for a year
+MATH_MAX_AGE = 365 * 24 * 3600
+
+# Metadata of recently shown formulas, kept in process
+METADATA_CACHE_SIZE = 4096
+
+# Display math first, so $$...$$ is not read as two empty inline formulas. A single $ must
+# hug its formula and not be followed by a digit, so prices such as "$5 and $10" stay text.
+MATH_PATTERN = re.compile(
+    r'\$\$(.+?)\$\$|\\\[(.+?)\\\]|\\\((.+?)\\\)|(?<![\\$])\$(?=\S)([^$\n]+?)(?<=\S)\$(?!\d)',
+    re.DOTALL
+)
+VALID_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+
+def find_formulas(text):
+    """Yields (match, tex, display) for each formula in text"""
+    for match in MATH_PATTERN.finditer(text or ''):
+        display = match.group(1) is not None or match.group(2) is not None
+        tex = next(group for group in match.groups() if group is not None).strip()
+        if tex:
+            yield match, tex, display
+
+
+def formula_key(tex, display):
+    """The formula hash its rendering is stored under"""
+    return hashlib.sha256(f"{RENDER_VERSION}|{'display' if display else 'inline'}|{tex}".encode('utf-8')).hexdigest()
+
+
+class MathCache:
+    """Rendered formulas on local disk, named by formula_key()
+
+    Each formula has <key>.svg, <key>.png and a <key>.json sidecar holding its size
+    in points (width, height and depth below the baseline), or the error mathtext
+    raised for it, so unsupported formulas are not retried on every page view.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._metadata = OrderedDict()
+        self._lock = threading.Lock()
+        # mathtext keeps module-level parser state, so formulas are typeset one at a time
+        self._render_lock = threading.Lock()
+
+    def _path(self, key, extension):
+        return os.path.join(self.root, key[:2], f"{key}.{extension}")
+
+    def _write_atomically(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+
+    def metadata(self, key):
+        """Returns a formula's metadata dict, or None if it has not been rendered"""
+        with self._lock:
+            cached = self._metadata.get(key)
+            if cached is not None:
+                self._metadata.move_to_end(key)
+                return cached
+
+        try:
+            with open(self._path(key, 'json'), encoding='utf-8') as handle:
+                metadata = json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            self._metadata[key] = metadata
+            if len(self._metadata) > METADATA_CACHE_SIZE:
+                self._metadata.popitem(last=False)
+        return metadata
+
+    def _typeset(self, tex):
+        """Renders one formula; returns (metadata, svg bytes, png bytes)"""
+        from matplotlib.figure import Figure
+        from matplotlib.font_manager import FontProperties
+        from matplotlib.mathtext import MathTextParser
+
+        source = f"${tex}$"
+        prop = FontProperties(size=FONT_SIZE)
+        width, height, depth, _, _ = MathTextParser('path').parse(source, dpi=72, prop=prop)
+
+        # The same layout matplotlib.mathtext.math_to_image uses, without the timestamp
+        # it writes into SVG metadata, so identical formulas give identical files
+        figure = Figure(figsize=(width / 72, height / 72))
+        figure.text(0, depth / height, source, fontproperties=prop)
+        svg, png = io.BytesIO(), io.BytesIO()
+        figure.savefig(svg, dpi=72, format='svg', transparent=True, metadata={'Date': None})
+        figure.savefig(png, dpi=PNG_DPI, format='png', transparent=True)
+
+        metadata = {'width': round(float(width), 2), 'height': round(float(height), 2),
+                    'depth': round(float(depth), 2)}
+        return metadata, svg.getvalue(), png.getvalue()
+
+    def render(self, tex, display):
+        """Metadata for a formula, typesetting and storing it first if needed
+
+        Returns None when matplotlib is not installed; nothing is stored then, so the
+        formula is rendered once it is.
+        """
+        key = formula_key(tex, display)
+        metadata = self.metadata(key)
+        if metadata is not None:
+            return metadata
+
+        with self._render_lock:
+            # Another thread may have rendered it while this one waited
+            metadata = self.metadata(key)
+            if metadata is not None:
+                return metadata
+            try:
+                metadata, svg, png = self._typeset(tex)
+            except ImportError:
+                return None
+            except Exception as e:
+                # mathtext supports a subset of LaTeX; remember the formula is unsupported.
+                # Its messages echo the formula above the reason, which is the last line.
+                lines = str(e).strip().splitlines()
+                metadata, svg, png = {'error': lines[-1] if lines else 'Invalid formula'}, None, None
+            if svg is not None:
+                self._write_atomically(self._path(key, 'svg'), svg)
+                self._write_atomically(self._path(key, 'png'), png)
+            metadata.update({'tex': tex, 'display': display})
+            # The sidecar goes last: its presence means the images are complete
+            self._write_atomically(self._path(key, 'json'), json.dumps(metadata).encode('utf-8'))
+
+        with self._lock:
+            self._metadata.pop(key, None)
+        return metadata
+
+    def prerender(self, *texts):
+        """Renders every formula in the given question and option texts, at save time
+
+        Returns a list of (tex, error) for formulas mathtext could not typeset.
+        """
+        problems = []
+        for text in texts:
+            for _, tex, display in find_formulas(text):
+                metadata = self.render(tex, display)
+                if metadata and metadata.get('error'):
+                    problems.append((tex, metadata['error']))
+        return problems
+
+    def _formula_html(self, match, tex, display):
+        metadata = self.render(tex, display)
+        if not metadata or metadata.get('error'):
+            # Shown as typed (already escaped) rather than breaking the question
+            return match.group(0)
+
+        key = formula_key(tex, display)
+        # Sized in em so formulas follow the surrounding font size
+        style = (f"width: {metadata['width'] / FONT_SIZE:.3f}em; height: {metadata['height'] / FONT_SIZE:.3f}em; "
+                 f"vertical-align: {-metadata['depth'] / FONT_SIZE or 0:.3f}em")
+        image = (f'<img src="{url_for("math_image", key=key)}" class="math-formula" style="{style}" '
+                 f'alt="{escape(tex)}" loading="lazy">')
+        return f'<span class="d-block text-center my-2">{image}</span>' if display else image
+
+    def render_html(self, text):
+        """Escapes question or option text and replaces its formulas with their rendered SVGs"""
+        escaped = str(escape(text or ''))
+        parts = []
+        position = 0
+        # Formulas are found in the escaped text so markup from earlier filters is left alone
+        for match, tex, display in find_formulas(escaped):
+            parts.append(escaped[position:match.start()])
+            parts.append(self._formula_html(match, html.unescape(tex), display))
+            position = match.end()
+        parts.append(escaped[position:])
+        return Markup(''.join(parts))
+
+    def pdf_markup(self, text, font_size):
+        """ReportLab paragraph markup for text, with formulas as inline PNGs scaled to font_size"""
+        source = text or ''
+        scale = font_size / FONT_SIZE
+        parts = []
+        position = 0
+        for match, tex, display in find_formulas(source):
+            parts.append(html.escape(source[position:match.start()], quote=False))
+            metadata = self.render(tex, display)
+            png_path = self._path(formula_key(tex, display), 'png')
+            if metadata and not metadata.get('error') and os.path.exists(png_path):
+                parts.append(f'<img src="{png_path}" width="{metadata["width"] * scale:.2f}" '
+                             f'height="{metadata["height"] * scale:.2f}" valign="{-metadata["depth"] * scale:.2f}"/>')
+            else:
+                parts.append(html.escape(match.group(0), quote=False))
+            position = match.end()
+        parts.append(html.escape(source[position:], quote=False))
+        return ''.join(parts)
+
+    def send(self, key):
+        """Response for a rendered formula's SVG, with an ETag and immutable caching"""
+        if not VALID_KEY.match(key):
+            abort(404)
+        path = self._path(key, 'svg')
+        if not os.path.exists(path):
+            abort(404)
+
+        response = send_file(path, mimetype='image/svg+xml', conditional=True, etag=key, max_age=MATH_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age={MATH_MAX_AGE}, immutable'
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        # Opened directly, the SVG may show itself but never run anything
+        response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'"
+        return response
+
+
+def init_app(app):
+    """Serves /math/<key>.svg and adds the with_math template filter"""
+    app.add_url_rule('/math/<key>.svg', 'math_image', math_cache.send)
+
+    @app.template_filter('with_math')
+    def with_math(text):
+        return math_cache.render_html(text)
+
+    return math_cache
+
+
+# Shared by the pages, the teacher routes that save questions and the PDF reports
+math_cache = MathCache(os.environ.get('QUIZ_MATH_ROOT')
+                       or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'math_cache'))
@@ -0,0 +1,218 @@
+"""
+Media Store Module for Quiz Pool App
+Content-addressed images for questions and options, stored once on disk and served with long-lived caching
+
+Question and option text refers to an image with a token such as [[media:<sha256>]],
+so quiz tables, snapshots and copies only ever carry the 64-character reference.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from flask import abort, send_file, url_for
+from markupsafe import Markup, escape
+
+# Uploads above this size are refused
+MAX_MEDIA_BYTES = 5 * 1024 * 1024
+
+# Resized widths generated once at upload time (only when smaller than the original)
+VARIANT_WIDTHS = (320, 960)
+
+# A blob's name is its hash, so its content never changes and browsers may keep it for a year
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+# Metadata of recently rendered images, kept in process since it never changes either
+METADATA_CACHE_SIZE = 1024
+
+MEDIA_TOKEN = re.compile(r"\[\[media:([0-9a-f]{64})\]\]")
+VALID_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+# Accepted image types, identified by their leading bytes rather than the uploaded file name
+_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png', 'PNG'),
+    (b'\xff\xd8\xff', 'image/jpeg', 'JPEG'),
+    (b'GIF87a', 'image/gif', 'GIF'),
+    (b'GIF89a', 'image/gif', 'GIF'),
+)
+
+
+class MediaError(Exception):
+    """An upload was rejected"""
+
+
+def sniff_image_type(data):
+    """Returns (content type, Pillow format) for a supported image, or None"""
+    for signature, content_type, image_format in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type, image_format
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp', 'WEBP'
+    return None
+
+
+def media_token(digest):
+    """The reference to embed in question or option text"""
+    return f"[[media:{digest}]]"
+
+
+class MediaStore:
+    """Deduplicated blobs on local disk, named by the SHA-256 of their content
+
+    Each blob lives at <root>/<first two hex digits>/<digest> with a small JSON
+    sidecar describing its type, size and resized variants. Storing the same
+    image twice, from any quiz, keeps a single copy.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._metadata = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _write_atomically(self, path, data):
+        # Concurrent uploads of the same image race harmlessly: both write identical bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as handle:
+            handle.write(data)
+        os.replace(temp_path, path)
+
+    def _store_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            self._write_atomically(path, data)
+        return digest
+
+    def put(self, data):
+        """Stores an uploaded image and its resized variants; returns its digest
+
+        Raises MediaError for files that are too large or not a supported image.
+        """
+        if len(data) > MAX_MEDIA_BYTES:
+            raise MediaError(f"Images must be smaller than {MAX_MEDIA_BYTES // (1024 * 1024)} MB.")
+        sniffed = sniff_image_type(data)
+        if not sniffed:
+            raise MediaError("Only PNG, JPEG, GIF and WebP images are supported.")
+        content_type, image_format = sniffed
+
+        digest = self._store_blob(data)
+        if self.metadata(digest):
+            return digest
+
+        metadata = {'content_type': content_type, 'size': len(data), 'width': None, 'height': None, 'variants': {}}
+        try:
+            # Imported here so the app does not need Pillow unless images are uploaded
+            from PIL import Image
+        except ImportError:
+            Image = None
+
+        if Image is not None:
+            try:
+                with Image.open(io.BytesIO(data)) as image:
+                    metadata['width'], metadata['height'] = image.size
+                    # Animated GIFs would lose their animation, so they are served as uploaded
+                    if not getattr(image, 'is_animated', False):
+                        for width in VARIANT_WIDTHS:
+                            if width >= image.width:
+                                continue
+                            height = max(1, round(image.height * width / image.width))
+                            resized = image.resize((width, height), Image.LANCZOS)
+                            if image_format == 'JPEG' and resized.mode not in ('RGB', 'L'):
+                                resized = resized.convert('RGB')
+                            buffer = io.BytesIO()
+                            resized.save(buffer, image_format, optimize=True)
+                            variant = self._store_blob(buffer.getvalue())
+                            self._write_metadata(variant, {'content_type': content_type, 'size': buffer.tell(),
+                                                           'width': width, 'height': height, 'variants': {}})
+                            metadata['variants'][str(width)] = variant
+            except Exception as e:
+                # The original is still usable; it is just served at full size
+                print(f"Error generating image variants: {e}")
+
+        self._write_metadata(digest, metadata)
+        return digest
+
+    def _write_metadata(self, digest, metadata):
+        self._write_atomically(self._path(digest) + '.json', json.dumps(metadata).encode('utf-8'))
+        with self._lock:
+            self._metadata.pop(digest, None)
+
+    def metadata(self, digest):
+        """Returns a blob's metadata dict, or None if it is not stored"""
+        with self._lock:
+            cached = self._metadata.get(digest)
+            if cached is not None:
+                self._metadata.move_to_end(digest)
+                return cached
+
+        try:
+            with open(self._path(digest) + '.json', encoding='utf-8') as handle:
+                metadata = json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+        with self._lock:
+            self._metadata[digest] = metadata
+            if len(self._metadata) > METADATA_CACHE_SIZE:
+                self._metadata.popitem(last=False)
+        return metadata
+
+    def image_html(self, digest, display_width):
+        """<img> markup for a stored image, letting the browser pick the smallest adequate variant"""
+        metadata = self.metadata(digest)
+        if not metadata:
+            return Markup('<span class="text-muted">[missing image]</span>')
+
+        sources = [(int(width), variant) for width, variant in metadata['variants'].items()]
+        if metadata['width']:
+            sources.append((metadata['width'], digest))
+        sources.sort()
+        srcset = ', '.join(f"{url_for('media', digest=variant)} {width}w" for width, variant in sources)
+        size_attributes = f' width="{metadata["width"]}" height="{metadata["height"]}"' if metadata['width'] else ''
+        return Markup(
+            f'<img src="{url_for("media", digest=digest)}"'
+            + (f' srcset="{srcset}" sizes="(max-width: {display_width}px) 100vw, {display_width}px"' if srcset else '')
+            + f'{size_attributes} style="max-width: min(100%, {display_width}px)" '
+            f'class="img-fluid d-block my-2 question-media" loading="lazy" alt="">'
+        )
+
+    def render(self, text, display_width=960):
+        """Escapes question or option text and turns its media tokens into images"""
+        escaped = str(escape(text or ''))
+        return Markup(MEDIA_TOKEN.sub(lambda match: self.image_html(match.group(1), display_width), escaped))
+
+    def send(self, digest):
+        """Response for a stored blob, with an ETag, immutable caching and Range support"""
+        if not VALID_DIGEST.match(digest):
+            abort(404)
+        metadata = self.metadata(digest)
+        path = self._path(digest)
+        if not metadata or not os.path.exists(path):
+            abort(404)
+
+        # conditional=True answers If-None-Match with 304 and Range with 206 Partial Content
+        response = send_file(path, mimetype=metadata['content_type'], conditional=True, etag=digest,
+                             max_age=MEDIA_MAX_AGE)
+        response.headers['Cache-Control'] = f'public, max-age={MEDIA_MAX_AGE}, immutable'
+        response.headers['X-Content-Type-Options'] = 'nosniff'
+        return response
+
+
+def init_app(app, root=None):
+    """Serves /media/<digest> and adds the with_media template filter"""
+    store = MediaStore(root or os.environ.get('QUIZ_MEDIA_ROOT') or os.path.join(app.root_path, 'media'))
+    app.extensions['media_store'] = store
+    app.add_url_rule('/media/<digest>', 'media', store.send)
+
+    @app.template_filter('with_media')
+    def with_media(text, display_width=960):
+        return store.render(text, display_width)
+
+    return store
@@ -3,24 +3,36 @@ PDF Generator Module for Quiz Pool App
 Handles PDF report generation for quiz results
 """
 
+import threading
 import time
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import black, red, green, blue, darkblue, lightgrey
-from reportlab.lib.units import inch
-from reportlab.platypus import Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from math_render import math_cache
 
 
 class PDFGenerator:
-    """Handles PDF generation for quiz results"""
+    """Handles PDF generation for quiz results
     
-    def __init__(self):
-        self.styles = self._setup_styles()
+    reportlab is imported and the paragraph styles are built on the first PDF,
+    so workers that never render a report do not pay for either.
+    """
+    
+    _styles = None
+    _styles_lock = threading.Lock()
+    
+    @property
+    def styles(self):
+        """Paragraph styles, built once per process"""
+        if PDFGenerator._styles is None:
+            with PDFGenerator._styles_lock:
+                if PDFGenerator._styles is None:
+                    PDFGenerator._styles = self._setup_styles()
+        return PDFGenerator._styles
     
     def _setup_styles(self):
         """Setup custom styles for PDF generation"""
+        from reportlab.lib.colors import black, red, green, blue, darkblue
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.enums import TA_CENTER
+        
         styles = getSampleStyleSheet()
         
         # Custom style for the main title
@@ -93,6 +105,11 @@ class PDFGenerator:
             subject: The quiz subject
         """
         try:
+            from reportlab.lib.pagesizes import letter
+            from reportlab.pdfgen import canvas
+            from reportlab.lib.colors import black, blue, darkblue, lightgrey
+            from reportlab.platypus import Paragraph
+            
             c = canvas.Canvas(filepath, pagesize=letter)
             width, height = letter
             margin_x = 50
@@ -184,20 +201,23 @@ class PDFGenerator:
                         y_position -= section_spacing / 2
                         c.setFont("Helvetica", 10)
 
-                    # Question
-                    q_p = Paragraph(f"Q: {detail['question']}", self.styles['QuestionStyle'])
+                    # Question (escaped, with its formulas as the PNGs typeset when it was saved)
+                    question_markup = math_cache.pdf_markup(detail['question'], self.styles['QuestionStyle'].fontSize)
+                    q_p = Paragraph(f"Q: {question_markup}", self.styles['QuestionStyle'])
                     q_p.wrapOn(c, width - 2 * margin_x - 10, height)
                     q_p.drawOn(c, margin_x + 10, y_position - q_p.height)
                     y_position -= q_p.height + 5
 
                     # Your Answer
-                    your_answer_p = Paragraph(f"Your Answer: {detail['your_answer']}", self.styles['YourAnswerStyle'])
+                    your_answer_markup = math_cache.pdf_markup(detail['your_answer'], self.styles['YourAnswerStyle'].fontSize)
+                    your_answer_p = Paragraph(f"Your Answer: {your_answer_markup}", self.styles['YourAnswerStyle'])
                     your_answer_p.wrapOn(c, width - 2 * margin_x - 20, height)
                     your_answer_p.drawOn(c, margin_x + 20, y_position - your_answer_p.height)
                     y_position -= your_answer_p.height + 3
 
                     # Correct Answer
-                    correct_answer_p = Paragraph(f"Correct Answer: {detail['correct_answer']}", self.styles['CorrectAnswerStyle'])
+                    correct_answer_markup = math_cache.pdf_markup(detail['correct_answer'], self.styles['CorrectAnswerStyle'].fontSize)
+                    correct_answer_p = Paragraph(f"Correct Answer: {correct_answer_markup}", self.styles['CorrectAnswerStyle'])
                     correct_answer_p.wrapOn(c, width - 2 * margin_x - 20, height)
                     correct_answer_p.drawOn(c, margin_x + 20, y_position - correct_answer_p.height)
                     y_position -= correct_answer_p.height + 10
@@ -0,0 +1,155 @@
+"""
+Quiz Bundle Module for Quiz Pool App
+Builds the whole of a published quiz as one compact JSON document, once per version, for client-side rendering
+
+A bundle holds the questions and options (rendered to HTML, images and formulas
+included), the timer and the negative-marking flag, and never the answers or
+anything about the student, so the same bytes can go to every student. Bundles of
+published snapshots are fetched through a signed URL handed out with the quiz page,
+which browsers and shared caches may keep; anything else needs a student session.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from flask import current_app, make_response, request
+from itsdangerous import BadSignature, URLSafeSerializer
+from math_render import math_cache
+
+# Bump when the bundle layout changes; it is part of every bundle and of the API path
+BUNDLE_SCHEMA_VERSION = 1
+
+# Bundles of published snapshots kept in process (the same quizzes are taken by many students)
+BUNDLE_CACHE_SIZE = 64
+
+# A bundle's URL carries its content hash, so a matching request may be cached for a year
+BUNDLE_MAX_AGE = 365 * 24 * 3600
+
+# Keeps bundle tokens from being accepted as any other signed value of the app
+BUNDLE_TOKEN_SALT = 'quiz-bundle'
+
+# Display widths images are rendered for, as on the server-rendered pages
+QUESTION_IMAGE_WIDTH = 960
+OPTION_IMAGE_WIDTH = 320
+
+
+class QuizBundle:
+    """One serialized bundle: its JSON body, a gzip copy and the ETag both share"""
+
+    __slots__ = ('body', 'gzipped', 'etag')
+
+    def __init__(self, document):
+        self.body = json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        # Compressed once here rather than on every response
+        self.gzipped = gzip.compress(self.body, compresslevel=9)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+
+
+def build_bundle(table_name, snapshot_id, questions, quiz_info):
+    """Renders a quiz's (question, options, correct) tuples into a bundle; the correct answers are dropped"""
+    store = current_app.extensions['media_store']
+
+    def html(text, width):
+        return str(math_cache.render_html(store.render(text, width)))
+
+    return QuizBundle({
+        'schema': BUNDLE_SCHEMA_VERSION,
+        'quiz': table_name,
+        'version': snapshot_id,
+        'timer_minutes': quiz_info['timer_minutes'] if quiz_info else 0,
+        'negative_marking': quiz_info['negative_marking'] if quiz_info else True,
+        'questions': [{
+            'text': html(question, QUESTION_IMAGE_WIDTH),
+            'options': [html(option, OPTION_IMAGE_WIDTH) for option in options]
+        } for question, options, _ in questions]
+    })
+
+
+def _token_serializer():
+    return URLSafeSerializer(current_app.secret_key, salt=BUNDLE_TOKEN_SALT)
+
+
+def bundle_token(table_name, snapshot_id):
+    """Signed token letting its holder fetch one published snapshot's bundle without a session"""
+    return _token_serializer().dumps([table_name, snapshot_id])
+
+
+def verify_bundle_token(token, table_name, snapshot_id):
+    """Whether token was issued by bundle_token() for this quiz and snapshot"""
+    if not token or not snapshot_id:
+        return False
+    try:
+        return _token_serializer().loads(token) == [table_name, snapshot_id]
+    except BadSignature:
+        return False
+
+
+class QuizBundleCache:
+    """LRU of bundles for published snapshots, keyed by everything a bundle contains
+
+    Snapshots never change, so a snapshot's bundle only changes with the quiz
+    settings, which are part of the key. Quizzes served from their live table
+    (snapshot_id None) are rebuilt on every request instead.
+    """
+
+    def __init__(self, size=BUNDLE_CACHE_SIZE):
+        self.size = size
+        self._bundles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, table_name, snapshot_id, quiz_info, load_questions):
+        """Returns the bundle, calling load_questions() only when it is not cached; None if there are no questions"""
+        key = (table_name, snapshot_id,
+               quiz_info['timer_minutes'] if quiz_info else 0, quiz_info['negative_marking'] if quiz_info else True)
+        if snapshot_id is not None:
+            with self._lock:
+                bundle = self._bundles.get(key)
+                if bundle is not None:
+                    self._bundles.move_to_end(key)
+                    return bundle
+
+        questions = load_questions()
+        if not questions:
+            return None
+        bundle = build_bundle(table_name, snapshot_id, questions, quiz_info)
+
+        if snapshot_id is not None:
+            with self._lock:
+                self._bundles[key] = bundle
+                while len(self._bundles) > self.size:
+                    self._bundles.popitem(last=False)
+        return bundle
+
+
+def bundle_response(bundle, signed=False):
+    """JSON response for a bundle, with its ETag and gzip when accepted
+
+    A signed request (see bundle_token) naming the bundle's own hash (?v=<etag>) may be
+    cached for a year by browsers and CDNs. Any other request is served the current
+    bundle and must be revalidated, which costs a 304 while it is unchanged; only signed
+    requests may be kept by shared caches.
+    """
+    if bundle.etag in request.if_none_match:
+        response = make_response('', 304)
+    elif 'gzip' in request.accept_encodings:
+        response = make_response(bundle.gzipped)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = make_response(bundle.body)
+
+    response.mimetype = 'application/json'
+    response.set_etag(bundle.etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if not signed:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    elif request.args.get('v') == bundle.etag:
+        response.headers['Cache-Control'] = f'public, max-age={BUNDLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+# Shared by the quiz page and the bundle API
+quiz_bundles = QuizBundleCache()
@@ -0,0 +1,152 @@
+"""
+Quiz Tables Module for Quiz Pool App
+Validated handles to quiz tables with their SQL statements built once
+"""
+
+import re
+import threading
+
+# Quiz table names arrive from URL segments; we only ever embed them bracket-quoted,
+# and refuse anything that could break out of the brackets or look like SQL
+VALID_TABLE_NAME = re.compile(r"^[^\[\]'\";\s\x00-\x1f]{1,128}$")
+
+# The app's own tables share the dbo schema with the quizzes and must never be resolved as one,
+# whatever a URL says (table names compare case-insensitively on SQL Server)
+RESERVED_TABLE_NAMES = frozenset(name.casefold() for name in (
+    'RegisteredTeachers', 'Teachers', 'QuizVersions', 'QuizSnapshots', 'QuizSnapshotQuestions',
+    'QuizQuestionRows', 'QuizOwnership', 'QuizAttempts', 'QuizAttemptResponses',
+    'QuizItemParameters', 'QuizStudentAbilities'
+))
+TEACHER_FOLDER_NAME = re.compile(r"^Teacher_\d+_.*_Metadata$", re.IGNORECASE)
+
+
+def is_valid_table_name(table_name):
+    """Checks that a quiz table name is safe to embed as a quoted identifier"""
+    return isinstance(table_name, str) and bool(VALID_TABLE_NAME.match(table_name))
+
+
+def is_quiz_table_name(table_name):
+    """Checks that a name is safe to embed and does not name one of the app's own tables"""
+    return (is_valid_table_name(table_name)
+            and table_name.casefold() not in RESERVED_TABLE_NAMES
+            and not TEACHER_FOLDER_NAME.match(table_name))
+
+
+def like_pattern(text):
+    """Escapes LIKE wildcards in user text and wraps it for a contains-match"""
+    escaped = text.replace('[', '[[]').replace('%', '[%]').replace('_', '[_]')
+    return f"%{escaped}%"
+
+
+def fulltext_condition(text):
+    """Turns free search text into a CONTAINS condition matching every word as a prefix"""
+    words = [word.replace('"', '') for word in text.split()]
+    return ' AND '.join(f'"{word}*"' for word in words if word)
+
+
+def quote_table_name(table_name):
+    """Returns the schema-qualified, bracket-quoted form of a validated table name"""
+    if not is_valid_table_name(table_name):
+        raise ValueError(f"Invalid table name: {table_name!r}")
+    return f"dbo.[{table_name}]"
+
+
+class QuizTable:
+    """Handle to one quiz table carrying its parameterized statements
+
+    The statement text is identical on every call, so SQL Server can reuse the
+    cached plan instead of compiling a fresh ad-hoc query each time.
+    """
+
+    SEARCH_COLUMNS = ('Question', 'Option1', 'Option2', 'Option3', 'Option4')
+
+    def __init__(self, table_name):
+        if not is_quiz_table_name(table_name):
+            raise ValueError(f"Not a quiz table: {table_name!r}")
+        quoted = quote_table_name(table_name)
+        self.name = table_name
+        self.quoted = quoted
+        # Whether the table has an active full-text index; None until checked
+        self.fulltext = None
+
+        # Questions are listed by SortOrder, which a reorder sets; questions never reordered
+        # (SortOrder NULL) sort by ID, so new questions go last
+        sort_key = "ISNULL(SortOrder, ID)"
+        self.select_questions = (
+            f"SELECT Question, Option1, Option2, Option3, Option4, RightAnswer FROM {quoted} ORDER BY {sort_key}"
+        )
+        self.select_question_by_id = (
+            f"SELECT ID, Question, Option1, Option2, Option3, Option4, RightAnswer FROM {quoted} WHERE ID = ?"
+        )
+        self.insert_question = (
+            f"INSERT INTO {quoted} (Question, Option1, Option2, Option3, Option4, RightAnswer) "
+            f"OUTPUT INSERTED.ID VALUES (?, ?, ?, ?, ?, ?)"
+        )
+        self.update_question = (
+            f"UPDATE {quoted} SET Question = ?, Option1 = ?, Option2 = ?, Option3 = ?, Option4 = ?, RightAnswer = ? "
+            f"WHERE ID = ?"
+        )
+        self.delete_question = f"DELETE FROM {quoted} WHERE ID = ?"
+        self.select_quiz_info = f"SELECT TOP 1 TimerMinutes, NegativeMarking FROM {quoted}"
+        self.drop = f"DROP TABLE {quoted}"
+        self.count_questions = f"SELECT COUNT(*) FROM {quoted}"
+        self.select_question_texts = f"SELECT ID, Question FROM {quoted}"
+        self.select_questions_with_id = (
+            f"SELECT ID, Question, Option1, Option2, Option3, Option4, RightAnswer FROM {quoted} ORDER BY {sort_key}"
+        )
+        self.select_answer_keys = f"SELECT ID, RightAnswer, Question FROM {quoted}"
+        self.select_sort_keys = f"SELECT ID, {sort_key} FROM {quoted}"
+        self.update_sort_order = f"UPDATE {quoted} SET SortOrder = ? WHERE ID = ?"
+        # Tables created before reordering existed get the column on first use
+        self.add_sort_column = (
+            f"IF COL_LENGTH('{quoted}', 'SortOrder') IS NULL ALTER TABLE {quoted} ADD SortOrder INT NULL"
+        )
+        self.sort_ready = False
+
+        # Keyset pagination in quiz order, optionally filtered by a full-text or LIKE search. The
+        # boundary is a question ID; its sort key is looked up (an ID no longer there is its own key)
+        search_filters = {
+            None: "",
+            'fulltext': f" AND CONTAINS(({', '.join(self.SEARCH_COLUMNS)}), ?)",
+            'like': " AND (" + " OR ".join(f"{column} LIKE ?" for column in self.SEARCH_COLUMNS) + ")"
+        }
+        self.page_questions = {}
+        for search_mode, search_filter in search_filters.items():
+            columns = "ID, Question, Option1, Option2, Option3, Option4, RightAnswer"
+            boundary = f"ISNULL((SELECT {sort_key} FROM {quoted} WHERE ID = ?), ?)"
+            self.page_questions[('after', search_mode)] = (
+                f"SELECT TOP (?) {columns} FROM {quoted} WHERE {sort_key} > {boundary}{search_filter} ORDER BY {sort_key} ASC"
+            )
+            self.page_questions[('before', search_mode)] = (
+                f"SELECT TOP (?) {columns} FROM {quoted} WHERE {sort_key} < {boundary}{search_filter} ORDER BY {sort_key} DESC"
+            )
+
+
+class QuizTableRegistry:
+    """Process-wide cache of validated quiz table handles keyed by table name"""
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_name):
+        """Returns the cached handle for a table name, or None if it has not been resolved"""
+        return self._tables.get(table_name)
+
+    def add(self, table_name):
+        """Registers a quiz table known to exist and returns its handle; raises ValueError for app tables"""
+        with self._lock:
+            handle = self._tables.get(table_name)
+            if handle is None:
+                handle = QuizTable(table_name)
+                self._tables[table_name] = handle
+            return handle
+
+    def forget(self, table_name):
+        """Drops a handle, e.g. after the table is dropped"""
+        with self._lock:
+            self._tables.pop(table_name, None)
+
+
+# Shared by every DatabaseManager so a drop seen by one is seen by all
+quiz_tables = QuizTableRegistry()
@@ -7,9 +7,9 @@ document.addEventListener('DOMContentLoaded', function() {
         return new bootstrap.Tooltip(tooltipTriggerEl);
     });
 
-    // Auto-hide alerts after 5 seconds
+    // Auto-hide alerts after 5 seconds (the quiz's connection status stays for the whole attempt)
     setTimeout(function() {
-        var alerts = document.querySelectorAll('.alert');
+        var alerts = document.querySelectorAll('.alert:not(#offline-status)');
         alerts.forEach(function(alert) {
             var bsAlert = new bootstrap.Alert(alert);
             bsAlert.close();
@@ -33,22 +33,43 @@ document.addEventListener('DOMContentLoaded', function() {
         startQuizTimer();
     }
 
-    // Option selection highlighting
-    var optionInputs = document.querySelectorAll('input[name^="question_"]');
-    optionInputs.forEach(function(input) {
-        input.addEventListener('change', function() {
-            // Remove selected class from all options in this question
-            var questionNumber = this.name.split('_')[1];
-            var allOptions = document.querySelectorAll('input[name="question_' + questionNumber + '"]');
-            allOptions.forEach(function(option) {
-                option.closest('.option-item').classList.remove('selected');
-            });
-            
-            // Add selected class to current option
-            this.closest('.option-item').classList.add('selected');
+    // Server-side answer autosave
+    var quizForm = document.getElementById('quiz-form');
+    if (quizForm && quizForm.dataset.autosaveUrl) {
+        startAnswerAutosave(quizForm, quizForm.dataset.autosaveUrl, 1500);
+    }
+
+    // Questions delivered as the quiz's JSON bundle are rendered before anything reads them
+    var quizQuestions = document.getElementById('quiz-questions');
+    var questionsReady = quizQuestions && quizQuestions.dataset.bundleUrl ?
+        renderQuizBundle(quizQuestions, quizQuestions.dataset.bundleUrl) : Promise.resolve();
+
+    // Question image uploads on the question editor
+    document.querySelectorAll('[data-media-upload-url]').forEach(startMediaUpload);
+
+    // Option selection highlighting (delegated, so it covers questions rendered from a bundle)
+    document.addEventListener('change', function(event) {
+        var input = event.target;
+        if (!input.name || input.name.indexOf('question_') !== 0) return;
+
+        // Remove selected class from all options in this question
+        var questionNumber = input.name.split('_')[1];
+        var allOptions = document.querySelectorAll('input[name="question_' + questionNumber + '"]');
+        allOptions.forEach(function(option) {
+            option.closest('.option-item').classList.remove('selected');
         });
+
+        // Add selected class to current option
+        input.closest('.option-item').classList.add('selected');
     });
 
+    // Answers kept on the device and an offline-safe submission (after the listeners above)
+    if (quizForm && quizForm.querySelector('input[name="submission_key"]')) {
+        questionsReady.then(function() {
+            startOfflineQuiz(quizForm);
+        });
+    }
+
     // Smooth scrolling for anchor links
     document.querySelectorAll('a[href^="#"]').forEach(function(anchor) {
         anchor.addEventListener('click', function(e) {
@@ -138,6 +159,319 @@ function autoSaveForm(formId, interval) {
     });
 }
 
+// Answer autosave: batches changed answers and sends them to the server after a quiet period
+function startAnswerAutosave(form, url, delay) {
+    var pending = {};
+    var inFlight = {};
+    var seq = 0;
+    var timer = null;
+
+    function flush() {
+        timer = null;
+        var batch = pending;
+        if (Object.keys(batch).length === 0) return;
+        pending = {};
+        seq++;
+        Object.keys(batch).forEach(function(key) {
+            inFlight[key] = batch[key];
+        });
+
+        fetch(url, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            credentials: 'same-origin',
+            body: JSON.stringify({answers: batch, seq: seq})
+        }).then(function(response) {
+            if (!response.ok && response.status !== 409 && response.status !== 410) {
+                throw new Error('Autosave failed: ' + response.status);
+            }
+        }).catch(function(e) {
+            // Put the batch back so it goes out with the next flush or the final submit
+            Object.keys(batch).forEach(function(key) {
+                if (!(key in pending)) pending[key] = batch[key];
+            });
+            console.log('Error saving answers:', e);
+        }).then(function() {
+            Object.keys(batch).forEach(function(key) {
+                if (inFlight[key] === batch[key]) delete inFlight[key];
+            });
+        });
+    }
+
+    // Delegated, so questions rendered after this runs are covered too
+    form.addEventListener('change', function(event) {
+        var name = event.target.name || '';
+        if (name.indexOf('question_') !== 0) return;
+        pending[name.split('_')[1]] = parseInt(event.target.value, 10);
+        if (timer) clearTimeout(timer);
+        timer = setTimeout(flush, delay || 1500);
+    });
+
+    // Anything not yet confirmed by the server travels with the submission itself
+    form.addEventListener('submit', function() {
+        if (timer) clearTimeout(timer);
+        var unsaved = {};
+        Object.keys(inFlight).forEach(function(key) {
+            unsaved[key] = inFlight[key];
+        });
+        Object.keys(pending).forEach(function(key) {
+            unsaved[key] = pending[key];
+        });
+        var field = form.querySelector('input[name="pending_answers"]');
+        if (field) field.value = JSON.stringify(unsaved);
+    });
+}
+
+// Question images: uploads the chosen file and inserts its token into the last focused text field
+function startMediaUpload(control) {
+    var form = control.closest('form');
+    var target = form.querySelector('#question');
+    var input = control.querySelector('input[type="file"]');
+    var status = control.querySelector('[data-media-status]');
+
+    form.querySelectorAll('textarea, input[type="text"]').forEach(function(field) {
+        field.addEventListener('focus', function() {
+            target = field;
+        });
+    });
+
+    input.addEventListener('change', function() {
+        if (!input.files.length) return;
+        var data = new FormData();
+        data.append('image', input.files[0]);
+        status.textContent = 'Uploading...';
+
+        fetch(control.dataset.mediaUploadUrl, {
+            method: 'POST',
+            credentials: 'same-origin',
+            body: data
+        }).then(function(response) {
+            return response.json();
+        }).then(function(result) {
+            if (!result.ok) throw new Error(result.error);
+            var position = target.selectionEnd != null ? target.selectionEnd : target.value.length;
+            var before = target.value.slice(0, position);
+            var separator = before && !/\s$/.test(before) ? ' ' : '';
+            target.value = before + separator + result.token + target.value.slice(position);
+            status.textContent = 'Image added to ' + (target.labels && target.labels.length ? target.labels[0].textContent.trim() : 'the field') + '.';
+        }).catch(function(e) {
+            status.textContent = e.message || 'Upload failed.';
+        }).then(function() {
+            input.value = '';
+        });
+    });
+}
+
+// Quiz bundle renderer: builds the question cards from the quiz's JSON bundle. The bundle's
+// question and option text is HTML already escaped by the server, images and formulas included.
+function renderQuizBundle(container, url) {
+    var status = container.querySelector('[data-bundle-status]');
+
+    function optionMarkup(questionIndex, optionHtml, optionIndex) {
+        var value = optionIndex + 1;
+        var id = 'q' + questionIndex + '_opt' + value;
+        return '<div class="option-item"><div class="form-check">' +
+            '<input class="form-check-input" type="radio" name="question_' + questionIndex + '" value="' + value + '" id="' + id + '">' +
+            '<label class="form-check-label" for="' + id + '">' + optionHtml + '</label>' +
+            '</div></div>';
+    }
+
+    return fetch(url, {credentials: 'same-origin'}).then(function(response) {
+        if (!response.ok) throw new Error('Could not load the questions (' + response.status + ').');
+        return response.json();
+    }).then(function(bundle) {
+        container.innerHTML = bundle.questions.map(function(question, questionIndex) {
+            return '<div class="question-card">' +
+                '<h5 class="mb-3"><i class="fas fa-question-circle me-2"></i>Question ' + (questionIndex + 1) + ': ' +
+                question.text + '</h5>' +
+                question.options.map(function(optionHtml, optionIndex) {
+                    return optionMarkup(questionIndex, optionHtml, optionIndex);
+                }).join('') +
+                '</div>';
+        }).join('');
+    }).catch(function(e) {
+        // A copy of the page saved for offline use already holds its questions
+        if (container.querySelector('.question-card')) return;
+        if (status) {
+            status.className = 'text-center text-danger my-5';
+            status.textContent = (e.message || 'Could not load the questions.') + ' Please reload the page.';
+        }
+    });
+}
+
+// Offline-resilient quiz: answers are kept in localStorage so the page can be reopened without a
+// connection, and the final submission goes through the quiz service worker, which queues it
+// and replays it until the server confirms it. Without a service worker the form posts normally.
+function startOfflineQuiz(form) {
+    var key = form.querySelector('input[name="submission_key"]').value;
+    var storageKey = 'quiz_answers_' + key;
+    var status = document.getElementById('offline-status');
+    var submitButton = form.querySelector('button[type="submit"]');
+    var answers = {};
+    var retryTimer = null;
+
+    try {
+        answers = JSON.parse(localStorage.getItem(storageKey)) || {};
+    } catch (e) {
+        answers = {};
+    }
+
+    // Restore answers from an earlier load of this attempt; the change events also resend them
+    Object.keys(answers).forEach(function(index) {
+        var input = form.querySelector('input[name="question_' + index + '"][value="' + answers[index] + '"]');
+        if (input && !input.checked) {
+            input.checked = true;
+            input.dispatchEvent(new Event('change', {bubbles: true}));
+        }
+    });
+
+    form.addEventListener('change', function(event) {
+        var name = event.target.name || '';
+        if (name.indexOf('question_') !== 0) return;
+        answers[name.split('_')[1]] = parseInt(event.target.value, 10);
+        try {
+            localStorage.setItem(storageKey, JSON.stringify(answers));
+        } catch (e) {
+            console.log('Error keeping answers on this device:', e);
+        }
+    });
+
+    function showStatus(message, category) {
+        status.textContent = message;
+        status.className = 'alert alert-' + category;
+    }
+
+    if (!('serviceWorker' in navigator) || !form.dataset.quizWorkerUrl) return;
+
+    navigator.serviceWorker.register(form.dataset.quizWorkerUrl).catch(function(e) {
+        console.log('Error registering the quiz service worker:', e);
+    });
+
+    // Hand the worker this page and everything it loaded, for reopening the quiz offline
+    navigator.serviceWorker.ready.then(function(registration) {
+        var assets = performance.getEntriesByType('resource').map(function(entry) {
+            return entry.name;
+        }).filter(function(url) {
+            var path = new URL(url).pathname;
+            return url.indexOf(location.origin + '/') === 0 &&
+                (path.indexOf('/static/') === 0 || path.indexOf('/media/') === 0 || path.indexOf('/math/') === 0 ||
+                 path.indexOf('/student/api/v1/quiz_bundle/') === 0);
+        });
+        registration.active.postMessage({
+            type: 'cache-quiz-page',
+            pageUrl: location.href,
+            html: '<!DOCTYPE html>\n' + document.documentElement.outerHTML,
+            assets: assets
+        });
+    });
+
+    function replay() {
+        if (navigator.serviceWorker.controller) {
+            navigator.serviceWorker.controller.postMessage({type: 'replay'});
+        }
+    }
+
+    navigator.serviceWorker.addEventListener('message', function(event) {
+        var data = event.data || {};
+        if (data.key !== key) return;
+        if (data.type === 'quiz-submitted') {
+            localStorage.removeItem(storageKey);
+            window.location.href = data.resultsUrl;
+        } else if (data.type === 'quiz-submit-queued') {
+            showStatus('Connection lost. Your answers are saved on this device and will be submitted ' +
+                'automatically when the connection returns. Please keep this page open.', 'warning');
+            // Nudge the worker when the retry is due, in case the browser stopped it meanwhile
+            if (retryTimer) clearTimeout(retryTimer);
+            retryTimer = setTimeout(replay, data.retryIn + 500);
+        } else if (data.type === 'quiz-submit-failed') {
+            showStatus(data.error || 'Your quiz could not be submitted.', 'danger');
+            submitButton.disabled = false;
+        }
+    });
+
+    window.addEventListener('online', replay);
+
+    // Registered after the autosave listener, which fills pending_answers first
+    form.addEventListener('submit', function(event) {
+        var worker = navigator.serviceWorker.controller;
+        if (!worker) return;
+        event.preventDefault();
+
+        // Every answer on the device travels with the submission, not only the unsaved ones
+        var field = form.querySelector('input[name="pending_answers"]');
+        var unsaved = {};
+        try {
+            unsaved = JSON.parse(field.value || '{}');
+        } catch (e) {
+            unsaved = {};
+        }
+        Object.keys(answers).forEach(function(index) {
+            unsaved[index] = answers[index];
+        });
+        field.value = JSON.stringify(unsaved);
+
+        submitButton.disabled = true;
+        showStatus('Submitting your quiz...', 'info');
+        worker.postMessage({
+            type: 'submit-quiz',
+            key: key,
+            url: form.action,
+            pageUrl: location.href,
+            body: new URLSearchParams(new FormData(form)).toString()
+        });
+    });
+}
+
+// Live exam monitor: polls the monitor's statistics and applies them to the monitor cards
+function startExamMonitor(url, pollMs) {
+    var status = document.getElementById('monitor-status');
+
+    function setStatus(live) {
+        if (status) {
+            status.textContent = live ? 'Live' : 'Reconnecting...';
+            status.className = live ? 'badge bg-success ms-2' : 'badge bg-warning text-dark ms-2';
+        }
+    }
+
+    function poll() {
+        // no-cache revalidates with the stored ETag, so an unchanged monitor costs a 304
+        fetch(url, {cache: 'no-cache', credentials: 'same-origin'}).then(function(response) {
+            if (!response.ok) throw new Error(response.status);
+            return response.json();
+        }).then(function(data) {
+            setStatus(true);
+            applyStats(data.quizzes);
+        }).catch(function() {
+            setStatus(false);
+        }).then(function() {
+            setTimeout(poll, pollMs);
+        });
+    }
+
+    function applyStats(quizzes) {
+        Object.keys(quizzes).forEach(function(tableName) {
+            var card = document.querySelector('[data-monitor-table="' + tableName + '"]');
+            if (!card) return;
+            var stats = quizzes[tableName];
+
+            card.querySelectorAll('[data-stat]').forEach(function(el) {
+                el.textContent = stats[el.dataset.stat];
+            });
+
+            var peak = Math.max.apply(null, stats.histogram.concat([1]));
+            var bars = card.querySelectorAll('[data-histogram] > div');
+            stats.histogram.forEach(function(count, i) {
+                if (bars[i]) {
+                    bars[i].style.height = (count / peak * 100) + '%';
+                    bars[i].title = (i * 10) + '-' + (i * 10 + 10) + '%: ' + count;
+                }
+            });
+        });
+    }
+
+    poll();
+}
+
 // Quiz progress tracking
 function updateQuizProgress(currentQuestion, totalQuestions) {
     var progressBar = document.getElementById('quiz-progress');
@@ -0,0 +1,268 @@
+// Offline quiz service worker for Quiz Pool App
+//
+// Keeps the quiz page and the files it loaded so the quiz can be reopened without a
+// connection, and owns the final submission: it is queued in IndexedDB under its
+// idempotency key and replayed with jittered backoff until the server answers, so a
+// dropped connection at the deadline neither loses the submission nor makes every
+// student retry at the same moment. The server grades each key only once.
+
+var PAGE_CACHE = 'quiz-pages-v1';
+var ASSET_CACHE = 'quiz-assets-v1';
+var MAX_CACHED_ASSETS = 300;
+
+var QUEUE_DB = 'quiz-submissions';
+var QUEUE_STORE = 'queue';
+
+// Full-jitter exponential backoff between replays (milliseconds)
+var RETRY_BASE = 1000;
+var RETRY_MAX = 60000;
+
+// Statuses that mean "try again later"; any other answer is final
+var RETRY_STATUSES = [408, 429, 500, 502, 503, 504];
+
+self.addEventListener('install', function() {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(caches.keys().then(function(names) {
+        return Promise.all(names.filter(function(name) {
+            return name.indexOf('quiz-') === 0 && name !== PAGE_CACHE && name !== ASSET_CACHE;
+        }).map(function(name) {
+            return caches.delete(name);
+        }));
+    }).then(function() {
+        return self.clients.claim();
+    }).then(replayQueue));
+});
+
+// --- Submission queue (IndexedDB) ---
+
+function openQueue() {
+    return new Promise(function(resolve, reject) {
+        var request = indexedDB.open(QUEUE_DB, 1);
+        request.onupgradeneeded = function() {
+            request.result.createObjectStore(QUEUE_STORE, {keyPath: 'key'});
+        };
+        request.onsuccess = function() { resolve(request.result); };
+        request.onerror = function() { reject(request.error); };
+    });
+}
+
+function queueTransaction(mode, work) {
+    return openQueue().then(function(db) {
+        return new Promise(function(resolve, reject) {
+            var transaction = db.transaction(QUEUE_STORE, mode);
+            var result = work(transaction.objectStore(QUEUE_STORE));
+            transaction.oncomplete = function() {
+                db.close();
+                resolve(result && 'result' in result ? result.result : undefined);
+            };
+            transaction.onerror = function() {
+                db.close();
+                reject(transaction.error);
+            };
+        });
+    });
+}
+
+function queuedSubmissions() {
+    return queueTransaction('readonly', function(store) { return store.getAll(); });
+}
+
+function saveSubmission(entry) {
+    return queueTransaction('readwrite', function(store) { store.put(entry); });
+}
+
+function removeSubmission(key) {
+    return queueTransaction('readwrite', function(store) { store.delete(key); });
+}
+
+// --- Replay ---
+
+function retryDelay(attempts, retryAfterSeconds) {
+    var delay = Math.random() * Math.min(RETRY_MAX, RETRY_BASE * Math.pow(2, attempts));
+    // The server's Retry-After (e.g. while the database is down) is a floor, still jittered
+    return retryAfterSeconds ? retryAfterSeconds * 1000 + delay : delay;
+}
+
+function notifyClients(message) {
+    return self.clients.matchAll({type: 'window', includeUncontrolled: true}).then(function(windows) {
+        windows.forEach(function(client) {
+            client.postMessage(message);
+        });
+    });
+}
+
+function sendSubmission(entry) {
+    return fetch(entry.url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'Accept': 'application/json',
+            'Idempotency-Key': entry.key
+        },
+        body: entry.body
+    }).then(function(response) {
+        if (RETRY_STATUSES.indexOf(response.status) !== -1) {
+            return {retry: true, retryAfter: parseInt(response.headers.get('Retry-After'), 10) || 0};
+        }
+        return response.json().catch(function() {
+            return {ok: false, error: 'Unexpected response (' + response.status + ')'};
+        });
+    }, function() {
+        // Network failure: the connection is down or dropped mid-request
+        return {retry: true, retryAfter: 0};
+    }).then(function(result) {
+        if (result.retry) {
+            entry.attempts += 1;
+            var delay = retryDelay(entry.attempts, result.retryAfter);
+            entry.next = Date.now() + delay;
+            return saveSubmission(entry).then(function() {
+                return notifyClients({type: 'quiz-submit-queued', key: entry.key, retryIn: delay});
+            });
+        }
+        return removeSubmission(entry.key).then(function() {
+            if (result.ok) {
+                return caches.open(PAGE_CACHE).then(function(cache) {
+                    return cache.delete(entry.pageUrl);
+                }).then(function() {
+                    return notifyClients({type: 'quiz-submitted', key: entry.key, resultsUrl: result.results_url});
+                });
+            }
+            return notifyClients({type: 'quiz-submit-failed', key: entry.key, error: result.error});
+        });
+    });
+}
+
+var replaying = null;
+var replayTimer = null;
+
+// Sends every queued submission that is due, then schedules the next one while the worker is alive
+function replayQueue() {
+    if (replaying) return replaying;
+    replaying = queuedSubmissions().then(function(entries) {
+        var now = Date.now();
+        return Promise.all(entries.filter(function(entry) {
+            return entry.next <= now;
+        }).map(sendSubmission));
+    }).then(queuedSubmissions).then(function(entries) {
+        if (replayTimer) clearTimeout(replayTimer);
+        replayTimer = null;
+        if (!entries.length) return;
+        var next = Math.min.apply(null, entries.map(function(entry) { return entry.next; }));
+        replayTimer = setTimeout(replayQueue, Math.max(0, next - Date.now()));
+        // Background Sync wakes the worker when connectivity returns, even with the tab closed
+        if (self.registration.sync) {
+            return self.registration.sync.register('quiz-submissions').catch(function() {});
+        }
+    }).catch(function(e) {
+        console.log('Error replaying quiz submissions:', e);
+    }).then(function() {
+        replaying = null;
+    });
+    return replaying;
+}
+
+self.addEventListener('sync', function(event) {
+    if (event.tag === 'quiz-submissions') {
+        event.waitUntil(replayQueue());
+    }
+});
+
+// --- Messages from the quiz page ---
+
+function cachePage(data) {
+    var page = new Response(data.html, {headers: {'Content-Type': 'text/html; charset=utf-8'}});
+    return caches.open(PAGE_CACHE).then(function(cache) {
+        return cache.put(data.pageUrl, page);
+    }).then(function() {
+        return caches.open(ASSET_CACHE);
+    }).then(function(cache) {
+        return Promise.all(data.assets.map(function(url) {
+            return cache.match(url).then(function(hit) {
+                return hit || cache.add(url).catch(function() {});
+            });
+        })).then(function() {
+            return trimCache(cache);
+        });
+    });
+}
+
+function trimCache(cache) {
+    // Entries come back oldest first; drop the oldest beyond the limit
+    return cache.keys().then(function(requests) {
+        return Promise.all(requests.slice(0, Math.max(0, requests.length - MAX_CACHED_ASSETS)).map(function(request) {
+            return cache.delete(request);
+        }));
+    });
+}
+
+self.addEventListener('message', function(event) {
+    var data = event.data || {};
+    if (data.type === 'cache-quiz-page') {
+        event.waitUntil(cachePage(data));
+    } else if (data.type === 'submit-quiz') {
+        event.waitUntil(saveSubmission({
+            key: data.key,
+            url: data.url,
+            body: data.body,
+            pageUrl: data.pageUrl,
+            attempts: 0,
+            next: 0
+        }).then(replayQueue));
+    } else if (data.type === 'replay') {
+        event.waitUntil(replayQueue());
+    }
+});
+
+// --- Fetches ---
+
+function isImmutableAsset(url) {
+    // Fingerprinted builds, question images, formulas and signed quiz bundles named by
+    // their content hash (?v=) never change under the same URL
+    return url.pathname.indexOf('/static/dist/') === 0 || url.pathname.indexOf('/media/') === 0 ||
+        url.pathname.indexOf('/math/') === 0 ||
+        (url.pathname.indexOf('/student/api/v1/quiz_bundle/') === 0 && url.searchParams.has('v') &&
+         url.searchParams.has('token'));
+}
+
+self.addEventListener('fetch', function(event) {
+    var request = event.request;
+    var url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+
+    if (request.mode === 'navigate') {
+        // Quiz pages always come from the network (opening one starts an attempt); the copy
+        // kept for the attempt in progress is only used when the network is unreachable
+        event.respondWith(fetch(request).catch(function() {
+            return caches.open(PAGE_CACHE).then(function(cache) {
+                return cache.match(request, {ignoreSearch: true});
+            }).then(function(page) {
+                return page || Response.error();
+            });
+        }));
+        return;
+    }
+
+    if (isImmutableAsset(url)) {
+        event.respondWith(caches.open(ASSET_CACHE).then(function(cache) {
+            return cache.match(request).then(function(hit) {
+                return hit || fetch(request).then(function(response) {
+                    if (response.ok) cache.put(request, response.clone());
+                    return response;
+                });
+            });
+        }));
+    } else if (url.pathname.indexOf('/static/') === 0) {
+        // Unfingerprinted static files may change, so the network wins when it answers
+        event.respondWith(fetch(request).catch(function() {
+            return caches.open(ASSET_CACHE).then(function(cache) {
+                return cache.match(request);
+            }).then(function(hit) {
+                return hit || Response.error();
+            });
+        }));
+    }
+});
@@ -3,18 +3,47 @@ Student Module for Quiz Pool App
 Handles student-related functionality including taking quizzes and viewing results
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, send_from_directory, jsonify, current_app
 from database import DatabaseManager
 from pdf_generator import PDFGenerator
+from draft_store import draft_store
+from deadline_scheduler import DeadlineScheduler
+from event_bus import event_bus
+from listing_cache import listing_cache, render_listing
+from submission_log import submission_log, VALID_SUBMISSION_KEY
+from quiz_bundle import quiz_bundles, bundle_response, bundle_token, verify_bundle_token
+import json
 import time
 import os
 import tempfile
+import uuid
 
 student_bp = Blueprint('student', __name__, url_prefix='/student')
 db_manager = DatabaseManager()
 pdf_generator = PDFGenerator()
 
 
+def _grade_expired_attempts(table_name, negative_marking, answer_sets, snapshot_id=None):
+    """Grades a batch of expired attempts for one quiz version; None if the questions could not be read"""
+    return db_manager.grade_quiz_attempts(table_name, answer_sets, negative_marking, snapshot_id)
+
+
+def _publish_submitted(table_name, attempt_id, snapshot_id, result):
+    """Announces a graded attempt, with the snapshot rows its answers belong to for analytics"""
+    row_ids = db_manager.get_snapshot_row_ids(snapshot_id) if snapshot_id else None
+    event_bus.publish('quiz_submitted', table_name=table_name, attempt_id=attempt_id,
+                      percentage=result['percentage'], details=result['details'], row_ids=row_ids)
+
+
+def _record_expired_attempt(attempt_id, result, table_name, snapshot_id=None):
+    """Stores an attempt that was auto-submitted at its deadline, announcing it once it is stored"""
+    if db_manager.record_attempt_result(attempt_id, result, auto_submitted=True):
+        _publish_submitted(table_name, attempt_id, snapshot_id, result)
+
+
+deadline_scheduler = DeadlineScheduler(draft_store, _grade_expired_attempts, on_result=_record_expired_attempt)
+
+
 @student_bp.route('/details', methods=['GET', 'POST'])
 def details():
     """Student details entry page"""
@@ -41,8 +70,8 @@ def details():
         flash('Student details saved successfully!', 'success')
         return redirect(url_for('student.select_teacher'))
     
-    teachers = db_manager.get_all_registered_teachers()
-    return render_template('student/details.html', teachers=teachers)
+    teachers, version = listing_cache.get('teachers', None, db_manager.get_all_registered_teachers)
+    return render_listing('student/details.html', [version], None, teachers=teachers)
 
 
 @student_bp.route('/select_teacher', methods=['GET', 'POST'])
@@ -68,8 +97,8 @@ def select_teacher():
         else:
             flash('Invalid teacher selection.', 'error')
     
-    teachers = db_manager.get_all_registered_teachers()
-    return render_template('student/select_teacher.html', teachers=teachers)
+    teachers, version = listing_cache.get('teachers', None, db_manager.get_all_registered_teachers)
+    return render_listing('student/select_teacher.html', [version], None, teachers=teachers)
 
 
 @student_bp.route('/dashboard')
@@ -84,13 +113,15 @@ def dashboard():
     student_details = session['student_details']
     selected_teacher = session['selected_teacher']
     
-    # Get quizzes for the selected teacher using simplified approach
-    quizzes = db_manager.get_simple_quizzes(selected_teacher['name'])
+    # Get quizzes for the selected teacher using simplified approach, cached per teacher
+    teacher_name, teacher_id = selected_teacher['name'], selected_teacher.get('teacher_id')
+    quizzes, version = listing_cache.get('quizzes', (teacher_id, teacher_name),
+                                         lambda: db_manager.get_simple_quizzes(teacher_name, teacher_id))
     
-    return render_template('student/dashboard.html', 
-                         student_details=student_details, 
-                         selected_teacher=selected_teacher,
-                         quizzes=quizzes)
+    return render_listing('student/dashboard.html', [version], [student_details, selected_teacher],
+                          student_details=student_details, 
+                          selected_teacher=selected_teacher,
+                          quizzes=quizzes)
 
 
 @student_bp.route('/take_quiz/<table_name>')
@@ -105,7 +136,13 @@ def take_quiz(table_name):
     teacher_prefix = selected_teacher['name'].replace(' ', '_').replace('-', '_')
     subject = table_name.replace(f"{teacher_prefix}_", "").replace('_', ' ').title()
     
-    questions = db_manager.get_all_questions(table_name)
+    # Pin the attempt to a published version so later edits cannot change it mid-attempt
+    snapshot = db_manager.get_current_snapshot(table_name)
+    snapshot_id = snapshot['snapshot_id'] if snapshot else None
+    if snapshot_id is not None:
+        questions = db_manager.get_snapshot_questions(snapshot_id)
+    else:
+        questions = db_manager.get_all_questions(table_name)
     
     if not questions:
         flash('No questions available in this quiz.', 'error')
@@ -114,79 +151,335 @@ def take_quiz(table_name):
     # Get quiz info (timer and negative marking) from the simplified table
     quiz_info = db_manager.get_quiz_info(table_name)
     
+    # Drop any draft left behind by an abandoned attempt
+    previous_session = session.get('quiz_session')
+    if previous_session and previous_session.get('attempt_id'):
+        draft_store.discard(previous_session['attempt_id'])
+        deadline_scheduler.cancel(previous_session['attempt_id'])
+        event_bus.publish('quiz_abandoned', attempt_id=previous_session['attempt_id'])
+    
+    timer_minutes = quiz_info['timer_minutes'] if quiz_info else 0
+    negative_marking = quiz_info['negative_marking'] if quiz_info else True
+    start_time = time.time()
+    attempt_id = draft_store.start(len(questions))
+    
+    # Timed quizzes get a server-side deadline
+    if timer_minutes > 0:
+        deadline_scheduler.register(attempt_id, start_time + timer_minutes * 60, table_name, negative_marking, snapshot_id)
+    
+    event_bus.publish('quiz_started', table_name=table_name, attempt_id=attempt_id)
+    db_manager.start_attempt(attempt_id, table_name, session['student_details'], snapshot_id)
+    
     # Store quiz session data
     session['quiz_session'] = {
+        'attempt_id': attempt_id,
         'table_name': table_name,
+        'snapshot_id': snapshot_id,
         'subject': subject,
         'teacher_name': selected_teacher['name'],
-        'start_time': time.time(),
+        'start_time': start_time,
         'questions': questions,
-        'timer_minutes': quiz_info['timer_minutes'] if quiz_info else 0,
-        'negative_marking': quiz_info['negative_marking'] if quiz_info else True
+        'timer_minutes': timer_minutes,
+        'negative_marking': negative_marking,
+        # Idempotency key sent with the submission, so a replayed submit is recognised
+        'submission_key': uuid.uuid4().hex
     }
     
+    # The questions reach the page as the quiz's shared JSON bundle, rendered by main.js;
+    # ?render=html renders them here instead, for browsers without JavaScript
+    bundle = quiz_bundles.get(table_name, snapshot_id, quiz_info, lambda: questions)
+    server_render = request.args.get('render') == 'html'
+    
     return render_template('student/take_quiz.html', 
                          subject=subject, 
+                         table_name=table_name,
                          teacher_name=selected_teacher['name'],
-                         questions=questions,
-                         timer_minutes=quiz_info['timer_minutes'] if quiz_info else 0,
-                         negative_marking=quiz_info['negative_marking'] if quiz_info else True)
+                         questions=questions if server_render else None,
+                         bundle_url=_bundle_url(table_name, snapshot_id, bundle),
+                         timer_minutes=timer_minutes,
+                         remaining_seconds=timer_minutes * 60,
+                         negative_marking=negative_marking,
+                         submission_key=session['quiz_session']['submission_key'])
+
+
+def _bundle_url(table_name, snapshot_id, bundle):
+    """Bundle API URL for the quiz page; a published snapshot's URL is signed so shared caches can serve it"""
+    if snapshot_id is None:
+        return url_for('student.quiz_bundle', table_name=table_name, snapshot_id=0, v=bundle.etag)
+    return url_for('student.quiz_bundle', table_name=table_name, snapshot_id=snapshot_id, v=bundle.etag,
+                   token=bundle_token(table_name, snapshot_id))
+
+
+@student_bp.route('/api/v1/quiz_bundle/<table_name>/<int:snapshot_id>')
+def quiz_bundle(table_name, snapshot_id):
+    """The whole quiz as one JSON bundle: questions, options, timer and negative marking, never answers
+    
+    Pinned to a published snapshot, or to the live questions when snapshot_id is 0. Needs
+    a student session, or the signed token the quiz page puts in a snapshot's URL; only
+    the signed form may be cached by a CDN.
+    """
+    signed = verify_bundle_token(request.args.get('token'), table_name, snapshot_id)
+    if not signed and 'student_details' not in session:
+        return jsonify({'ok': False, 'error': 'Not signed in'}), 403
+    
+    def load_questions():
+        if not snapshot_id:
+            return db_manager.get_all_questions(table_name)
+        # Snapshot IDs are global, so one must not be served under another quiz's name
+        if db_manager.get_snapshot_table(snapshot_id) != table_name:
+            return []
+        return db_manager.get_snapshot_questions(snapshot_id)
+    
+    bundle = quiz_bundles.get(table_name, snapshot_id or None, db_manager.get_quiz_info(table_name), load_questions)
+    if bundle is None:
+        return jsonify({'ok': False, 'error': 'Quiz not found'}), 404
+    return bundle_response(bundle, signed)
 
 
 @student_bp.route('/submit_quiz', methods=['POST'])
 def submit_quiz():
-    """Submit quiz and calculate results - UPDATED FOR SIMPLIFIED SYSTEM"""
-    if 'student_details' not in session or 'quiz_session' not in session:
+    """Submit quiz and calculate results - UPDATED FOR SIMPLIFIED SYSTEM
+    
+    Submissions carry an idempotency key (the submission_key field, or an Idempotency-Key
+    header from the offline service worker). A key is graded once; replays of it, e.g.
+    from a client retrying after its connection dropped, get the stored outcome. Clients
+    asking for JSON get {'ok', 'results_url'} instead of a redirect.
+    """
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    submission_key = request.headers.get('Idempotency-Key') or request.form.get('submission_key')
+    if submission_key and not VALID_SUBMISSION_KEY.match(submission_key):
+        submission_key = None
+    
+    if submission_key:
+        owner, outcome = submission_log.begin(submission_key)
+        if not owner:
+            if outcome is None:
+                # The first copy is still being graded: the offline worker retries shortly, and
+                # a browser is sent to the results page, which picks up the stored attempt
+                if not wants_json:
+                    return redirect(url_for('student.results', pending=1))
+                response = jsonify({'ok': False, 'error': 'Submission in progress'})
+                response.status_code = 503
+                response.headers['Retry-After'] = '2'
+                return response
+            return _submission_response(outcome, wants_json)
+    
+    outcome = None
+    try:
+        outcome = _grade_submission(submission_key)
+    finally:
+        if submission_key:
+            submission_log.finish(submission_key, outcome)
+    
+    if outcome is None:
+        if wants_json:
+            return jsonify({'ok': False, 'error': 'No quiz in progress'}), 409
         return redirect(url_for('student.details'))
+    return _submission_response(outcome, wants_json)
+
+
+def _grade_submission(submission_key):
+    """Grades the quiz in progress; returns its outcome, or None when there is nothing to grade"""
+    if 'student_details' not in session or 'quiz_session' not in session:
+        return None
     
     student_details = session['student_details']
     quiz_session = session['quiz_session']
     
-    # Collect student answers
-    student_answers = {}
-    for i in range(len(quiz_session['questions'])):
-        answer = request.form.get(f'question_{i}', 0)
-        student_answers[i] = int(answer) if answer else 0
-    
-    # Calculate score with negative marking
-    score_result = db_manager.calculate_quiz_score(
-        quiz_session['table_name'], 
-        student_answers, 
-        quiz_session['negative_marking']
-    )
+    # A key from another attempt (e.g. a page cached before a newer attempt started) is not this one
+    if submission_key and quiz_session.get('submission_key') not in (None, submission_key):
+        return None
+    
+    attempt_id = quiz_session.get('attempt_id')
+    timer_minutes = quiz_session['timer_minutes']
     
-    # Calculate time taken
+    # An attempt already stored (by the deadline sweep, or by a copy of this submission that
+    # another worker graded) is answered with its stored result, not graded again
+    stored = _stored_result(attempt_id)
+    if stored:
+        return _outcome(student_details, quiz_session, stored, stored['elapsed'], stored['auto_submitted'])
+    
+    # Answers arriving after the deadline are not graded; the draft as of the deadline is
+    expired = bool(attempt_id) and deadline_scheduler.is_expired(attempt_id)
+    score_result = deadline_scheduler.collect(attempt_id) if attempt_id else None
+    
+    if score_result is None:
+        # Finalize from the autosaved draft, applying any answers the client had not flushed yet
+        # and then the answers selected on the page, which are the student's final choices
+        student_answers = None
+        if attempt_id:
+            pending = None
+            if not expired:
+                try:
+                    pending = json.loads(request.form.get('pending_answers') or '{}')
+                except ValueError:
+                    pending = {}
+                if not isinstance(pending, dict):
+                    pending = {}
+                for i in range(len(quiz_session['questions'])):
+                    answer = request.form.get(f'question_{i}')
+                    if answer:
+                        pending[str(i)] = answer
+            student_answers = draft_store.finalize(attempt_id, pending)
+            deadline_scheduler.cancel(attempt_id)
+        
+        # Fall back to the submitted form when there is no draft (e.g. JavaScript disabled)
+        if student_answers is None:
+            student_answers = {}
+            if not expired:
+                for i in range(len(quiz_session['questions'])):
+                    answer = request.form.get(f'question_{i}', 0)
+                    student_answers[i] = int(answer) if answer else 0
+        
+        # Calculate score with negative marking
+        score_result = db_manager.calculate_quiz_score(
+            quiz_session['table_name'], 
+            student_answers, 
+            quiz_session['negative_marking'],
+            quiz_session.get('snapshot_id')
+        )
+    
+    # Calculate time taken, capped at the time limit for timed quizzes
     end_time = time.time()
     elapsed = round(end_time - quiz_session['start_time'])
+    if timer_minutes > 0:
+        expired = expired or elapsed > timer_minutes * 60
+        elapsed = min(elapsed, timer_minutes * 60)
+    
+    # Keep the graded attempt for the gradebook; only the copy that stores it announces it
+    if attempt_id:
+        if db_manager.record_attempt_result(attempt_id, score_result, elapsed, expired):
+            _publish_submitted(quiz_session['table_name'], attempt_id, quiz_session.get('snapshot_id'), score_result)
+        else:
+            # Stored meanwhile (e.g. by the deadline sweep): the stored result is the one that counts
+            stored = _stored_result(attempt_id)
+            if stored:
+                return _outcome(student_details, quiz_session, stored, stored['elapsed'], stored['auto_submitted'])
     
-    # Store results in session with all new fields
-    session['quiz_results'] = {
-        'score': score_result['score'],
-        'total': score_result['total'],
-        'percentage': score_result['percentage'],
-        'elapsed': elapsed,
-        'details': score_result['details'],
-        'subject': quiz_session['subject'],
-        'teacher_name': quiz_session['teacher_name'],
-        'negative_marking': quiz_session['negative_marking'],
-        'timer_minutes': quiz_session['timer_minutes'],
-        'auto_submitted': elapsed > (quiz_session['timer_minutes'] * 60) if quiz_session['timer_minutes'] > 0 else False,
-        # Add the new fields from the updated scoring function
-        'correct_answers': score_result.get('correct_answers', 0),
-        'wrong_answers': score_result.get('wrong_answers', 0),
-        'unanswered': score_result.get('unanswered', 0),
-        'negative_marking_applied': score_result.get('negative_marking_applied', True)
+    return _outcome(student_details, quiz_session, score_result, elapsed, expired)
+
+
+def _stored_result(attempt_id):
+    """The attempt's stored result, dropping whatever the process still holds for it; None if not stored"""
+    stored = db_manager.get_attempt_result(attempt_id) if attempt_id else None
+    if stored:
+        draft_store.discard(attempt_id)
+        deadline_scheduler.cancel(attempt_id)
+        deadline_scheduler.collect(attempt_id)
+    return stored
+
+
+def _outcome(student_details, quiz_session, score_result, elapsed, expired):
+    """A submission's outcome: the student it belongs to and the results shown to them"""
+    return {
+        'student_id': student_details['student_id'],
+        'quiz_results': {
+            'score': score_result['score'],
+            'total': score_result['total'],
+            'percentage': score_result['percentage'],
+            'elapsed': elapsed,
+            'details': score_result['details'],
+            'subject': quiz_session['subject'],
+            'teacher_name': quiz_session['teacher_name'],
+            'negative_marking': quiz_session['negative_marking'],
+            'timer_minutes': quiz_session['timer_minutes'],
+            'auto_submitted': expired,
+            # Add the new fields from the updated scoring function
+            'correct_answers': score_result.get('correct_answers', 0),
+            'wrong_answers': score_result.get('wrong_answers', 0),
+            'unanswered': score_result.get('unanswered', 0),
+            'negative_marking_applied': score_result.get('negative_marking_applied', quiz_session['negative_marking'])
+        }
     }
+
+
+def _submission_response(outcome, wants_json):
+    """Stores a graded submission's results in the session and sends the student to them"""
+    student_details = session.get('student_details')
+    if not student_details or student_details['student_id'] != outcome['student_id']:
+        # Only the student who submitted may collect a stored outcome
+        if wants_json:
+            return jsonify({'ok': False, 'error': 'No quiz in progress'}), 409
+        return redirect(url_for('student.details'))
+    
+    session['quiz_results'] = outcome['quiz_results']
     
     # Clear quiz session
     session.pop('quiz_session', None)
     
+    if wants_json:
+        return jsonify({'ok': True, 'results_url': url_for('student.results')})
     return redirect(url_for('student.results'))
 
 
+@student_bp.route('/autosave', methods=['POST'])
+def autosave():
+    """Stores a batch of answer changes for the quiz in progress"""
+    quiz_session = session.get('quiz_session')
+    if not quiz_session or not quiz_session.get('attempt_id'):
+        return jsonify({'ok': False, 'error': 'No quiz in progress'}), 409
+    
+    if deadline_scheduler.is_expired(quiz_session['attempt_id']):
+        return jsonify({'ok': False, 'error': 'Time is up'}), 410
+    
+    payload = request.get_json(silent=True) or {}
+    answers = payload.get('answers')
+    if not isinstance(answers, dict):
+        return jsonify({'ok': False, 'error': 'Invalid answers payload'}), 400
+    
+    seq = payload.get('seq')
+    applied = draft_store.save(quiz_session['attempt_id'], answers, seq if isinstance(seq, int) else None)
+    if applied is None:
+        return jsonify({'ok': False, 'error': 'Quiz attempt expired'}), 410
+    
+    if applied:
+        event_bus.publish('answers_saved', table_name=quiz_session['table_name'], attempt_id=quiz_session['attempt_id'],
+                          count=applied)
+    
+    return jsonify({'ok': True, 'applied': applied})
+
+
+@student_bp.route('/time_remaining')
+def time_remaining():
+    """Lets the quiz page resync its countdown with the server deadline"""
+    quiz_session = session.get('quiz_session')
+    if not quiz_session or not quiz_session.get('attempt_id'):
+        return jsonify({'ok': False, 'error': 'No quiz in progress'}), 409
+    
+    remaining = deadline_scheduler.remaining(quiz_session['attempt_id'])
+    if remaining is None:
+        # Untracked: either untimed or already finalized by the scheduler
+        if quiz_session['timer_minutes'] > 0:
+            return jsonify({'ok': True, 'remaining_seconds': 0, 'expired': True})
+        return jsonify({'ok': True, 'remaining_seconds': None, 'expired': False})
+    
+    return jsonify({'ok': True, 'remaining_seconds': max(0, int(remaining)), 'expired': remaining <= 0})
+
+
+@student_bp.route('/quiz-worker.js')
+def quiz_worker():
+    """Offline quiz service worker; served under /student/ so its scope covers the quiz pages"""
+    response = send_from_directory(os.path.join(current_app.static_folder, 'js'), 'quiz_worker.js',
+                                   mimetype='application/javascript')
+    # Browsers check for a new worker on each visit; no-cache keeps that check to one 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @student_bp.route('/results')
 def results():
     """Display quiz results"""
+    quiz_session = session.get('quiz_session')
+    if request.args.get('pending') and 'student_details' in session and 'quiz_results' not in session and quiz_session:
+        # Sent here while another copy of the submission was being graded
+        stored = _stored_result(quiz_session.get('attempt_id'))
+        if not stored:
+            flash('Your quiz is still being submitted. Your results will be ready in a moment.', 'info')
+            return redirect(url_for('student.dashboard'))
+        session['quiz_results'] = _outcome(session['student_details'], quiz_session, stored,
+                                           stored['elapsed'], stored['auto_submitted'])['quiz_results']
+        session.pop('quiz_session', None)
+    
     if 'student_details' not in session or 'quiz_results' not in session:
         return redirect(url_for('student.details'))
     
@@ -252,8 +545,13 @@ def download_pdf():
 @student_bp.route('/logout')
 def logout():
     """Student logout"""
+    quiz_session = session.pop('quiz_session', None)
+    if quiz_session and quiz_session.get('attempt_id'):
+        draft_store.discard(quiz_session['attempt_id'])
+        deadline_scheduler.cancel(quiz_session['attempt_id'])
+        deadline_scheduler.collect(quiz_session['attempt_id'])
+        event_bus.publish('quiz_abandoned', attempt_id=quiz_session['attempt_id'])
     session.pop('student_details', None)
-    session.pop('quiz_session', None)
     session.pop('quiz_results', None)
     flash('You have been logged out successfully.', 'info')
     return redirect(url_for('index'))
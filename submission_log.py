@@ -0,0 +1,79 @@
+"""
+Submission Log Module for Quiz Pool App
+Remembers the outcome of each quiz submission so replayed submissions are answered, not graded again
+"""
+
+import re
+import threading
+import time
+
+# Idempotency keys are random tokens chosen when the quiz page is rendered
+VALID_SUBMISSION_KEY = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+# Seconds an outcome is kept; a queued submission replayed later than this is no longer recognised
+OUTCOME_TTL = 6 * 3600
+
+# Seconds a duplicate waits for the first copy of a submission that is still being graded
+DUPLICATE_WAIT = 10
+
+# Expired outcomes are swept at most this often
+PURGE_INTERVAL = 60
+
+
+class SubmissionLog:
+    """Thread-safe in-process map of idempotency key -> submission outcome
+
+    The first request for a key owns it and grades the attempt; copies arriving
+    while it runs wait for its outcome, and copies arriving afterwards get the
+    stored outcome straight away. An owner that fails releases the key, so the
+    client's next retry grades the attempt instead.
+    """
+
+    def __init__(self, ttl=OUTCOME_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._condition = threading.Condition()
+        self._last_purge = time.monotonic()
+
+    def begin(self, key, wait=DUPLICATE_WAIT):
+        """Claims a key. Returns (True, None) for the owner, or (False, outcome) for a duplicate
+
+        outcome is None when the first copy was still being graded after `wait` seconds.
+        """
+        deadline = time.monotonic() + wait
+        with self._condition:
+            self._purge_expired()
+            while True:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self._entries[key] = (None, None)
+                    return True, None
+                expires, outcome = entry
+                if outcome is not None:
+                    return False, outcome
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, None
+                self._condition.wait(remaining)
+
+    def finish(self, key, outcome):
+        """Stores the owner's outcome, or releases the key when outcome is None"""
+        with self._condition:
+            if outcome is None:
+                self._entries.pop(key, None)
+            else:
+                self._entries[key] = (time.monotonic() + self.ttl, outcome)
+            self._condition.notify_all()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        expired = [key for key, (expires, _) in self._entries.items() if expires is not None and expires < now]
+        for key in expired:
+            del self._entries[key]
+
+
+# Shared by the student routes
+submission_log = SubmissionLog()
@@ -3,9 +3,20 @@ Teacher Module for Quiz Pool App
 Handles teacher-related functionality including quiz creation and management
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from database import DatabaseManager
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, Response, jsonify, current_app, abort
+from database import DatabaseManager, BatchEditError
+from event_bus import exam_monitor
+from analytics import quiz_analytics
+from collusion import build_sheets, collusion_detector
+from listing_cache import listing_cache, render_listing
+from media_store import MediaError, MAX_MEDIA_BYTES, media_token
+from math_render import math_cache
+import gradebook
+import irt
+import json
 import re
+import time
+import zlib
 
 teacher_bp = Blueprint('teacher', __name__, url_prefix='/teacher')
 db_manager = DatabaseManager()
@@ -13,6 +24,75 @@ db_manager = DatabaseManager()
 # Teacher password for authentication
 TEACHER_PASSWORD = "1234"
 
+# Bytes read from an image upload; one past the store's limit so oversized files are detected
+MAX_UPLOAD_READ = MAX_MEDIA_BYTES + 1
+
+# Milliseconds between the monitor page's polls; a poll is answered at once (304 while
+# nothing changed), so no server worker thread is held between updates
+MONITOR_POLL_MS = 2000
+
+
+def _owner_id(teacher_data):
+    """Registered teacher ID used for quiz ownership; None for the shared admin login"""
+    return None if teacher_data.get('admin') else teacher_data.get('teacher_id')
+
+
+def _owns_quiz(table_name):
+    """Whether the logged-in teacher may work on a quiz: their own, or any quiz for the admin login"""
+    teacher_data = session.get('teacher_data', {})
+    if teacher_data.get('admin'):
+        return True
+    return db_manager.is_quiz_owner(table_name, teacher_data.get('teacher_id'), teacher_data.get('name'))
+
+
+def _teacher_quizzes(teacher_data):
+    """The logged-in teacher's quizzes, from the listing cache"""
+    teacher_name = teacher_data.get('name', 'Admin Teacher')
+    owner_id = _owner_id(teacher_data)
+    quizzes, _ = listing_cache.get('quizzes', (owner_id, teacher_name),
+                                   lambda: db_manager.get_simple_quizzes(teacher_name, owner_id))
+    return quizzes
+
+
+def _own_tables(teacher_data):
+    """Quiz tables a teacher's duplicate checks search; None for the admin login, which sees every quiz"""
+    if teacher_data.get('admin'):
+        return None
+    return {quiz['table_name'] for quiz in _teacher_quizzes(teacher_data)}
+
+
+def _prerender_math(question, options):
+    """Typesets the formulas of a saved question now, so quiz pages and reports only reuse them"""
+    problems = math_cache.prerender(question, *options)
+    if problems:
+        formulas = ', '.join(tex for tex, _ in problems[:3])
+        flash(f'Some formulas could not be typeset and will be shown as typed: {formulas} ({problems[0][1]})', 'warning')
+
+
+def _flash_regrade(changed):
+    """Tells the teacher whose results an answer key correction changed"""
+    if changed is None:
+        flash('The answer key was saved, but past results could not be re-graded.', 'warning')
+    elif changed:
+        names = ', '.join(f"{item['student_name']} ({item['old_score']} -> {item['new_score']})" for item in changed[:10])
+        more = f' and {len(changed) - 10} more' if len(changed) > 10 else ''
+        flash(f'Re-graded {len(changed)} submitted result(s): {names}{more}.', 'info')
+
+
+@teacher_bp.before_request
+def apply_read_your_writes():
+    """Makes a teacher's reads see their own recent writes even when served from a replica"""
+    db_manager.read_after(session.get('db_last_write', 0))
+
+
+@teacher_bp.after_request
+def remember_last_write(response):
+    """Records when this request last wrote so the next request can read it back"""
+    last_write = db_manager.last_write_time()
+    if last_write:
+        session['db_last_write'] = last_write
+    return response
+
 
 @teacher_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -36,7 +116,7 @@ def login():
         # Fallback to old password system for backward compatibility
         if password == TEACHER_PASSWORD:
             session['teacher_logged_in'] = True
-            session['teacher_data'] = {'name': 'Admin Teacher', 'teacher_id': 1}
+            session['teacher_data'] = {'name': 'Admin Teacher', 'teacher_id': 1, 'admin': True}
             flash('Logged in with admin access.', 'info')
             return redirect(url_for('teacher.dashboard'))
         
@@ -88,6 +168,7 @@ def register():
         if db_manager.register_teacher(int(teacher_id), teacher_name, email, password):
             # Create teacher folder
             db_manager.create_teacher_folder(int(teacher_id), teacher_name)
+            listing_cache.invalidate('teachers')
             
             flash(f'Registration successful! Welcome, {teacher_name}!', 'success')
             return redirect(url_for('teacher.login'))
@@ -110,6 +191,40 @@ def dashboard():
     return render_template('teacher/dashboard.html', teacher_name=teacher_name)
 
 
+@teacher_bp.route('/monitor')
+def monitor():
+    """Live exam monitoring page"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    
+    teacher_data = session.get('teacher_data', {})
+    teacher_name = teacher_data.get('name', 'Admin Teacher')
+    quizzes = db_manager.get_simple_quizzes(teacher_name, _owner_id(teacher_data))
+    
+    return render_template('teacher/monitor.html', quizzes=quizzes, teacher_name=teacher_name,
+                           poll_ms=MONITOR_POLL_MS)
+
+
+@teacher_bp.route('/monitor/stats')
+def monitor_stats():
+    """Live exam statistics for the teacher's quizzes, as JSON tagged with the monitor's version
+    
+    The ETag changes with the shared aggregate, so a poll while nothing changed is a 304.
+    """
+    if not session.get('teacher_logged_in'):
+        return jsonify({'ok': False, 'error': 'Not logged in'}), 401
+    
+    tables = {quiz['table_name'] for quiz in _teacher_quizzes(session.get('teacher_data', {}))}
+    # Every viewer reads the same shared aggregate; nothing here touches the database
+    version, quizzes = exam_monitor.snapshot(tables=tables)
+    
+    response = jsonify({'ok': True, 'version': version, 'quizzes': quizzes})
+    # The table set is part of the tag: a new quiz changes the response without a new event
+    response.set_etag(f"{version}-{zlib.crc32(json.dumps(sorted(tables)).encode('utf-8')):08x}")
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+
 @teacher_bp.route('/create_quiz', methods=['GET', 'POST'])
 def create_quiz():
     """Create a new quiz - SIMPLIFIED APPROACH"""
@@ -128,7 +243,8 @@ def create_quiz():
             return render_template('teacher/create_quiz.html')
         
         # Use the new simplified quiz creation
-        if db_manager.create_simple_quiz(subject, timer_minutes, teacher_name):
+        if db_manager.create_simple_quiz(subject, timer_minutes, teacher_name, _owner_id(teacher_data)):
+            listing_cache.invalidate('quizzes')
             flash(f'Quiz "{subject}" created successfully! You can now add questions to it.', 'success')
             return redirect(url_for('teacher.manage_quizzes'))
         else:
@@ -137,6 +253,37 @@ def create_quiz():
     return render_template('teacher/create_quiz.html')
 
 
+@teacher_bp.route('/clone_quiz/<table_name>', methods=['GET', 'POST'])
+def clone_quiz(table_name):
+    """Copy an existing quiz into a new one"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
+    
+    teacher_data = session.get('teacher_data', {})
+    teacher_name = teacher_data.get('name', 'Admin Teacher')
+    source_subject = request.args.get('subject', table_name.replace('_', ' ').title())
+    
+    if request.method == 'POST':
+        subject = request.form.get('subject', '').strip()
+        
+        if not subject:
+            flash('Please enter a quiz subject.', 'error')
+            return render_template('teacher/clone_quiz.html', table_name=table_name, source_subject=source_subject)
+        
+        if db_manager.clone_quiz(table_name, subject, teacher_name, _owner_id(teacher_data)):
+            listing_cache.invalidate('quizzes')
+            flash(f'Quiz "{source_subject}" copied to "{subject}".', 'success')
+            return redirect(url_for('teacher.manage_quizzes'))
+        else:
+            flash('Failed to copy quiz. A quiz with that name may already exist.', 'error')
+            return render_template('teacher/clone_quiz.html', table_name=table_name, source_subject=source_subject, 
+                                 subject=subject)
+    
+    return render_template('teacher/clone_quiz.html', table_name=table_name, source_subject=source_subject)
+
+
 @teacher_bp.route('/manage_quizzes')
 def manage_quizzes():
     """Manage existing quizzes - SIMPLIFIED APPROACH"""
@@ -146,10 +293,13 @@ def manage_quizzes():
     teacher_data = session.get('teacher_data', {})
     teacher_name = teacher_data.get('name', 'Admin Teacher')
     
-    # Use the new simplified quiz retrieval
-    quizzes = db_manager.get_simple_quizzes(teacher_name)
+    # Use the new simplified quiz retrieval, cached per teacher
+    owner_id = _owner_id(teacher_data)
+    quizzes, version = listing_cache.get('quizzes', (owner_id, teacher_name),
+                                         lambda: db_manager.get_simple_quizzes(teacher_name, owner_id))
     
-    return render_template('teacher/manage_quizzes.html', quizzes=quizzes, teacher_name=teacher_name)
+    return render_listing('teacher/manage_quizzes.html', [version], [owner_id, teacher_name],
+                          quizzes=quizzes, teacher_name=teacher_name)
 
 
 @teacher_bp.route('/edit_quiz/<table_name>')
@@ -157,24 +307,150 @@ def edit_quiz(table_name):
     """Edit quiz questions"""
     if not session.get('teacher_logged_in'):
         return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
     
     subject = request.args.get('subject', table_name.replace('_', ' ').title())
-    questions = db_manager.get_all_questions(table_name)
-    
-    # Convert questions to a more manageable format
-    formatted_questions = []
-    for idx, (q_text, options, correct) in enumerate(questions):
-        formatted_questions.append({
-            'id': idx + 1,
-            'question': q_text,
-            'options': options,
-            'correct': correct
-        })
+    search = request.args.get('q', '').strip()
+    after_id = request.args.get('after', type=int)
+    before_id = request.args.get('before', type=int)
+    
+    # One keyset page at a time, identified by real question IDs
+    page = db_manager.get_questions_page(table_name, after_id=after_id, before_id=before_id, search=search)
+    questions = page['questions']
     
     return render_template('teacher/edit_quiz.html', 
                          subject=subject, 
                          table_name=table_name, 
-                         questions=formatted_questions)
+                         questions=questions,
+                         search=search,
+                         total=page['total'],
+                         next_after=questions[-1]['id'] if page['has_next'] and questions else None,
+                         prev_before=(questions[0]['id'] if questions else (after_id or 0) + 1) if page['has_prev'] else None)
+
+
+@teacher_bp.route('/publish_quiz/<table_name>', methods=['POST'])
+def publish_quiz(table_name):
+    """Publish the quiz's current questions as a new immutable version"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
+    
+    subject = request.args.get('subject', table_name.replace('_', ' ').title())
+    
+    snapshot = db_manager.publish_quiz_version(table_name)
+    if not snapshot:
+        flash('Failed to publish quiz.', 'error')
+    elif snapshot['changed']:
+        flash(f'Published version {snapshot["version"]} ({snapshot["changed"]} changed question'
+              f'{"" if snapshot["changed"] == 1 else "s"}).', 'success')
+    else:
+        flash(f'No changes since version {snapshot["version"]}.', 'info')
+    
+    return redirect(url_for('teacher.edit_quiz', table_name=table_name, subject=subject))
+
+
+@teacher_bp.route('/analytics/<table_name>')
+def analytics(table_name):
+    """Item analysis for a quiz's latest published version, read from the incrementally maintained rollups"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
+    
+    subject = request.args.get('subject', table_name.replace('_', ' ').title())
+    report = None
+    snapshot_id = db_manager.get_latest_snapshot_id(table_name)
+    if snapshot_id:
+        rows = db_manager.get_snapshot_rows(snapshot_id)
+        questions = [(row_id, row[0], row[5]) for row_id, row in zip(db_manager.get_snapshot_row_ids(snapshot_id), rows)]
+        report = quiz_analytics.report(table_name, questions, lambda: db_manager.get_item_statistics(table_name))
+    
+    irt_job = irt.calibration_jobs.status(table_name)
+    if irt_job:
+        irt_job['started'] = time.strftime('%H:%M:%S', time.localtime(irt_job['started']))
+    
+    return render_template('teacher/analytics.html', 
+                         subject=subject, 
+                         table_name=table_name, 
+                         report=report,
+                         irt_items=db_manager.get_item_parameters(table_name),
+                         irt_models=irt.MODELS,
+                         irt_job=irt_job)
+
+
+@teacher_bp.route('/similarity/<table_name>')
+def answer_similarity(table_name):
+    """Ranked report of answer sheets sharing suspiciously many identical wrong answers"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
+    
+    subject = request.args.get('subject', table_name.replace('_', ' ').title())
+    
+    try:
+        sheets, distractors = build_sheets(db_manager.iter_answer_sheets(table_name))
+    except Exception as e:
+        print(f"Error reading answer sheets: {e}")
+        sheets, distractors = [], {}
+    report = collusion_detector.report(sheets, distractors)
+    
+    return render_template('teacher/similarity.html', 
+                         subject=subject, 
+                         table_name=table_name, 
+                         report=report)
+
+
+@teacher_bp.route('/calibrate/<table_name>', methods=['POST'])
+def calibrate_quiz(table_name):
+    """Start fitting IRT item parameters and student abilities from the quiz's graded attempts"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
+    
+    subject = request.args.get('subject', table_name.replace('_', ' ').title())
+    model = request.form.get('model', '2pl')
+    
+    # The EM fit can take minutes on a large cohort, so it runs in the background
+    try:
+        started = irt.calibration_jobs.start(db_manager, table_name, model)
+    except ImportError:
+        flash('IRT calibration needs NumPy installed on the server (pip install numpy).', 'error')
+    except ValueError as e:
+        flash(str(e), 'error')
+    else:
+        if started:
+            flash(f'{model.upper()} calibration started. Its results appear here when it finishes.', 'info')
+        else:
+            flash('A calibration of this quiz is already running.', 'warning')
+    
+    return redirect(url_for('teacher.analytics', table_name=table_name, subject=subject))
+
+
+@teacher_bp.route('/gradebook/<table_name>')
+def export_gradebook(table_name):
+    """Download a quiz's graded attempts or per-question responses"""
+    if not session.get('teacher_logged_in'):
+        return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
+    
+    kind = request.args.get('kind', 'attempts')
+    export_format = request.args.get('format', 'csv')
+    
+    try:
+        chunks, mimetype, extension = gradebook.export(gradebook.gradebook_rows(db_manager, table_name, kind), 
+                                                       kind, export_format)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('teacher.manage_quizzes'))
+    
+    # Streamed chunk by chunk so large cohorts never sit in memory
+    return Response(chunks, mimetype=mimetype, 
+                    headers={'Content-Disposition': f'attachment; filename="{table_name}_{kind}.{extension}"'})
 
 
 @teacher_bp.route('/add_question/<table_name>', methods=['GET', 'POST'])
@@ -182,6 +458,8 @@ def add_question(table_name):
     """Add a new question to a quiz"""
     if not session.get('teacher_logged_in'):
         return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
     
     subject = request.args.get('subject', table_name.replace('_', ' ').title())
     
@@ -208,9 +486,18 @@ def add_question(table_name):
             flash('Options must be unique.', 'error')
             return render_template('teacher/add_question.html', subject=subject, table_name=table_name)
         
+        # Warn about duplicates in the teacher's quizzes unless the teacher confirmed
+        duplicates = [] if request.form.get('allow_duplicate') else \
+            db_manager.find_similar_questions(question, tables=_own_tables(session.get('teacher_data', {})))
+        if duplicates:
+            flash('This question looks like one that already exists.', 'warning')
+            return render_template('teacher/add_question.html', subject=subject, table_name=table_name, 
+                                 duplicates=duplicates, form=request.form)
+        
         # Insert question into database
         if db_manager.insert_question(table_name, question, options[0], options[1], options[2], options[3], correct_answer):
             flash('Question added successfully!', 'success')
+            _prerender_math(question, options)
             return redirect(url_for('teacher.edit_quiz', table_name=table_name, subject=subject))
         else:
             flash('Failed to add question to database.', 'error')
@@ -223,6 +510,8 @@ def edit_question(table_name, question_id):
     """Edit an existing question"""
     if not session.get('teacher_logged_in'):
         return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
     
     subject = request.args.get('subject', table_name.replace('_', ' ').title())
     
@@ -264,9 +553,28 @@ def edit_question(table_name, question_id):
                                  table_name=table_name, 
                                  question_data=question_data)
         
+        # Warn about duplicates in the teacher's quizzes unless the teacher confirmed
+        duplicates = [] if request.form.get('allow_duplicate') else \
+            db_manager.find_similar_questions(question, table_name, question_id,
+                                              tables=_own_tables(session.get('teacher_data', {})))
+        if duplicates:
+            flash('This question looks like one that already exists.', 'warning')
+            return render_template('teacher/edit_question.html', 
+                                 subject=subject, 
+                                 table_name=table_name, 
+                                 question_data={'id': question_id, 'question': question, 
+                                                'options': options, 'correct': correct_answer},
+                                 duplicates=duplicates)
+        
         # Update question in database
-        if db_manager.update_question(table_name, question_id, question, options[0], options[1], options[2], options[3], correct_answer):
+        # A corrected answer key also fixes the results already issued for this question
+        result = db_manager.update_question(table_name, question_id, question, options[0], options[1], options[2], options[3], correct_answer)
+        if result:
             flash('Question updated successfully!', 'success')
+            _prerender_math(question, options)
+            if result['regraded'] is not None:
+                quiz_analytics.invalidate(table_name)
+                _flash_regrade(result['regraded'])
             return redirect(url_for('teacher.edit_quiz', table_name=table_name, subject=subject))
         else:
             flash('Failed to update question in database.', 'error')
@@ -282,6 +590,8 @@ def delete_question(table_name, question_id):
     """Delete a question"""
     if not session.get('teacher_logged_in'):
         return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
     
     subject = request.args.get('subject', table_name.replace('_', ' ').title())
     
@@ -293,15 +603,72 @@ def delete_question(table_name, question_id):
     return redirect(url_for('teacher.edit_quiz', table_name=table_name, subject=subject))
 
 
+@teacher_bp.route('/media', methods=['POST'])
+def upload_media():
+    """Store an image for a question or option; returns the token to place in its text"""
+    if not session.get('teacher_logged_in'):
+        return jsonify({'ok': False, 'error': 'Not logged in.'}), 401
+    
+    upload = request.files.get('image')
+    if not upload:
+        return jsonify({'ok': False, 'error': 'No image uploaded.'}), 400
+    
+    store = current_app.extensions['media_store']
+    try:
+        digest = store.put(upload.read(MAX_UPLOAD_READ))
+    except MediaError as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+    
+    return jsonify({'ok': True, 'digest': digest, 'token': media_token(digest), 
+                    'url': url_for('media', digest=digest)})
+
+
+@teacher_bp.route('/batch_edit/<table_name>', methods=['POST'])
+def batch_edit(table_name):
+    """Applies many question adds, edits, deletes and reorders in one transaction"""
+    if not session.get('teacher_logged_in'):
+        return jsonify({'ok': False, 'error': 'Not logged in'}), 401
+    if not _owns_quiz(table_name):
+        return jsonify({'ok': False, 'error': 'Not your quiz'}), 403
+    
+    payload = request.get_json(silent=True) or {}
+    base_version = payload.get('base_version')
+    if base_version is not None and not isinstance(base_version, int):
+        return jsonify({'ok': False, 'error': 'base_version must be an integer'}), 400
+    
+    try:
+        result = db_manager.apply_question_batch(table_name, payload.get('operations'), base_version)
+    except BatchEditError as e:
+        return jsonify({'ok': False, 'error': str(e), 'operation': e.operation_index}), 409 if e.conflict else 400
+    
+    # Typeset formulas in the saved questions now rather than on the first quiz page
+    problems = []
+    for operation in payload['operations']:
+        if operation.get('op') in ('add', 'edit'):
+            problems.extend(math_cache.prerender(str(operation.get('question', '')), 
+                                                 *(str(option) for option in operation.get('options') or [])))
+    
+    # Corrected answer keys change stored responses and the rows they are reported under
+    quiz_analytics.invalidate(table_name)
+    
+    return jsonify({'ok': True, 'version': result['version'], 'added_ids': result['added'], 
+                    'regraded': [{'student_name': item['student_name'], 'old_score': item['old_score'],
+                                  'new_score': item['new_score']} for item in result['regraded']], 
+                    'unsupported_formulas': [{'tex': tex, 'error': error} for tex, error in problems]})
+
+
 @teacher_bp.route('/delete_quiz/<table_name>')
 def delete_quiz(table_name):
     """Delete an entire quiz"""
     if not session.get('teacher_logged_in'):
         return redirect(url_for('teacher.login'))
+    if not _owns_quiz(table_name):
+        abort(403)
     
     display_name = table_name.replace('_', ' ').title()
     
     if db_manager.drop_table(table_name):
+        listing_cache.invalidate('quizzes')
         flash(f'Quiz "{display_name}" deleted successfully!', 'success')
     else:
         flash('Failed to delete quiz from database.', 'error')
@@ -0,0 +1,82 @@
+"""Scripted stand-in for a pyodbc connection, for exercising DatabaseManager without SQL Server"""
+
+from database import DatabaseManager
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def execute(self, sql, *params):
+        self.connection.executed.append((sql, params))
+        result = self.connection.respond(sql, params)
+        if isinstance(result, int):
+            self.rows, self.rowcount = [], result
+        else:
+            self.rows, self.rowcount = list(result or []), -1
+        return self
+
+    def executemany(self, sql, rows):
+        self.connection.executed.append((sql, list(rows)))
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Answers each statement with the first scripted response whose text appears in it
+
+    A response is a list of rows, a row count (int), or a callable(params) returning either.
+    Statements with no response return no rows.
+    """
+
+    def __init__(self, responses=()):
+        self.responses = list(responses)
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.timeout = 0
+        self.autocommit = False
+
+    def respond(self, sql, params):
+        for pattern, result in self.responses:
+            if pattern in sql:
+                return result(params) if callable(result) else result
+        return []
+
+    def statements(self, pattern):
+        return [params for sql, params in self.executed if pattern in sql]
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+def make_manager(connection):
+    """A DatabaseManager whose primary is the given fake and that has no replicas"""
+    return DatabaseManager(replica_connection_strings=[], connect_function=lambda _: connection)
@@ -0,0 +1,72 @@
+from analytics import QuizAnalytics, new_item
+from event_bus import EventBus
+
+
+def details(*choices, key=(1, 2)):
+    return [{'is_correct': choice == correct, 'student_choice': choice, 'correct_choice': correct}
+            for choice, correct in zip(choices, key)]
+
+
+def empty_load():
+    return {'attempts': 0, 'score_sum': 0, 'score_sq_sum': 0, 'items': {}, 'recent': set()}
+
+
+def make_analytics():
+    bus = EventBus()
+    return bus, QuizAnalytics(bus)
+
+
+def test_items_are_keyed_by_snapshot_row_not_position():
+    bus, analytics = make_analytics()
+    analytics.report('Quiz', [], empty_load)
+
+    bus.publish('quiz_submitted', table_name='Quiz', attempt_id='a', details=details(1, 2), row_ids=[10, 11])
+    # A later version moved question 11 to the front and replaced question 10 with row 12
+    bus.publish('quiz_submitted', table_name='Quiz', attempt_id='b', details=details(2, 3, key=(2, 1)), row_ids=[11, 12])
+
+    report = analytics.report('Quiz', [(11, 'Moved', 2), (12, 'New', 1)], empty_load)
+    moved, new = report['questions']
+    assert report['attempts'] == 2
+    assert (moved['attempts'], moved['p_value']) == (2, 1.0)
+    assert (new['attempts'], new['p_value']) == (1, 0.0)
+    assert new['option_rates'] == [0, 0, 1.0, 0]
+
+
+def test_rollups_are_rebuilt_from_stored_attempts():
+    bus, analytics = make_analytics()
+    # Events before the first report are left to the load
+    bus.publish('quiz_submitted', table_name='Quiz', attempt_id='a', details=details(1, 2), row_ids=[10, 11])
+    stored = empty_load()
+    stored.update(attempts=1, score_sum=2, score_sq_sum=4, recent={'a'})
+    stored['items'][10] = dict(new_item(1), attempts=1, correct=1, score_sum=2, score_sq_sum=4,
+                               correct_score_sum=2, choices=[0, 1, 0, 0, 0])
+
+    assert analytics.report('Quiz', [(10, 'Q1', 1)], lambda: stored)['attempts'] == 1
+    # An attempt the load already counted is not counted again when its event arrives
+    bus.publish('quiz_submitted', table_name='Quiz', attempt_id='a', details=details(1, 2), row_ids=[10, 11])
+    bus.publish('quiz_submitted', table_name='Quiz', attempt_id='b', details=details(0, 2), row_ids=[10, 11])
+
+    report = analytics.report('Quiz', [(10, 'Q1', 1)], empty_load)
+    assert report['attempts'] == 2
+    assert report['questions'][0]['unanswered_rate'] == 0.5
+
+
+def test_load_racing_a_submission_is_not_kept():
+    bus, analytics = make_analytics()
+    loads = []
+
+    def racing_load():
+        loads.append(1)
+        bus.publish('quiz_submitted', table_name='Quiz', attempt_id='a', details=details(1, 2), row_ids=[10, 11])
+        return empty_load()
+
+    analytics.report('Quiz', [], racing_load)
+    analytics.report('Quiz', [], racing_load)
+    assert len(loads) == 2
+
+
+def test_invalidate_reloads_and_no_attempts_gives_no_report():
+    _, analytics = make_analytics()
+    assert analytics.report('Quiz', [], empty_load) is None
+    analytics.invalidate('Quiz')
+    assert analytics.report('Quiz', [], lambda: None) is None
@@ -0,0 +1,103 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, GuardedConnection, is_connectivity_error
+from database import QUERY_TIMEOUT
+from fake_db import FakeConnection, make_manager
+
+
+class OdbcError(Exception):
+    """Stands in for pyodbc.Error: args[0] is the SQLSTATE"""
+
+
+class FailingConnection:
+    def __init__(self, sqlstate):
+        self.sqlstate = sqlstate
+
+    def cursor(self):
+        return self
+
+    def execute(self, *args):
+        raise OdbcError(self.sqlstate, 'driver message')
+
+    def rollback(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_only_connection_failures_count():
+    assert is_connectivity_error(OdbcError('08S01', 'link failure'))
+    assert is_connectivity_error(OdbcError('08001', 'cannot connect'))
+    assert not is_connectivity_error(OdbcError('HYT00', 'query timeout expired'))
+    assert not is_connectivity_error(OdbcError('HYT01', 'connection timeout expired'))
+    assert not is_connectivity_error(OdbcError('42S02', 'invalid object name'))
+    assert not is_connectivity_error(ValueError())
+
+
+def test_slow_statements_do_not_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=2)
+    connection = GuardedConnection(FailingConnection('HYT00'), breaker)
+
+    for _ in range(5):
+        with pytest.raises(OdbcError):
+            connection.cursor().execute('SELECT 1')
+
+    assert connection and breaker.state == CLOSED
+
+
+def test_dropped_links_open_then_probe_then_close():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5, clock=clock)
+    connection = GuardedConnection(FailingConnection('08S01'), breaker)
+
+    with pytest.raises(OdbcError):
+        connection.cursor().execute('SELECT 1')
+    assert not connection
+    breaker.failure()
+    assert breaker.state == OPEN and not breaker.acquire()
+
+    clock.now = 5
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire()
+    # Only one probe at a time
+    assert not breaker.acquire()
+    breaker.success()
+    assert breaker.state == CLOSED and breaker.acquire()
+
+
+def test_failed_probe_doubles_the_wait():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, max_reset_timeout=8, clock=clock)
+    breaker.failure()
+
+    clock.now = 5
+    assert breaker.acquire()
+    breaker.failure()
+    assert breaker.retry_after() == 8
+
+    clock.now = 13
+    assert breaker.acquire()
+    breaker.failure()
+    # Capped at the maximum
+    assert breaker.retry_after() == 8
+
+
+def test_maintenance_cursor_lifts_the_query_timeout():
+    connection = FakeConnection([])
+    connection.timeout = QUERY_TIMEOUT
+    seen = []
+    allocate = connection.cursor
+    connection.cursor = lambda: seen.append(connection.timeout) or allocate()
+
+    manager = make_manager(connection)
+    manager.connect()
+    manager._maintenance_cursor()
+
+    assert seen == [0]
+    assert connection.timeout == QUERY_TIMEOUT
@@ -0,0 +1,48 @@
+import random
+
+import collusion
+from collusion import CollusionDetector, build_sheets
+
+QUESTIONS = 30
+
+
+def cohort(students=40, seed=3):
+    """Answer rows where everyone answers honestly (70% right) except students 0 and 1, who copy wrong answers"""
+    rng = random.Random(seed)
+    rows = []
+    copied = {question: rng.choice([2, 3, 4]) for question in range(20)}
+    for student in range(students):
+        for question in range(QUESTIONS):
+            if student < 2 and question in copied:
+                choice = copied[question]
+            else:
+                choice = 1 if rng.random() < 0.7 else rng.choice([2, 3, 4])
+            rows.append((f'a{student}', f'S{student}', f'Student {student}', question, choice, 1))
+    return rows
+
+
+def test_copied_wrong_answers_rank_first_and_are_flagged():
+    sheets, distractors = build_sheets(cohort())
+    report = CollusionDetector().report(sheets, distractors)
+
+    top = report['pairs'][0]
+    assert {top['first']['student_id'], top['second']['student_id']} == {'S0', 'S1'}
+    assert top['flagged'] and top['shared_wrong'] >= 20
+    assert report['flagged'] == 1
+    assert report['total_pairs'] == 40 * 39 // 2
+
+
+def test_lsh_candidates_still_find_the_copied_pair(monkeypatch):
+    monkeypatch.setattr(collusion, 'ALL_PAIRS_LIMIT', 0)
+    sheets, distractors = build_sheets(cohort())
+    pairs = CollusionDetector().candidate_pairs(sheets, distractors)
+
+    assert (0, 1) in pairs
+    assert len(pairs) < len(sheets) * (len(sheets) - 1) // 2
+
+
+def test_retakes_by_the_same_student_are_not_reported():
+    rows = [('a1', 'S1', 'Sam', question, 2, 1) for question in range(5)]
+    rows += [('a2', 'S1', 'Sam', question, 2, 1) for question in range(5)]
+    sheets, distractors = build_sheets(rows)
+    assert CollusionDetector().report(sheets, distractors)['pairs'] == []
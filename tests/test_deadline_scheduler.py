@@ -0,0 +1,141 @@
+from deadline_scheduler import DeadlineScheduler
+from draft_store import DraftStore
+
+
+class FlakyGrader:
+    """Fails the first `failures` calls, then gives every answer set a score of its answer count"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def __call__(self, table_name, negative_marking, answer_sets, snapshot_id):
+        self.calls.append((table_name, snapshot_id, answer_sets))
+        if self.failures:
+            self.failures -= 1
+            return None
+        return [{'score': sum(1 for choice in answers.values() if choice), 'answers': answers}
+                for answers in answer_sets]
+
+
+def make_scheduler(grader, on_result=None):
+    drafts = DraftStore()
+    scheduler = DeadlineScheduler(drafts, grader, grace_seconds=5, on_result=on_result)
+    # Sweeps are driven by the tests, not the background thread
+    scheduler.start = lambda: None
+    return drafts, scheduler
+
+
+def test_expired_attempt_is_graded_and_collected():
+    recorded = []
+    grader = FlakyGrader()
+    drafts, scheduler = make_scheduler(grader, on_result=lambda *args: recorded.append(args))
+    attempt_id = drafts.start(2)
+    drafts.save(attempt_id, {'0': 3}, seq=1)
+    scheduler.register(attempt_id, 100, 'Quiz', True, snapshot_id=7)
+
+    assert scheduler.sweep(now=104) == 0
+    assert not scheduler.is_expired(attempt_id, now=104)
+    assert scheduler.sweep(now=106) == 1
+
+    assert drafts.get(attempt_id) is None
+    assert scheduler.is_expired(attempt_id, now=106)
+    assert recorded == [(attempt_id, {'score': 1, 'answers': {0: 3, 1: 0}}, 'Quiz', 7)]
+    assert scheduler.collect(attempt_id) == {'score': 1, 'answers': {0: 3, 1: 0}}
+    assert scheduler.collect(attempt_id) is None
+
+
+def test_failed_grading_keeps_the_draft_and_retries():
+    recorded = []
+    grader = FlakyGrader(failures=1)
+    drafts, scheduler = make_scheduler(grader, on_result=lambda *args: recorded.append(args))
+    attempt_id = drafts.start(1)
+    drafts.save(attempt_id, {'0': 2}, seq=1)
+    scheduler.register(attempt_id, 100, 'Quiz', True)
+
+    assert scheduler.sweep(now=106) == 0
+    # Nothing was lost: the answers are still there and the attempt still counts as expired
+    assert drafts.get(attempt_id) == {0: 2}
+    assert scheduler.is_expired(attempt_id, now=106)
+    assert scheduler.collect(attempt_id) is None
+    assert recorded == []
+
+    assert scheduler.sweep(now=107) == 1
+    assert len(grader.calls) == 2
+    assert scheduler.collect(attempt_id)['score'] == 1
+    assert drafts.get(attempt_id) is None
+
+
+def test_grader_exception_is_retried_like_a_failure():
+    def broken(*args):
+        raise RuntimeError('database down')
+
+    drafts, scheduler = make_scheduler(broken)
+    attempt_id = drafts.start(1)
+    scheduler.register(attempt_id, 100, 'Quiz', True)
+
+    assert scheduler.sweep(now=106) == 0
+    assert drafts.get(attempt_id) == {0: 0}
+
+    scheduler.grader = FlakyGrader()
+    assert scheduler.sweep(now=107) == 1
+
+
+def test_student_submission_during_retry_is_graded_from_the_draft():
+    grader = FlakyGrader(failures=1)
+    drafts, scheduler = make_scheduler(grader)
+    attempt_id = drafts.start(1)
+    drafts.save(attempt_id, {'0': 4}, seq=1)
+    scheduler.register(attempt_id, 100, 'Quiz', True)
+    scheduler.sweep(now=106)
+
+    # What submit_quiz does for an expired attempt with no collected result
+    assert scheduler.is_expired(attempt_id, now=106)
+    assert scheduler.collect(attempt_id) is None
+    assert drafts.finalize(attempt_id) == {0: 4}
+    scheduler.cancel(attempt_id)
+
+    assert scheduler.sweep(now=107) == 0
+    assert len(grader.calls) == 1
+
+
+def test_attempt_finalized_by_the_student_while_grading_is_not_recorded_twice():
+    recorded = []
+    drafts = DraftStore()
+
+    def grader(table_name, negative_marking, answer_sets, snapshot_id):
+        # The student's own submission finalizes the draft while the sweep is grading
+        drafts.finalize(attempt_id)
+        return [{'score': 0}]
+
+    scheduler = DeadlineScheduler(drafts, grader, on_result=lambda *args: recorded.append(args))
+    scheduler.start = lambda: None
+    attempt_id = drafts.start(1)
+    scheduler.register(attempt_id, 100, 'Quiz', True)
+
+    assert scheduler.sweep(now=106) == 0
+    assert recorded == []
+    assert scheduler.collect(attempt_id) is None
+    assert scheduler.remaining(attempt_id) is None
+
+
+def test_attempts_are_graded_once_per_quiz_version():
+    grader = FlakyGrader()
+    drafts, scheduler = make_scheduler(grader)
+    for snapshot_id in (1, 1, 2):
+        scheduler.register(drafts.start(1), 100, 'Quiz', True, snapshot_id)
+
+    assert scheduler.sweep(now=106) == 3
+    assert sorted((snapshot_id, len(answer_sets)) for _, snapshot_id, answer_sets in grader.calls) == [(1, 2), (2, 1)]
+
+
+def test_cancelled_attempt_is_not_graded():
+    grader = FlakyGrader()
+    drafts, scheduler = make_scheduler(grader)
+    attempt_id = drafts.start(1)
+    scheduler.register(attempt_id, 100, 'Quiz', True)
+    scheduler.cancel(attempt_id)
+
+    assert scheduler.sweep(now=106) == 0
+    assert grader.calls == []
+    assert drafts.get(attempt_id) == {0: 0}
@@ -0,0 +1,69 @@
+import time
+
+import draft_store as draft_store_module
+from draft_store import DraftStore
+
+
+def test_batches_apply_in_any_order():
+    store = DraftStore()
+    attempt_id = store.start(3)
+
+    assert store.save(attempt_id, {'0': 2, '1': 3}, seq=2) == 2
+    # The older batch arrives late: question 0 keeps the newer answer, question 2 is still saved
+    assert store.save(attempt_id, {'0': 1, '2': 4}, seq=1) == 1
+
+    assert store.get(attempt_id) == {0: 2, 1: 3, 2: 4}
+
+
+def test_replayed_batch_is_not_applied_twice():
+    store = DraftStore()
+    attempt_id = store.start(2)
+
+    assert store.save(attempt_id, {'0': 1}, seq=1) == 1
+    assert store.save(attempt_id, {'0': 3}, seq=2) == 1
+    assert store.save(attempt_id, {'0': 1}, seq=1) == 0
+    assert store.get(attempt_id) == {0: 3, 1: 0}
+
+
+def test_invalid_entries_are_ignored():
+    store = DraftStore()
+    attempt_id = store.start(2)
+
+    assert store.save(attempt_id, {'0': 5, '7': 1, 'x': 1, '1': 'a'}, seq=1) == 0
+    assert store.get(attempt_id) == {0: 0, 1: 0}
+
+
+def test_finalize_applies_final_deltas_and_removes_draft():
+    store = DraftStore()
+    attempt_id = store.start(2)
+    store.save(attempt_id, {'0': 1}, seq=5)
+
+    assert store.finalize(attempt_id, {'0': 4, '1': 2}) == {0: 4, 1: 2}
+    assert store.get(attempt_id) is None
+    assert store.finalize(attempt_id) is None
+    assert store.save(attempt_id, {'0': 1}, seq=6) is None
+
+
+def test_purge_stale_drops_only_idle_drafts():
+    store = DraftStore()
+    idle = store.start(1)
+    active = store.start(1)
+    store._drafts[idle].updated = time.time() - 100
+
+    assert store.purge_stale(50) == 1
+    assert store.get(idle) is None
+    assert store.get(active) == {0: 0}
+
+
+def test_starting_an_attempt_purges_abandoned_drafts(monkeypatch):
+    store = DraftStore(max_age=60)
+    abandoned = store.start(1)
+    store._drafts[abandoned].updated = time.time() - 120
+
+    store.start(1)
+    assert store.get(abandoned) == {0: 0}
+
+    # Once the purge interval has passed, the next start sweeps
+    monkeypatch.setattr(draft_store_module, 'PURGE_INTERVAL', 0)
+    store.start(1)
+    assert store.get(abandoned) is None
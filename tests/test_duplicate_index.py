@@ -0,0 +1,30 @@
+from duplicate_index import DuplicateIndex
+
+
+def make_index():
+    index = DuplicateIndex()
+    index.add(('Ann_Bio', 1), 'What is the powerhouse of the cell?')
+    index.add(('Bob_Bio', 4), 'What is the powerhouse of the cell?')
+    index.add(('Ann_Bio', 2), 'Which organelle contains chlorophyll?')
+    return index
+
+
+def test_exact_duplicates_match_after_normalization():
+    matches = make_index().find('what is the POWERHOUSE of the cell')
+    assert {match['key'] for match in matches} == {('Ann_Bio', 1), ('Bob_Bio', 4)}
+    assert all(match['exact'] and match['similarity'] == 1.0 for match in matches)
+
+
+def test_include_restricts_matches_to_some_quizzes():
+    index = make_index()
+    matches = index.find('What is the powerhouse of the cell?', include=lambda key: key[0] == 'Ann_Bio')
+    assert [match['key'] for match in matches] == [('Ann_Bio', 1)]
+
+
+def test_edited_question_does_not_match_itself_and_removed_questions_are_gone():
+    index = make_index()
+    matches = index.find('What is the powerhouse of the cell?', exclude=('Ann_Bio', 1))
+    assert [match['key'] for match in matches] == [('Bob_Bio', 4)]
+
+    index.remove_where(lambda key: key[0] == 'Bob_Bio')
+    assert index.find('What is the powerhouse of the cell?', exclude=('Ann_Bio', 1)) == []
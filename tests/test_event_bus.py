@@ -0,0 +1,62 @@
+from event_bus import EventBus, ExamMonitor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_monitor(idle_timeout=60):
+    bus = EventBus()
+    clock = Clock()
+    return bus, ExamMonitor(bus, idle_timeout=idle_timeout, clock=clock), clock
+
+
+def stats(monitor, table_name='Quiz'):
+    return monitor.snapshot()[1][table_name]
+
+
+def test_submitted_and_abandoned_attempts_leave_in_progress():
+    bus, monitor, _ = make_monitor()
+    for attempt_id in ('a', 'b', 'c'):
+        bus.publish('quiz_started', table_name='Quiz', attempt_id=attempt_id)
+
+    bus.publish('quiz_submitted', table_name='Quiz', attempt_id='a', percentage=80)
+    bus.publish('quiz_abandoned', attempt_id='b')
+    # A second abandon or a late submission of an abandoned attempt does not go negative
+    bus.publish('quiz_abandoned', attempt_id='b')
+
+    quiz = stats(monitor)
+    assert quiz['started'] == 3
+    assert quiz['in_progress'] == 1
+    assert quiz['submitted'] == 1
+    assert quiz['average_percentage'] == 80
+
+
+def test_idle_attempts_expire_but_active_ones_stay():
+    bus, monitor, clock = make_monitor(idle_timeout=60)
+    bus.publish('quiz_started', table_name='Quiz', attempt_id='idle')
+    bus.publish('quiz_started', table_name='Quiz', attempt_id='busy')
+
+    clock.now += 50
+    bus.publish('answers_saved', table_name='Quiz', attempt_id='busy', count=2)
+    clock.now += 20
+
+    version_before = monitor.snapshot()[0]
+    assert stats(monitor)['in_progress'] == 1
+    assert monitor.snapshot()[0] == version_before
+
+    clock.now += 60
+    assert stats(monitor)['in_progress'] == 0
+    assert stats(monitor)['answered'] == 2
+
+
+def test_wait_for_change_returns_after_an_event():
+    bus, monitor, _ = make_monitor()
+    version, _ = monitor.snapshot()
+    bus.publish('quiz_started', table_name='Quiz', attempt_id='a')
+    assert monitor.wait_for_change(version, timeout=0) != version
+    assert monitor.wait_for_change(version + 1, timeout=0) == version + 1
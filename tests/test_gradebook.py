@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+import gradebook
+
+ROWS = [
+    ('a1', 'S1', 1, 2, 2, True, 1.0),
+    ('a1', 'S1', 2, 0, 3, False, 0.0),
+    ('a2', 'S2', 1, None, 2, None, -0.25),
+]
+
+
+def collect(chunks):
+    return b''.join(chunks)
+
+
+def test_compact_round_trip_keeps_values_and_nulls(monkeypatch):
+    monkeypatch.setattr(gradebook, 'EXPORT_CHUNK_ROWS', 2)
+    data = collect(gradebook.export_compact(iter(ROWS), gradebook.RESPONSE_COLUMNS))
+    names = [name for name, _ in gradebook.RESPONSE_COLUMNS]
+
+    assert list(gradebook.read_compact(io.BytesIO(data))) == [dict(zip(names, row)) for row in ROWS]
+
+
+def test_truncated_compact_export_is_rejected():
+    data = collect(gradebook.export_compact(iter(ROWS), gradebook.RESPONSE_COLUMNS))
+    with pytest.raises(ValueError):
+        list(gradebook.read_compact(io.BytesIO(data[:-6])))
+
+
+def test_csv_export_has_header_and_one_line_per_row():
+    chunks, mimetype, extension = gradebook.export(iter(ROWS), 'responses', 'csv')
+    lines = collect(chunks).decode('utf-8').splitlines()
+    assert (mimetype, extension) == ('text/csv', 'csv')
+    assert lines[0] == 'attempt_id,student_id,question_number,student_choice,correct_choice,is_correct,points'
+    assert len(lines) == len(ROWS) + 1
+
+
+def test_unknown_kind_or_format_is_a_value_error():
+    with pytest.raises(ValueError):
+        gradebook.export(iter(()), 'scores', 'csv')
+    with pytest.raises(ValueError):
+        gradebook.export(iter(()), 'attempts', 'xlsx')
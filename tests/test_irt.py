@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import irt
+from irt import NOT_PRESENTED, ResponseMatrix
+
+
+def simulate(model, students=1500, items=15, seed=7):
+    """Responses drawn from a known 1PL/2PL model; about a tenth of the questions are not shown to each student"""
+    rng = np.random.default_rng(seed)
+    ability = rng.normal(size=students)
+    difficulty = np.linspace(-1.5, 1.5, items)
+    discrimination = rng.uniform(0.6, 2.0, size=items) if model == '2pl' else np.ones(items)
+    probability = 1 / (1 + np.exp(-discrimination * (ability[:, None] - difficulty)))
+    correct = rng.random((students, items)) < probability
+    shown = rng.random((students, items)) > 0.1
+    rows = [(f'S{student}', f'Q{item}', bool(correct[student, item]))
+            for student in range(students) for item in range(items) if shown[student, item]]
+    return rows, [f'Q{item}' for item in range(items)], ability, difficulty, discrimination
+
+
+def correlation(first, second):
+    return np.corrcoef(first, second)[0, 1]
+
+
+def test_matrix_marks_questions_a_student_never_saw():
+    matrix = ResponseMatrix.from_rows([('S1', 'Q1', True), ('S2', 'Q2', False), ('S2', 'Q9', True)], ['Q1', 'Q2'])
+    assert matrix.student_ids == ['S1', 'S2']
+    assert matrix.values.tolist() == [[1, NOT_PRESENTED], [NOT_PRESENTED, 0]]
+
+
+@pytest.mark.parametrize('model', irt.MODELS)
+def test_calibration_recovers_the_generating_parameters(model):
+    rows, items, ability, difficulty, discrimination = simulate(model)
+    matrix = ResponseMatrix.from_rows(rows, items)
+
+    # Small chunks so the E-step and the ability pass run over several chunks
+    result = irt.calibrate(matrix, model, chunk_rows=256)
+
+    assert result['converged']
+    fitted = {item['item_id']: item for item in result['items']}
+    assert correlation([fitted[item]['difficulty'] for item in items], difficulty) > 0.98
+    if model == '2pl':
+        assert correlation([fitted[item]['discrimination'] for item in items], discrimination) > 0.9
+    else:
+        assert {fitted[item]['discrimination'] for item in items} == {1.0}
+
+    # Fifteen questions only pin an ability down so far
+    by_student = {student['student_id']: student['ability'] for student in result['students']}
+    assert correlation([by_student[f'S{index}'] for index in range(len(ability))], ability) > 0.75
+    assert all(student['standard_error'] > 0 for student in result['students'])
+
+
+def test_unknown_model_or_empty_matrix_is_a_value_error():
+    matrix = ResponseMatrix.from_rows([('S1', 'Q1', True)], ['Q1'])
+    with pytest.raises(ValueError):
+        irt.calibrate(matrix, '3pl')
+    with pytest.raises(ValueError):
+        irt.calibrate(ResponseMatrix.from_rows([], ['Q1']), '1pl')
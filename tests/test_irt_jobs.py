@@ -0,0 +1,65 @@
+import sys
+import threading
+import types
+
+import pytest
+
+import irt
+
+
+class FakeManager:
+    def __init__(self):
+        self.disconnected = threading.Event()
+
+    def disconnect(self):
+        self.disconnected.set()
+
+
+@pytest.fixture
+def numpy_stub(monkeypatch):
+    # Calibration math needs NumPy, but the job bookkeeping does not
+    monkeypatch.setitem(sys.modules, 'numpy', sys.modules.get('numpy') or types.ModuleType('numpy'))
+
+
+def test_calibration_runs_in_the_background_once_per_quiz(numpy_stub, monkeypatch):
+    release = threading.Event()
+
+    def slow_calibration(db_manager, table_name, model):
+        release.wait(5)
+        return {'items': [1, 2], 'students': [1, 2, 3], 'cycles': 12, 'converged': True}
+
+    monkeypatch.setattr(irt, 'calibrate_quiz', slow_calibration)
+    jobs = irt.CalibrationJobs(clock=lambda: 100.0)
+    manager = FakeManager()
+
+    assert jobs.start(manager, 'Quiz', '1pl')
+    assert jobs.status('Quiz')['state'] == 'running'
+    assert not jobs.start(manager, 'Quiz', '2pl')
+
+    release.set()
+    assert manager.disconnected.wait(5)
+    status = jobs.status('Quiz')
+    assert status['state'] == 'done' and status['model'] == '1pl'
+    assert status['message'] == 'Calibrated 2 questions from 3 students (1PL, 12 EM cycles).'
+
+
+def test_failed_calibration_is_reported(numpy_stub, monkeypatch):
+    def no_attempts(db_manager, table_name, model):
+        raise ValueError('No graded attempts to calibrate.')
+
+    monkeypatch.setattr(irt, 'calibrate_quiz', no_attempts)
+    jobs = irt.CalibrationJobs()
+    manager = FakeManager()
+
+    assert jobs.start(manager, 'Quiz')
+    assert manager.disconnected.wait(5)
+    assert jobs.status('Quiz')['state'] == 'failed'
+    assert jobs.status('Quiz')['message'] == 'No graded attempts to calibrate.'
+    assert jobs.status('Other') is None
+
+
+def test_unknown_model_is_rejected_before_starting(numpy_stub):
+    jobs = irt.CalibrationJobs()
+    with pytest.raises(ValueError):
+        jobs.start(FakeManager(), 'Quiz', '3pl')
+    assert jobs.status('Quiz') is None
@@ -0,0 +1,60 @@
+import pytest
+
+from database import BatchEditError, QUIZ_COLUMNS
+from fake_db import FakeConnection, make_manager
+
+
+def quiz_connection(sort_keys, responses=()):
+    """A quiz whose questions have the given {ID: sort key} and answer key 1, at version 3"""
+    return FakeConnection(list(responses) + [
+        ('INFORMATION_SCHEMA.COLUMNS', [(len(QUIZ_COLUMNS),)]),
+        ('SELECT Version FROM dbo.QuizVersions', [(3,)]),
+        ('OUTPUT INSERTED.Version', [(4,)]),
+        ('SELECT ID, RightAnswer, Question', [(question_id, 1, f'Q{question_id}') for question_id in sort_keys]),
+        ('SELECT ID, ISNULL(SortOrder, ID)', list(sort_keys.items())),
+    ])
+
+
+def edit(question_id, correct=1):
+    return {'op': 'edit', 'id': question_id, 'question': 'Q?', 'options': ['a', 'b', 'c', 'd'], 'correct': correct}
+
+
+@pytest.mark.parametrize('operations, index', [
+    ([edit(1), edit(9)], 1),
+    ([{'op': 'delete', 'id': 2}, {'op': 'delete', 'id': 2}], 1),
+    ([{'op': 'delete', 'id': 1}, edit(1)], 1),
+])
+def test_missing_questions_reject_the_whole_batch(operations, index):
+    connection = quiz_connection({1: 1, 2: 2})
+    manager = make_manager(connection)
+
+    with pytest.raises(BatchEditError) as error:
+        manager.apply_question_batch('Batch_Missing', operations)
+
+    assert error.value.operation_index == index
+    # Whatever ran before the bad operation is rolled back, and the version is not bumped
+    assert connection.rollbacks == 1
+    assert not connection.statements('OUTPUT INSERTED.Version')
+
+
+def test_reorder_swaps_sort_keys_and_leaves_content_alone():
+    # Question 3 was moved to the front earlier, so keys are not simply IDs
+    connection = quiz_connection({1: 2, 2: 3, 3: 1, 4: 4})
+    manager = make_manager(connection)
+
+    manager.apply_question_batch('Batch_Reorder', [{'op': 'reorder', 'order': [2, 1]}, edit(2)])
+
+    # 1 and 2 trade their keys (2 and 3); 3 and 4 keep theirs
+    assert connection.statements('SET SortOrder = ?') == [[(2, 2), (3, 1)]]
+    # The edit still names the question that was moved, not a position
+    assert connection.statements('SET Question = ?') == [[('Q?', 'a', 'b', 'c', 'd', 1, 2)]]
+    assert connection.commits >= 1
+
+
+def test_reorder_of_unknown_question_is_rejected():
+    connection = quiz_connection({1: 1, 2: 2})
+    manager = make_manager(connection)
+
+    with pytest.raises(BatchEditError):
+        manager.apply_question_batch('Batch_Unknown', [{'op': 'reorder', 'order': [2, 7]}])
+    assert not connection.statements('SET SortOrder = ?')
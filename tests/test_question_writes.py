@@ -0,0 +1,61 @@
+import pytest
+
+from database import DatabaseManager, QUIZ_COLUMNS
+from duplicate_index import duplicate_index
+from fake_db import FakeConnection, make_manager
+
+
+def deadlock(params):
+    raise RuntimeError('deadlock victim')
+
+
+def quiz_connection():
+    """A quiz table whose version bump fails after the row write has run"""
+    return FakeConnection([
+        ('INFORMATION_SCHEMA.COLUMNS', [(len(QUIZ_COLUMNS),)]),
+        ('OUTPUT INSERTED.ID', [(12,)]),
+        ('OUTPUT INSERTED.Version', deadlock),
+    ])
+
+
+def prepared(connection, table_name):
+    """A manager that has already resolved (and committed the sort column of) the quiz table"""
+    manager = make_manager(connection)
+    assert manager._quiz_table(table_name)
+    connection.commits = 0
+    return manager
+
+
+@pytest.mark.parametrize('table_name, write', [
+    ('Writes_Insert', lambda manager: manager.insert_question('Writes_Insert', 'Q?', 'a', 'b', 'c', 'd', 1)),
+    ('Writes_Delete', lambda manager: manager.delete_question('Writes_Delete', 12)),
+])
+def test_failed_write_is_rolled_back_not_left_for_the_next_commit(table_name, write):
+    connection = quiz_connection()
+    manager = prepared(connection, table_name)
+    DatabaseManager._versions_ready = True
+
+    assert write(manager) is False
+
+    assert connection.rollbacks == 1 and connection.commits == 0
+    # The version table is re-checked next time, in case its DDL was never committed
+    assert DatabaseManager._versions_ready is False
+    assert duplicate_index.find('Q?', include=lambda key: key[0] == 'Writes_Insert') == []
+
+
+def test_failed_drop_is_rolled_back_and_the_quiz_kept():
+    connection = FakeConnection([
+        ('INFORMATION_SCHEMA.COLUMNS', [(len(QUIZ_COLUMNS),)]),
+        ('OUTPUT INSERTED.Version', [(5,)]),
+        ("OBJECT_ID('dbo.QuizOwnership', 'U')", [(1,)]),
+        ('DELETE FROM dbo.QuizOwnership', deadlock),
+    ])
+    manager = prepared(connection, 'Writes_Drop')
+    DatabaseManager._ownership_ready = True
+
+    assert manager.drop_table('Writes_Drop') is False
+
+    assert connection.rollbacks == 1 and connection.commits == 0
+    assert DatabaseManager._versions_ready is False and DatabaseManager._ownership_ready is False
+    # Still registered, since the table is still there
+    assert manager._quiz_table('Writes_Drop')
@@ -0,0 +1,45 @@
+import pytest
+
+import main
+import student
+from quiz_bundle import QuizBundle, bundle_token
+
+BUNDLE = QuizBundle({'schema': 1, 'quiz': 'Ann_Math', 'version': 5, 'questions': []})
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(student.db_manager, 'get_quiz_info', lambda table_name: None)
+    monkeypatch.setattr(student.quiz_bundles, 'get',
+                        lambda table_name, snapshot_id, quiz_info, load_questions: BUNDLE)
+    return main.app.test_client()
+
+
+def token(table_name, snapshot_id):
+    with main.app.test_request_context():
+        return bundle_token(table_name, snapshot_id)
+
+
+def fetch(client, snapshot_id=5, **args):
+    return client.get(f'/student/api/v1/quiz_bundle/Ann_Math/{snapshot_id}', query_string=dict(v=BUNDLE.etag, **args))
+
+
+def test_bundle_needs_a_session_or_a_signed_url(client):
+    assert fetch(client).status_code == 403
+    assert fetch(client, token=token('Ann_Math', 6)).status_code == 403
+    assert fetch(client, token=token('Bob_Math', 5)).status_code == 403
+    assert fetch(client, token=token('Ann_Math', 5)[:-2] + 'xx').status_code == 403
+    # The live questions are never served from a signed URL
+    assert fetch(client, snapshot_id=0, token=token('Ann_Math', 0)).status_code == 403
+
+
+def test_only_the_signed_form_is_shared_and_immutable(client):
+    response = fetch(client, token=token('Ann_Math', 5))
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    with client.session_transaction() as session:
+        session['student_details'] = {'student_id': 'S1'}
+    response = fetch(client)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-cache'
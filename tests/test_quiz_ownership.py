@@ -0,0 +1,29 @@
+from database import QUIZ_COLUMNS
+from fake_db import FakeConnection, make_manager
+
+
+def existing_quiz(owner=None, columns=len(QUIZ_COLUMNS)):
+    return FakeConnection([
+        ("OBJECT_ID('dbo.QuizOwnership'", [(1,)]),
+        ('INFORMATION_SCHEMA.TABLES', [(1,)]),
+        ('INFORMATION_SCHEMA.COLUMNS', [(columns,)]),
+        ('SELECT TeacherID FROM dbo.QuizOwnership', [(owner,)] if owner is not None else []),
+    ])
+
+
+def test_unowned_existing_quiz_is_recorded_for_its_creator():
+    connection = existing_quiz()
+    assert make_manager(connection).create_simple_quiz('Math', 10, 'Ann', teacher_id=7)
+    assert connection.statements('INSERT INTO dbo.QuizOwnership') == [('Ann_Math', 7, 'Math', 10)]
+
+
+def test_existing_quiz_of_another_teacher_is_refused():
+    connection = existing_quiz(owner=8)
+    assert not make_manager(connection).create_simple_quiz('Math', 10, 'Ann', teacher_id=7)
+    assert not connection.statements('INSERT INTO dbo.QuizOwnership')
+
+
+def test_existing_table_that_is_not_a_quiz_is_refused():
+    connection = existing_quiz(columns=2)
+    assert not make_manager(connection).create_simple_quiz('Math', 10, 'Ann', teacher_id=7)
+    assert not connection.statements('INSERT INTO dbo.QuizOwnership')
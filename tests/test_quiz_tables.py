@@ -0,0 +1,38 @@
+import pytest
+
+from quiz_tables import (QuizTableRegistry, fulltext_condition, is_quiz_table_name, is_valid_table_name,
+                         like_pattern, quote_table_name)
+
+
+def test_names_that_could_break_out_of_brackets_are_rejected():
+    assert is_valid_table_name('Ann_Lee_Math-101')
+    for name in ('Quiz]; DROP TABLE x', "Quiz'", 'Quiz Name', 'Quiz;', '', 'x' * 129, None):
+        assert not is_valid_table_name(name)
+    with pytest.raises(ValueError):
+        quote_table_name('Quiz]')
+    assert quote_table_name('Quiz') == 'dbo.[Quiz]'
+
+
+@pytest.mark.parametrize('name', ['RegisteredTeachers', 'registeredteachers', 'Teachers', 'QuizOwnership',
+                                  'QuizAttempts', 'QuizQuestionRows', 'QuizStudentAbilities',
+                                  'Teacher_3_Ann_Lee_Metadata'])
+def test_app_tables_are_never_quiz_tables(name):
+    assert is_valid_table_name(name)
+    assert not is_quiz_table_name(name)
+    with pytest.raises(ValueError):
+        QuizTableRegistry().add(name)
+
+
+def test_registry_caches_and_forgets_handles():
+    registry = QuizTableRegistry()
+    handle = registry.add('Ann_Math')
+    assert registry.get('Ann_Math') is handle
+    assert registry.add('Ann_Math') is handle
+    assert handle.drop == 'DROP TABLE dbo.[Ann_Math]'
+    registry.forget('Ann_Math')
+    assert registry.get('Ann_Math') is None
+
+
+def test_search_text_is_escaped():
+    assert like_pattern('50%_[a]') == '%50[%][_][[]a]%'
+    assert fulltext_condition('cell "wall"  ') == '"cell*" AND "wall*"'
@@ -0,0 +1,75 @@
+import os
+import time
+
+import pytest
+
+from local_cluster import LocalCluster, PRIMARY
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    return LocalCluster(replica_count=2, directory=str(tmp_path))
+
+
+def served_by(connection):
+    """Name of the cluster database a connection points at"""
+    cursor = connection.cursor()
+    cursor.execute("PRAGMA database_list")
+    path = cursor.fetchone()[2]
+    cursor.close()
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def reprobe(manager):
+    # Lag is re-measured every max_staleness / 2 seconds; make the next read measure it now
+    for replica in manager.replicas:
+        replica.probed_at = 0
+
+
+def test_fresh_replicas_take_reads_in_turn(cluster):
+    manager = cluster.database_manager()
+    assert [served_by(manager._read_connection()) for _ in range(4)] == ['replica0', 'replica1'] * 2
+    assert cluster.connections_opened[PRIMARY] == 0
+
+
+def test_lagging_replicas_fall_back_to_the_primary(cluster):
+    manager = cluster.database_manager(max_staleness=5)
+    cluster.set_lag(0, 30)
+    assert {served_by(manager._read_connection()) for _ in range(2)} == {'replica1'}
+
+    cluster.set_lag(1, 30)
+    reprobe(manager)
+    assert served_by(manager._read_connection()) == PRIMARY
+
+    cluster.set_lag(0, 0)
+    reprobe(manager)
+    assert served_by(manager._read_connection()) == 'replica0'
+
+
+def test_suspended_or_broken_replica_is_skipped(cluster):
+    manager = cluster.database_manager()
+    cluster.set_lag(0, None)
+    cluster._execute('replica1', "DROP TABLE replica_status")
+
+    assert served_by(manager._read_connection()) == PRIMARY
+    assert not any(replica.healthy for replica in manager.replicas)
+
+
+def test_reads_after_a_write_wait_for_a_replica_that_has_it(cluster):
+    manager = cluster.database_manager(max_staleness=5)
+    cluster.set_lag(0, 2)
+    cluster.set_lag(1, 2)
+    assert manager.connect()
+    manager._commit()
+
+    # Both replicas are within the staleness bound but two seconds behind this thread's write
+    assert served_by(manager._read_connection()) == PRIMARY
+
+    manager.read_after(0)
+    assert served_by(manager._read_connection()).startswith('replica')
+
+    # A floor handed over from another request (e.g. after a redirect) works the same way
+    manager.read_after(time.time())
+    reprobe(manager)
+    assert served_by(manager._read_connection()) == PRIMARY
+    manager.disconnect()
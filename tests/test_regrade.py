@@ -0,0 +1,97 @@
+from database import DatabaseManager, QUIZ_COLUMNS
+from fake_db import FakeConnection, make_manager
+
+ROWS = [
+    ('2 + 2?', '3', '4', '5', '6', 2),
+    ('Capital of France?', 'Paris', 'Rome', 'Oslo', 'Bern', 1),
+    ('Largest planet?', 'Mars', 'Venus', 'Earth', 'Jupiter', 3),  # Key is wrong: should be 4
+]
+
+
+def regrade_responses():
+    """A published version (snapshot 9) holding question 3's row 50, and one submitted attempt to re-grade"""
+    return [
+        ('SELECT DISTINCT sq.RowID', [(50,)]),
+        ('INSERT INTO dbo.QuizQuestionRows', [(51,)]),
+        ('UPDATE sq SET RowID', [(9,)]),
+        ('SET CorrectChoice = ?', [('a1', 'S1', 'Sam', 0.75, 3, True, 1)]),
+    ]
+
+
+def test_corrected_key_rescores_a_graded_result_in_place():
+    result = DatabaseManager.score_answers(ROWS, {0: 2, 1: 2, 2: 4})
+    assert (result['score'], result['correct_answers'], result['wrong_answers']) == (0.5, 1, 2)
+
+    assert DatabaseManager.apply_answer_keys(result, {2: (4, 'Jupiter')})
+    assert (result['score'], result['correct_answers'], result['wrong_answers']) == (1.75, 2, 1)
+    assert result['percentage'] == 58.33
+    assert result['details'][2]['correct_answer'] == 'Jupiter'
+    # Nothing to change the second time
+    assert not DatabaseManager.apply_answer_keys(result, {2: (4, 'Jupiter')})
+
+
+def test_attempt_in_progress_on_an_old_version_is_stored_with_the_new_key():
+    # The snapshot this process graded from still had key 3; the database already has 4
+    connection = FakeConnection([
+        ('SELECT sq.Position, q.RightAnswer', [(0, 2, '4'), (1, 1, 'Paris'), (2, 4, 'Jupiter')]),
+        ('UPDATE dbo.QuizAttempts', 1),
+    ])
+    result = DatabaseManager.score_answers(ROWS, {0: 2, 2: 4}, negative_marking=False)
+    assert result['score'] == 1
+
+    assert make_manager(connection).record_attempt_result('a1', result, elapsed_seconds=60)
+
+    stored = connection.statements('UPDATE dbo.QuizAttempts')[0]
+    assert stored[:6] == (2, 3, 66.67, 2, 0, 1)
+    responses = connection.statements('INSERT INTO dbo.QuizAttemptResponses')[0]
+    assert responses[2] == ('a1', 2, 4, 4, True, 1)
+
+
+def test_answer_key_edit_regrades_results_and_published_versions_together():
+    connection = FakeConnection(regrade_responses() + [
+        ('INFORMATION_SCHEMA.COLUMNS', [(len(QUIZ_COLUMNS),)]),
+        ('SELECT Version FROM dbo.QuizVersions', [(3,)]),
+        ('OUTPUT INSERTED.Version', [(4,)]),
+        ('WHERE ID = ?', [(3, 'Largest planet?', 'Mars', 'Venus', 'Earth', 'Jupiter', 3)]),
+    ])
+    DatabaseManager._snapshot_cache[9] = ([], [])
+
+    result = make_manager(connection).update_question('Regrade_Edit', 3, 'Largest planet?', 'Mars', 'Venus', 'Earth', 'Jupiter', 4)
+
+    assert result['regraded'] == [{'attempt_id': 'a1', 'student_id': 'S1', 'student_name': 'Sam',
+                                   'old_score': 0.75, 'new_score': 2.0, 'total': 3}]
+    # The old version gets a corrected copy of the row instead of having the shared row rewritten
+    assert connection.statements('INSERT INTO dbo.QuizQuestionRows') == [(4, 50)]
+    assert connection.statements('UPDATE sq SET RowID') == [(51, 'Regrade_Edit', 3, 50)]
+    assert connection.statements('SET Score = ROUND') == [[(1.25, 1, 1, 1.25, 'a1')]]
+    assert 9 not in DatabaseManager._snapshot_cache
+    assert connection.rollbacks == 0
+
+
+def test_unchanged_key_does_not_regrade():
+    connection = FakeConnection([
+        ('INFORMATION_SCHEMA.COLUMNS', [(len(QUIZ_COLUMNS),)]),
+        ('SELECT Version FROM dbo.QuizVersions', [(3,)]),
+        ('OUTPUT INSERTED.Version', [(4,)]),
+        ('WHERE ID = ?', [(3, 'Largest planet?', 'Mars', 'Venus', 'Earth', 'Jupiter', 4)]),
+    ])
+    result = make_manager(connection).update_question('Regrade_Same', 3, 'Largest planet?', 'Mars', 'Venus', 'Earth', 'Jupiter', 4)
+    assert result == {'regraded': None}
+    assert not connection.statements('SET CorrectChoice = ?')
+
+
+def test_batch_key_change_is_regraded_in_the_batch_transaction():
+    connection = FakeConnection(regrade_responses() + [
+        ('INFORMATION_SCHEMA.COLUMNS', [(len(QUIZ_COLUMNS),)]),
+        ('SELECT Version FROM dbo.QuizVersions', [(3,)]),
+        ('OUTPUT INSERTED.Version', [(4,)]),
+        ('SELECT ID, RightAnswer, Question', [(3, 3, 'Largest planet?')]),
+    ])
+    edit = {'op': 'edit', 'id': 3, 'question': 'Largest planet?', 'options': ['Mars', 'Venus', 'Earth', 'Jupiter'], 'correct': 4}
+
+    result = make_manager(connection).apply_question_batch('Regrade_Batch', [edit])
+
+    assert [item['attempt_id'] for item in result['regraded']] == ['a1']
+    # Matched by the question's text before the batch
+    assert connection.statements('SELECT DISTINCT sq.RowID') == [(3, 'Regrade_Batch', 'Largest planet?', 4)]
+    assert connection.commits >= 1 and connection.rollbacks == 0
@@ -0,0 +1,37 @@
+import threading
+
+from submission_log import SubmissionLog
+
+
+def test_first_copy_owns_the_key_and_replays_get_its_outcome():
+    log = SubmissionLog()
+    assert log.begin('key') == (True, None)
+    log.finish('key', {'score': 3})
+    assert log.begin('key') == (False, {'score': 3})
+
+
+def test_failed_owner_releases_the_key():
+    log = SubmissionLog()
+    log.begin('key')
+    log.finish('key', None)
+    assert log.begin('key') == (True, None)
+
+
+def test_duplicate_gives_up_while_the_first_copy_is_still_grading():
+    log = SubmissionLog()
+    log.begin('key')
+    assert log.begin('key', wait=0.01) == (False, None)
+
+
+def test_concurrent_duplicates_wait_for_the_owner():
+    log = SubmissionLog()
+    log.begin('key')
+    outcomes = []
+    waiters = [threading.Thread(target=lambda: outcomes.append(log.begin('key', wait=5))) for _ in range(4)]
+    for waiter in waiters:
+        waiter.start()
+
+    log.finish('key', {'score': 1})
+    for waiter in waiters:
+        waiter.join(5)
+    assert outcomes == [(False, {'score': 1})] * 4
@@ -0,0 +1,101 @@
+import functools
+
+import pytest
+
+import main
+import student
+from submission_log import SubmissionLog
+
+KEY = 'k' * 32
+RESULT = {'score': 1, 'total': 2, 'percentage': 50.0, 'details': [], 'correct_answers': 1,
+          'wrong_answers': 0, 'unanswered': 1, 'negative_marking_applied': True}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = {'graded': 0, 'recorded': 0, 'published': []}
+    client = main.app.test_client()
+    client.stored = None
+    client.record_succeeds = True
+
+    def calculate(table_name, answers, negative_marking, snapshot_id=None):
+        calls['graded'] += 1
+        return dict(RESULT)
+
+    def record(attempt_id, score_result, elapsed_seconds=None, auto_submitted=False):
+        calls['recorded'] += 1
+        return client.record_succeeds
+
+    monkeypatch.setattr(student.db_manager, 'calculate_quiz_score', calculate)
+    monkeypatch.setattr(student.db_manager, 'record_attempt_result', record)
+    monkeypatch.setattr(student.db_manager, 'get_attempt_result', lambda attempt_id: client.stored)
+    monkeypatch.setattr(student, '_publish_submitted',
+                        lambda table_name, attempt_id, snapshot_id, result: calls['published'].append(attempt_id))
+    monkeypatch.setattr(student, 'submission_log', SubmissionLog())
+    client.calls = calls
+
+    with client.session_transaction() as session:
+        session['student_details'] = {'student_id': 'S1', 'name': 'Sam'}
+        session['quiz_session'] = {'attempt_id': 'a1', 'table_name': 'Ann_Math', 'snapshot_id': None,
+                                   'subject': 'Math', 'teacher_name': 'Ann', 'start_time': 0,
+                                   'questions': [{}, {}], 'timer_minutes': 0, 'negative_marking': True,
+                                   'submission_key': KEY}
+    return client
+
+
+def submit(client, **headers):
+    return client.post('/student/submit_quiz', data={'submission_key': KEY, 'question_0': '1'}, headers=headers)
+
+
+def test_submission_is_announced_once_it_is_stored(client):
+    assert submit(client).headers['Location'].endswith('/student/results')
+    assert client.calls['published'] == ['a1']
+
+    # A replay of the same key is answered from the log
+    with client.session_transaction() as session:
+        session['quiz_session'] = {'submission_key': KEY}
+    assert submit(client).status_code == 302
+    assert client.calls['graded'] == 1 and client.calls['published'] == ['a1']
+
+
+def test_stored_attempt_is_not_graded_or_announced_again(client):
+    client.stored = dict(RESULT, score=2, percentage=100.0, elapsed=40, auto_submitted=True)
+
+    submit(client)
+
+    assert client.calls == {'graded': 0, 'recorded': 0, 'published': []}
+    with client.session_transaction() as session:
+        assert session['quiz_results']['score'] == 2 and session['quiz_results']['auto_submitted']
+
+
+def test_attempt_stored_meanwhile_is_answered_with_the_stored_result(client, monkeypatch):
+    client.record_succeeds = False
+    stored = dict(RESULT, score=0, elapsed=60, auto_submitted=True)
+    record = student.db_manager.record_attempt_result
+
+    def swept_meanwhile(*args, **kwargs):
+        # The deadline sweep stored the attempt while this copy was being graded
+        client.stored = stored
+        return record(*args, **kwargs)
+
+    monkeypatch.setattr(student.db_manager, 'record_attempt_result', swept_meanwhile)
+    submit(client)
+
+    assert client.calls['graded'] == 1 and client.calls['published'] == []
+    with client.session_transaction() as session:
+        assert session['quiz_results']['score'] == 0
+
+
+def test_copy_arriving_mid_grading_is_redirected_not_failed(client, monkeypatch):
+    log = student.submission_log
+    monkeypatch.setattr(log, 'begin', functools.partial(SubmissionLog.begin, log, wait=0))
+    log.begin(KEY)
+
+    response = submit(client)
+    assert response.status_code == 302 and response.headers['Location'].endswith('/student/results?pending=1')
+    assert submit(client, Accept='application/json').status_code == 503
+    assert client.calls['graded'] == 0
+
+    # By the time the results page loads, the first copy has stored the attempt
+    client.stored = dict(RESULT, elapsed=30, auto_submitted=False)
+    assert client.get('/student/results?pending=1').status_code == 200
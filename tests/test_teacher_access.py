@@ -0,0 +1,93 @@
+import pytest
+
+import main
+import teacher
+
+
+@pytest.fixture
+def client(monkeypatch):
+    owners = {'Ann_Math': 7}
+    dropped = []
+    monkeypatch.setattr(teacher.db_manager, 'is_quiz_owner',
+                        lambda table_name, teacher_id, teacher_name=None: owners.get(table_name) == teacher_id)
+    monkeypatch.setattr(teacher.db_manager, 'drop_table', lambda table_name: dropped.append(table_name) or True)
+    client = main.app.test_client()
+    client.dropped = dropped
+    return client
+
+
+def log_in(client, **teacher_data):
+    with client.session_transaction() as session:
+        session['teacher_logged_in'] = True
+        session['teacher_data'] = dict({'name': 'Ann', 'teacher_id': 7}, **teacher_data)
+
+
+def test_teacher_cannot_touch_another_teachers_quiz(client):
+    log_in(client, name='Bob', teacher_id=8)
+
+    assert client.get('/teacher/delete_quiz/Ann_Math').status_code == 403
+    assert client.get('/teacher/delete_quiz/RegisteredTeachers').status_code == 403
+    assert client.get('/teacher/edit_question/Ann_Math/1').status_code == 403
+    response = client.post('/teacher/batch_edit/Ann_Math', json={'operations': [{'op': 'delete', 'id': 1}]})
+    assert response.status_code == 403 and response.get_json()['ok'] is False
+    assert client.dropped == []
+
+
+def test_owner_and_admin_can_delete(client):
+    log_in(client)
+    assert client.get('/teacher/delete_quiz/Ann_Math').status_code == 302
+
+    log_in(client, name='Admin Teacher', teacher_id=1, admin=True)
+    assert client.get('/teacher/delete_quiz/Other_Quiz').status_code == 302
+    assert client.dropped == ['Ann_Math', 'Other_Quiz']
+
+
+def test_gradebook_export_needs_the_quiz_owner(client, monkeypatch):
+    monkeypatch.setattr(teacher.db_manager, 'iter_gradebook_attempts', lambda table_name: iter(()))
+    log_in(client, name='Bob', teacher_id=8)
+    assert client.get('/teacher/gradebook/Ann_Math').status_code == 403
+
+    log_in(client)
+    response = client.get('/teacher/gradebook/Ann_Math')
+    assert response.status_code == 200
+    assert response.data.startswith(b'attempt_id,student_id')
+
+
+def test_calibration_needs_the_quiz_owner(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(teacher.irt.calibration_jobs, 'start',
+                        lambda db_manager, table_name, model: started.append((table_name, model)) or True)
+    log_in(client, name='Bob', teacher_id=8)
+    assert client.post('/teacher/calibrate/Ann_Math', data={'model': '2pl'}).status_code == 403
+
+    log_in(client)
+    assert client.post('/teacher/calibrate/Ann_Math', data={'model': '2pl'}).status_code == 302
+    assert started == [('Ann_Math', '2pl')]
+
+
+def test_similarity_report_needs_the_quiz_owner(client, monkeypatch):
+    monkeypatch.setattr(teacher.db_manager, 'iter_answer_sheets', lambda table_name: iter(()))
+    log_in(client, name='Bob', teacher_id=8)
+    assert client.get('/teacher/similarity/Ann_Math').status_code == 403
+
+    log_in(client)
+    assert client.get('/teacher/similarity/Ann_Math').status_code == 200
+
+
+def test_monitor_poll_is_a_304_until_the_monitor_changes(client, monkeypatch):
+    monkeypatch.setattr(teacher.db_manager, 'get_simple_quizzes',
+                        lambda teacher_name, teacher_id=None: [{'table_name': 'Ann_Math'}])
+    teacher.listing_cache.invalidate('quizzes')
+    assert client.get('/teacher/monitor/stats').status_code == 401
+
+    log_in(client)
+    response = client.get('/teacher/monitor/stats')
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'private, no-cache'
+    etag = response.headers['ETag']
+    assert client.get('/teacher/monitor/stats', headers={'If-None-Match': etag}).status_code == 304
+
+    teacher.exam_monitor._on_started('Ann_Math', attempt_id='poll-test')
+    response = client.get('/teacher/monitor/stats', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['quizzes']['Ann_Math']['in_progress'] >= 1
+    teacher.exam_monitor._on_abandoned(attempt_id='poll-test')
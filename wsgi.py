@@ -0,0 +1,41 @@
+"""
+Production Entry Point for Quiz Pool App
+Serves the Flask app with a multi-threaded WSGI server instead of the debug server
+
+Run with:
+    python wsgi.py
+or through any WSGI server, e.g.:
+    waitress-serve --threads=16 --port=5000 wsgi:app
+    gunicorn --workers=1 --threads=16 --worker-class=gthread -b 0.0.0.0:5000 wsgi:app
+
+Quiz drafts, deadlines and the live monitor are kept in process memory, so the
+app runs as a single process and scales with threads. Each thread gets its own
+database connection from DatabaseManager.
+"""
+
+import os
+from main import app
+
+
+def serve(host=None, port=None, threads=None):
+    """Serves the app with waitress, falling back to Werkzeug's threaded server"""
+    host = host or os.environ.get('QUIZ_HOST', '0.0.0.0')
+    port = int(port or os.environ.get('QUIZ_PORT', 5000))
+    threads = int(threads or os.environ.get('QUIZ_THREADS', 16))
+    
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print("waitress is not installed; falling back to the Werkzeug threaded server.")
+        from werkzeug.serving import run_simple
+        run_simple(host, port, app, threaded=True, use_debugger=False, use_reloader=False)
+        return
+    
+    # waitress buffers slow and idle keep-alive connections in its I/O loop, so a worker
+    # thread is only occupied while a request is being processed; responses that stream
+    # for a long time would hold theirs, which is why the live monitor polls instead
+    waitress_serve(app, host=host, port=port, threads=threads, channel_timeout=60)
+
+
+if __name__ == '__main__':
+    serve()